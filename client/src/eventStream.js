@@ -0,0 +1,71 @@
+// Shared Server-Sent Events connection to /stream.
+// Components subscribe with a listener(type, data); one EventSource is kept
+// open while anyone is listening. Listeners also receive 'open' and 'error'
+// so they can fall back to polling while the stream is down.
+
+const apiBaseUrl = process.env.REACT_APP_API_BASE_URL;
+const RECONNECT_DELAY_MS = 10000;
+const EVENT_TYPES = ['reading', 'notification', 'resync'];
+
+const listeners = new Set();
+let source = null;
+let reconnectTimer = null;
+
+const dispatch = (type, data) => {
+  listeners.forEach((listener) => listener(type, data));
+};
+
+const disconnect = () => {
+  clearTimeout(reconnectTimer);
+  reconnectTimer = null;
+  if (source) {
+    source.close();
+    source = null;
+  }
+};
+
+const scheduleReconnect = (delay) => {
+  disconnect();
+  if (listeners.size) {
+    reconnectTimer = setTimeout(connect, delay);
+  }
+};
+
+function connect() {
+  reconnectTimer = null;
+  const token = localStorage.getItem('access_token');
+  if (!token || !window.EventSource) {
+    dispatch('error');
+    return;
+  }
+
+  source = new EventSource(`${apiBaseUrl}/stream?jwt=${encodeURIComponent(token)}`);
+  source.onopen = () => dispatch('open');
+  source.onerror = () => {
+    // EventSource would retry with the same (possibly expired) token
+    dispatch('error');
+    scheduleReconnect(RECONNECT_DELAY_MS);
+  };
+  EVENT_TYPES.forEach((type) => {
+    source.addEventListener(type, (event) => dispatch(type, JSON.parse(event.data)));
+  });
+  // The server ends each stream after a minute or two, and when the token
+  // expires; reconnect at once (with the current token)
+  source.addEventListener('reconnect', () => scheduleReconnect(0));
+  source.addEventListener('token-expired', () => scheduleReconnect(0));
+}
+
+export const subscribeToEvents = (listener) => {
+  listeners.add(listener);
+  if (!source && !reconnectTimer) {
+    connect();
+  } else if (source && source.readyState === EventSource.OPEN) {
+    listener('open');
+  }
+  return () => {
+    listeners.delete(listener);
+    if (!listeners.size) {
+      disconnect();
+    }
+  };
+};
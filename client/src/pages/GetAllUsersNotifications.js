@@ -1,59 +1,111 @@
-import React, { useContext, useEffect, useState } from "react";
+import React, { useCallback, useContext, useEffect, useState } from "react";
 import { AuthContext } from "../context/AuthContext";
 import "../styles/GetAllUsersNotifications.css";
 
 const apiBaseUrl = process.env.REACT_APP_API_BASE_URL;
+const PAGE_SIZE = 50;
 
 const GetAllUsersNotifications = () => {
   const { user } = useContext(AuthContext);
   const [notifications, setNotifications] = useState([]);
+  const [summary, setSummary] = useState(null);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [filters, setFilters] = useState({ severity: "", read: "", user_id: "" });
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
 
-  useEffect(() => {
-    const fetchNotifications = async () => {
-      setLoading(true);
-      setError(null);
-      try {
-        const token = localStorage.getItem("access_token");
-        if (!token) {
-          setError("No access token found. Please log in.");
-          setLoading(false);
-          return;
-        }
-        const res = await fetch(`${apiBaseUrl}/notifications/all`, {
-          headers: {
-            "Content-Type": "application/json",
-            "Authorization": `Bearer ${token}`,
-          },
-          credentials: 'include'
-        });
-        if (!res.ok) {
-          throw new Error("Failed to fetch notifications");
-        }
-        const data = await res.json();
-        setNotifications(data.notifications || []);
-      } catch (err) {
-        setError(err.message);
-      } finally {
+  const fetchNotifications = useCallback(async (cursor) => {
+    setLoading(true);
+    setError(null);
+    try {
+      const token = localStorage.getItem("access_token");
+      if (!token) {
+        setError("No access token found. Please log in.");
         setLoading(false);
+        return;
+      }
+
+      const params = new URLSearchParams({ limit: PAGE_SIZE });
+      Object.entries(filters).forEach(([key, value]) => {
+        if (value !== "") params.set(key, value);
+      });
+      if (cursor) params.set("cursor", cursor);
+
+      const res = await fetch(`${apiBaseUrl}/notifications/all?${params.toString()}`, {
+        headers: {
+          "Content-Type": "application/json",
+          "Authorization": `Bearer ${token}`,
+        },
+        credentials: 'include'
+      });
+      if (!res.ok) {
+        throw new Error("Failed to fetch notifications");
       }
-    };
-    fetchNotifications();
-  }, []);
+      const data = await res.json();
+      const page = data.notifications || [];
+      // A cursor continues the current list; no cursor starts a new one
+      setNotifications(prev => (cursor ? [...prev, ...page] : page));
+      setNextCursor(data.pagination ? data.pagination.next_cursor : null);
+      // Only an unfiltered first page carries summary counts
+      if (!cursor) setSummary(data.summary || null);
+    } catch (err) {
+      setError(err.message);
+    } finally {
+      setLoading(false);
+    }
+  }, [filters]);
+
+  useEffect(() => {
+    fetchNotifications(null);
+  }, [fetchNotifications]);
+
+  const handleFilterChange = (e) => {
+    const { name, value } = e.target;
+    setFilters(prev => ({ ...prev, [name]: value }));
+  };
 
   // Optional: Restrict to admins
   if (!user || user.role !== "Admin") {
     return <div className="notif-error">Admin access only.</div>;
   }
 
-  if (loading) return <div className="notif-loading" aria-live="polite">Loading notifications...</div>;
   if (error) return <div className="notif-error" aria-live="polite">Error: {error}</div>;
-  if (notifications.length === 0) return <div className="notif-empty">No notifications found.</div>;
 
   return (
     <div className="notifications-list">
       <h2>All Notifications</h2>
+
+      <div className="notif-filters">
+        <select name="severity" value={filters.severity} onChange={handleFilterChange}>
+          <option value="">All severities</option>
+          <option value="info">Info</option>
+          <option value="warning">Warning</option>
+          <option value="critical">Critical</option>
+        </select>
+        <select name="read" value={filters.read} onChange={handleFilterChange}>
+          <option value="">Read and unread</option>
+          <option value="false">Unread</option>
+          <option value="true">Read</option>
+        </select>
+        <input
+          type="number"
+          name="user_id"
+          placeholder="User ID"
+          value={filters.user_id}
+          onChange={handleFilterChange}
+        />
+      </div>
+
+      {summary && (
+        <div className="notif-summary">
+          {summary.total} total · {summary.unread} unread · {summary.read} read
+        </div>
+      )}
+
+      {!loading && notifications.length === 0 && (
+        <div className="notif-empty">No notifications found.</div>
+      )}
+
       <ul>
         {notifications.map((notif) => (
           <li
@@ -77,6 +129,13 @@ const GetAllUsersNotifications = () => {
           </li>
         ))}
       </ul>
+
+      {loading && <div className="notif-loading" aria-live="polite">Loading notifications...</div>}
+      {!loading && nextCursor && (
+        <button className="notif-load-more" onClick={() => fetchNotifications(nextCursor)}>
+          Load more
+        </button>
+      )}
     </div>
   );
 };
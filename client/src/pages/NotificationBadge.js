@@ -1,5 +1,6 @@
 import React, { useState, useEffect, useContext, useCallback } from 'react';
 import { AuthContext } from '../context/AuthContext';
+import { subscribeToEvents } from '../eventStream';
 import '../styles/NotificationBadge.css';
 
 const apiBaseUrl = process.env.REACT_APP_API_BASE_URL;
@@ -8,6 +9,7 @@ const NotificationBadge = ({ onClick }) => {
   const [unreadCount, setUnreadCount] = useState(0);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
+  const [streaming, setStreaming] = useState(false);
   const { user } = useContext(AuthContext);
 
   const fetchUnreadCount = useCallback(async () => {
@@ -37,12 +39,31 @@ const NotificationBadge = ({ onClick }) => {
 
   useEffect(() => {
     fetchUnreadCount();
-    
-    // Set up polling every 30 seconds
+  }, [fetchUnreadCount]); // Added fetchUnreadCount dependency
+
+  // Live updates: refetch when a notification arrives (or after reconnecting)
+  useEffect(() => {
+    if (!user) return;
+
+    return subscribeToEvents((type) => {
+      if (type === 'open') {
+        setStreaming(true);
+        fetchUnreadCount();
+      } else if (type === 'error') {
+        setStreaming(false);
+      } else if (type === 'notification' || type === 'resync') {
+        fetchUnreadCount();
+      }
+    });
+  }, [user, fetchUnreadCount]);
+
+  // Poll every 30 seconds only while the stream is unavailable
+  useEffect(() => {
+    if (streaming) return;
+
     const intervalId = setInterval(fetchUnreadCount, 30000);
-    
     return () => clearInterval(intervalId);
-  }, [fetchUnreadCount]); // Added fetchUnreadCount dependency
+  }, [streaming, fetchUnreadCount]);
 
   if (error) {
     return (
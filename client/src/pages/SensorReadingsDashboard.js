@@ -1,8 +1,11 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import '../styles/SensorReadingDashboard.css';
+import { subscribeToEvents } from '../eventStream';
 
 // Use the environment variable for the API base URL
 const apiBaseUrl = process.env.REACT_APP_API_BASE_URL;
+// Pushed events refetch the page at most this often
+const REFETCH_INTERVAL_MS = 5000;
 
 const SensorReadingsDashboard = () => {
   const [readings, setReadings] = useState([]);
@@ -22,8 +25,15 @@ const SensorReadingsDashboard = () => {
   });
   const [loading, setLoading] = useState(false);
   const [filtersApplied, setFiltersApplied] = useState(false);
+  const [liveUpdates, setLiveUpdates] = useState(0);
+  // What the stream listener (subscribed once) needs to know about the current view
+  const viewRef = useRef({});
+  viewRef.current = { page: pagination.page, limit: pagination.limit, filtersApplied };
+  const refetchTimer = useRef(null);
+  const lastFetch = useRef(0);
 
   const fetchReadings = async () => {
+    lastFetch.current = Date.now();
     setLoading(true);
     try {
       // Create base params object
@@ -63,7 +73,52 @@ const SensorReadingsDashboard = () => {
   useEffect(() => {
     fetchReadings();
     // eslint-disable-next-line
-  }, [pagination.page, pagination.limit, filtersApplied]);
+  }, [pagination.page, pagination.limit, filtersApplied, liveUpdates]);
+
+  // Coalesce refetches triggered by pushed events into one per REFETCH_INTERVAL_MS
+  const scheduleRefetch = () => {
+    if (refetchTimer.current) return;
+    const wait = Math.max(0, lastFetch.current + REFETCH_INTERVAL_MS - Date.now());
+    refetchTimer.current = setTimeout(() => {
+      refetchTimer.current = null;
+      setLiveUpdates(n => n + 1);
+    }, wait);
+  };
+
+  // Readings pushed over /stream: a single new reading goes straight onto the
+  // unfiltered first page; batches, filtered views, later pages and 'resync'
+  // refetch the page instead
+  useEffect(() => {
+    const unsubscribe = subscribeToEvents((type, data) => {
+      if (type === 'resync') {
+        scheduleRefetch();
+      } else if (type === 'reading') {
+        const view = viewRef.current;
+        if (view.page !== 1 || view.filtersApplied || data.batch_size) {
+          scheduleRefetch();
+          return;
+        }
+        setReadings(prev => {
+          if (prev.length && new Date(data.timestamp) < new Date(prev[0].timestamp)) {
+            scheduleRefetch();  // a late reading belongs further down
+            return prev;
+          }
+          return [data, ...prev.filter(r => r.id !== data.id)].slice(0, view.limit);
+        });
+        setPagination(prev => ({
+          ...prev,
+          totalItems: prev.totalItems + 1,
+          totalPages: Math.max(1, Math.ceil((prev.totalItems + 1) / prev.limit))
+        }));
+      }
+    });
+    return () => {
+      unsubscribe();
+      clearTimeout(refetchTimer.current);
+      refetchTimer.current = null;
+    };
+    // eslint-disable-next-line
+  }, []);
 
   const handleFilterChange = (e) => {
     const { name, value } = e.target;
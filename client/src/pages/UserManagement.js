@@ -3,6 +3,8 @@ import { AuthContext } from "../context/AuthContext";
 import '../styles/UserManagement.css';
 
 const FILTER_ROLES = ["All", "Admin", "Normal"];
+const PAGE_SIZE = 25;
+const SEARCH_DEBOUNCE_MS = 300;
 const apiBaseUrl = process.env.REACT_APP_API_BASE_URL;
 
 const UserManagement = () => {
@@ -20,8 +22,15 @@ const UserManagement = () => {
 
   // Filter states
   const [search, setSearch] = useState("");
+  const [debouncedSearch, setDebouncedSearch] = useState("");
   const [roleFilter, setRoleFilter] = useState("All");
 
+  // Keyset paging: cursors of the pages before the current one
+  const [cursor, setCursor] = useState(null);
+  const [cursorHistory, setCursorHistory] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [totalUsers, setTotalUsers] = useState(null);
+
   // For delete confirmation dialog
   const [deleteCandidate, setDeleteCandidate] = useState(null);
 
@@ -31,7 +40,12 @@ const UserManagement = () => {
     setLoading(true);
     setError(null);
     try {
-      const response = await fetch(`${apiBaseUrl}/users`, {
+      const params = new URLSearchParams({ limit: PAGE_SIZE });
+      if (debouncedSearch) params.set("q", debouncedSearch);
+      if (roleFilter !== "All") params.set("role", roleFilter);
+      if (cursor) params.set("cursor", cursor);
+
+      const response = await fetch(`${apiBaseUrl}/users?${params.toString()}`, {
         method: "GET",
         headers: {
           Authorization: `Bearer ${accessToken}`,
@@ -45,13 +59,36 @@ const UserManagement = () => {
 
       const data = await response.json();
       setUsers(data.users || []);
-      setSuccess("Users loaded successfully");
+      setNextCursor(data.pagination ? data.pagination.next_cursor : null);
+      setTotalUsers(data.pagination ? data.pagination.total_items : null);
     } catch (error) {
       setError(error.message);
     } finally {
       setLoading(false);
     }
-  }, [accessToken]);
+  }, [accessToken, debouncedSearch, roleFilter, cursor]);
+
+  // Search on the server once typing pauses
+  useEffect(() => {
+    const timer = setTimeout(() => setDebouncedSearch(search.trim()), SEARCH_DEBOUNCE_MS);
+    return () => clearTimeout(timer);
+  }, [search]);
+
+  // A new search or role filter starts again from the first page
+  useEffect(() => {
+    setCursor(null);
+    setCursorHistory([]);
+  }, [debouncedSearch, roleFilter]);
+
+  const goToNextPage = () => {
+    setCursorHistory(prev => [...prev, cursor]);
+    setCursor(nextCursor);
+  };
+
+  const goToPreviousPage = () => {
+    setCursor(cursorHistory[cursorHistory.length - 1] || null);
+    setCursorHistory(prev => prev.slice(0, -1));
+  };
 
   // Auto-dismiss success message after 4 seconds
   useEffect(() => {
@@ -161,15 +198,8 @@ const UserManagement = () => {
     setDeleteCandidate(null);
   };
 
-  // Filter logic: search + role
-  const filteredUsers = users.filter((u) => {
-    const matchesSearch =
-      u.full_name.toLowerCase().includes(search.toLowerCase()) ||
-      u.email.toLowerCase().includes(search.toLowerCase());
-    const matchesRole =
-      roleFilter === "All" ? true : u.role === roleFilter;
-    return matchesSearch && matchesRole;
-  });
+  // Search and role filtering happen on the server
+  const filteredUsers = users;
 
   if (!user) {
     return (
@@ -363,6 +393,21 @@ const UserManagement = () => {
           </table>
         </div>
       )}
+
+      {(cursorHistory.length > 0 || nextCursor) && (
+        <div className="pagination-controls">
+          <button onClick={goToPreviousPage} disabled={loading || cursorHistory.length === 0}>
+            Previous
+          </button>
+          <span>
+            Page {cursorHistory.length + 1}
+            {totalUsers !== null && ` · ${totalUsers} users`}
+          </span>
+          <button onClick={goToNextPage} disabled={loading || !nextCursor}>
+            Next
+          </button>
+        </div>
+      )}
     </div>
   );
 };
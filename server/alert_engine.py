@@ -0,0 +1,490 @@
+"""
+Stateful alerting: readings move an alert through raised -> ongoing ->
+cleared instead of each one raising its own notification.
+
+Alerts come from the alert_rules table. Each enabled row is compiled once
+per worker (RuleSet) into array operations over a metric (temp, ph or
+tank_level_per):
+
+- threshold: the reading itself
+- rate_of_change: change per hour over the last `window_size` readings
+- zscore: standard deviations from the mean of the `window_size` readings
+  before it (0 until a tank has that much history)
+
+An ingest batch is turned into NumPy columns once; every rule then scores
+all of a tank's readings in one pass and the state machine below folds
+them with array operations, so Python only runs per state change, never
+per reading.
+
+- Hysteresis: an alert is raised when a reading passes a stage threshold
+  and only clears once a reading gets back to `clear_at`, well short of
+  it, so a metric hovering around the threshold does not flap.
+- Escalation: stages are ordered (warning, critical); reaching a higher
+  stage during an episode notifies again, and emails if the stage does.
+- Cooldown: an alert that re-raises within `cooldown` of the last
+  notification, at a stage no higher than it, is tracked but not
+  re-announced.
+- Reminders: an alert still active `reminder` after its last notification
+  is announced once more (in-app only).
+- Coalescing: a batch of readings yields at most one notification per
+  tank and rule.
+
+State lives in one alert_states row per tank and rule condition, locked
+and updated once per ingest call, and only when the batch can change it.
+"""
+import threading
+import time
+from collections import namedtuple
+from datetime import timedelta
+
+import numpy as np
+from sqlalchemy import and_, exists, or_, select
+
+from database import db
+from mail_queue import enqueue_emails
+from models import AlertRule, AlertState, Notification, SensorReading, Tank, TankSubscription, User, DEFAULT_TANK_ID
+from notification_state import record_notifications
+
+Stage = namedtuple('Stage', 'severity threshold email')
+
+# Transition kinds in notification priority order (highest first)
+PRIORITY = ('escalated', 'raised', 'reminder', 'cleared')
+
+METRICS = ('temp', 'ph', 'tank_level_per')
+KINDS = ('threshold', 'rate_of_change', 'zscore')
+DIRECTIONS = ('above', 'below', 'both')
+
+LABELS = {'temp': ('temperature', '°C'), 'ph': ('pH', ''), 'tank_level_per': ('tank level', '%')}
+
+MESSAGES = {
+    'threshold': {
+        'raised': "{tank}: {label} is at {value}{unit}, {reason}",
+        'reminder': "{tank}: {label} is still at {value}{unit} (peak {peak}{unit}) since {raised_at:%Y-%m-%d %H:%M} UTC",
+        'cleared': "{tank}: {label} is back to {value}{unit} after peaking at {peak}{unit}",
+    },
+    'rate_of_change': {
+        'raised': "{tank}: {label} is changing by {value}{unit} per hour",
+        'reminder': "{tank}: {label} is still changing by {value}{unit} per hour (peak {peak}{unit}) since {raised_at:%Y-%m-%d %H:%M} UTC",
+        'cleared': "{tank}: {label} is changing by {value}{unit} per hour again after peaking at {peak}{unit}",
+    },
+    'zscore': {
+        'raised': "{tank}: unusual {label} reading, {value} standard deviations from its recent average",
+        'reminder': "{tank}: {label} is still unusual ({value} standard deviations, peak {peak}) since {raised_at:%Y-%m-%d %H:%M} UTC",
+        'cleared': "{tank}: {label} is back to normal ({value} standard deviations) after peaking at {peak}",
+    },
+}
+
+
+def _number(value):
+    return f"{round(float(value), 2):g}"
+
+
+def _datetime(value):
+    return value.astype('datetime64[us]').item()
+
+
+class CompiledRule:
+    """
+    An alert_rules row as array operations. values() computes the rule's
+    quantity for each reading (what messages and alert_states show);
+    score() maps it so that "past a threshold" is always "greater than":
+    negated for 'below' rules and the magnitude for 'both'.
+    """
+
+    def __init__(self, condition, metric, kind, direction, stages, clear_at, window_size=1,
+                 noise_floor=0.0, cooldown=timedelta(minutes=60), reminder=timedelta(hours=6)):
+        self.condition = condition
+        self.metric = metric
+        self.kind = kind
+        self.direction = direction
+        self.stages = sorted(stages, key=lambda s: self.score(s.threshold))
+        self.thresholds = np.array([self.score(s.threshold) for s in self.stages])
+        self.clear_at = clear_at
+        self.clear_score = self.score(clear_at)
+        self.window_size = window_size
+        self.noise_floor = noise_floor
+        self.cooldown = cooldown
+        self.reminder = reminder
+
+    @property
+    def history(self):
+        """Stored readings needed before a batch's first one."""
+        return 0 if self.kind == 'threshold' else self.window_size
+
+    def score(self, values):
+        if self.direction == 'below':
+            return -values
+        if self.direction == 'both':
+            return abs(values)
+        return values
+
+    def ranks(self, scores):
+        """Index of the highest stage each score is past, or -1."""
+        return np.searchsorted(self.thresholds, scores, side='left') - 1
+
+    def values(self, at, column, history_at, history):
+        """The rule's quantity for each batch reading; `history` holds the readings stored before it."""
+        if self.kind == 'threshold':
+            return column
+
+        n = len(history)
+        series = np.concatenate((history, column))
+        current = np.arange(n, len(series))
+        before = current - self.window_size
+        known = before >= 0
+        before = np.maximum(before, 0)
+
+        if self.kind == 'rate_of_change':
+            stamps = np.concatenate((history_at, at))
+            hours = (stamps[current] - stamps[before]) / np.timedelta64(1, 'h')
+            known &= hours > 0
+            return np.where(known, (series[current] - series[before]) / np.where(known, hours, 1), 0.0)
+
+        # Mean and variance of the preceding window from running sums,
+        # shifted by the first value to keep the subtraction well conditioned
+        shifted = series - series[0]
+        sums = np.concatenate(([0.0], np.cumsum(shifted)))
+        squares = np.concatenate(([0.0], np.cumsum(shifted * shifted)))
+        mean = (sums[current] - sums[before]) / self.window_size
+        variance = np.maximum((squares[current] - squares[before]) / self.window_size - mean * mean, 0.0)
+        spread = np.maximum(np.sqrt(variance), self.noise_floor)
+        known &= spread > 0
+        return np.where(known, (shifted[current] - mean) / np.where(known, spread, 1), 0.0)
+
+    def stage(self, severity):
+        return next((s for s in self.stages if s.severity == severity), None)
+
+    def rank(self, severity):
+        return next((i for i, s in enumerate(self.stages) if s.severity == severity), -1)
+
+    def message(self, kind, tank, value, severity, state):
+        label, unit = LABELS[self.metric]
+        if self.kind == 'zscore':
+            unit = ''
+        elif self.kind == 'rate_of_change' and self.metric == 'tank_level_per':
+            unit = ' points'
+        reason = None
+        if kind in ('raised', 'escalated'):
+            reason = "approaching capacity" if (self.metric, self.direction) == ('tank_level_per', 'above') else \
+                f"{self.direction} the {severity} limit of {_number(self.stage(severity).threshold)}{unit}"
+        template = MESSAGES[self.kind]['raised' if kind == 'escalated' else kind]
+        return template.format(
+            tank=tank, label=label, unit=unit, reason=reason, value=_number(value),
+            peak=_number(state.peak_value), raised_at=state.raised_at
+        )
+
+
+def compile_rule(row, cooldown, reminder):
+    """Validate an AlertRule row and compile it; raises ValueError describing what is wrong."""
+    if row.metric not in METRICS:
+        raise ValueError(f"metric must be one of {', '.join(METRICS)}")
+    if row.kind not in KINDS:
+        raise ValueError(f"kind must be one of {', '.join(KINDS)}")
+    if row.direction not in DIRECTIONS:
+        raise ValueError(f"direction must be one of {', '.join(DIRECTIONS)}")
+    if row.kind == 'threshold' and row.direction == 'both':
+        raise ValueError("direction 'both' needs a rate_of_change or zscore rule")
+    if row.warning is None and row.critical is None:
+        raise ValueError("warning or critical is required")
+    minimum = 2 if row.kind == 'zscore' else 1
+    if row.window_size is None or row.window_size < minimum:
+        raise ValueError(f"window_size must be at least {minimum}")
+    if (row.noise_floor or 0) < 0:
+        raise ValueError("noise_floor cannot be negative")
+
+    stages = [Stage(severity, threshold, severity == 'critical')
+              for severity, threshold in (('warning', row.warning), ('critical', row.critical))
+              if threshold is not None]
+    rule = CompiledRule(
+        row.condition, row.metric, row.kind, row.direction, stages, row.clear_at,
+        window_size=row.window_size, noise_floor=row.noise_floor or 0.0, cooldown=cooldown, reminder=reminder
+    )
+    if [s.severity for s in rule.stages] != [s.severity for s in stages]:
+        raise ValueError(f"critical must be further {row.direction} than warning")
+    if rule.clear_score >= rule.thresholds[0]:
+        raise ValueError(f"clear_at must be short of the lowest threshold ({row.direction})")
+    return rule
+
+
+class RuleSet:
+    """
+    The enabled alert rules, compiled once and shared by every ingest call
+    in this worker. Reloaded every `refresh_seconds` so edits made through
+    another worker take effect, and at once after invalidate().
+    """
+
+    def __init__(self, cooldown, reminder, refresh_seconds=60):
+        self.cooldown = cooldown
+        self.reminder = reminder
+        self.refresh_seconds = refresh_seconds
+        self._rules = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def rules(self):
+        """Compiled rules in condition order. Needs an app context on a reload."""
+        with self._lock:
+            if self._rules is None or time.monotonic() - self._loaded_at >= self.refresh_seconds:
+                compiled = []
+                for row in AlertRule.query.filter_by(enabled=True).order_by(AlertRule.condition):
+                    try:
+                        compiled.append(compile_rule(row, self.cooldown, self.reminder))
+                    except ValueError as e:
+                        print(f"[alert_rules] Skipping rule {row.condition}: {e}")
+                self._rules = compiled
+                self._loaded_at = time.monotonic()
+            return self._rules
+
+    def invalidate(self):
+        with self._lock:
+            self._rules = None
+
+
+def advance(rule, state, at, values):
+    """
+    Fold one tank's readings (`at` as datetime64 and the rule's `values`,
+    oldest first) into `state` and return the transitions as
+    (kind, severity, value, at). Readings older than the last one
+    evaluated are history and are skipped; quiet readings while the alert
+    is cleared leave it untouched.
+    """
+    if state.last_seen_at is not None:
+        fresh = at >= np.datetime64(state.last_seen_at)
+        at, values = at[fresh], values[fresh]
+    if not len(values):
+        return []
+
+    scores = rule.score(values)
+    ranks = rule.ranks(scores)
+    raising = ranks >= 0
+    clearing = scores <= rule.clear_score
+    was_active = state.status != 'cleared'
+
+    # Hysteresis: the latest raising or clearing reading decides whether
+    # the alert is active after each reading (they never coincide)
+    positions = np.arange(len(values))
+    last_event = np.maximum.accumulate(np.where(raising | clearing, positions, -1))
+    active_after = np.where(last_event >= 0, raising[np.maximum(last_event, 0)], was_active)
+    active_before = np.concatenate(([was_active], active_after[:-1]))
+    raised = ~active_before & raising
+    cleared = active_before & clearing
+    ongoing = active_before & ~clearing
+    touched = raised | ongoing | cleared
+    if not touched.any():
+        return []
+
+    # Severity only rises within an episode: a running max restarted at each
+    # raise, made monotonic across episodes by offsetting them
+    episode = np.cumsum(raised)
+    offset = len(rule.stages) + 1
+    start_rank = rule.rank(state.severity) if was_active else -1
+    keyed = episode * offset + np.where(raised | ongoing, ranks, -1) + 1
+    running = np.maximum.accumulate(np.concatenate(([start_rank + 1], keyed)))
+    severity_after = running[1:] - episode * offset - 1
+    severity_before = running[:-1] - np.concatenate(([0], episode[:-1])) * offset - 1
+    escalated = ongoing & (severity_after > severity_before)
+
+    reminder = ongoing & ~escalated
+    if state.notified_at is not None:
+        reminder &= at - np.datetime64(state.notified_at) >= np.timedelta64(rule.reminder)
+    else:
+        reminder[:] = False
+    # Within an episode the latest reminder outranks the earlier ones
+    reminders = np.flatnonzero(reminder)
+    if len(reminders):
+        reminder[:] = False
+        reminder[reminders[np.append(episode[reminders][1:] != episode[reminders][:-1], True)]] = True
+
+    transitions = []
+    for i in np.flatnonzero(raised | cleared | escalated | reminder):
+        kind = 'raised' if raised[i] else 'cleared' if cleared[i] else 'escalated' if escalated[i] else 'reminder'
+        severity = rule.stages[severity_after[i]].severity if severity_after[i] >= 0 else state.severity
+        transitions.append((kind, severity, float(values[i]), _datetime(at[i])))
+
+    # The state after the last reading that touched it
+    last = np.flatnonzero(touched)[-1]
+    raises = np.flatnonzero(raised)
+    first = 0
+    if len(raises):
+        first = raises[-1]
+        state.raised_at = _datetime(at[first])
+        state.cleared_at = None
+        state.peak_value = None
+        state.reading_count = 0
+    in_episode = (raised | ongoing) & (positions >= first)
+    if in_episode.any():
+        peak = np.flatnonzero(in_episode)[np.argmax(scores[in_episode])]
+        if state.peak_value is None or scores[peak] > rule.score(state.peak_value):
+            state.peak_value = float(values[peak])
+        state.reading_count = (state.reading_count or 0) + int(in_episode.sum())
+    # Only a raise touches a cleared alert, so the last touching reading tells the status
+    if cleared[last]:
+        state.status = 'cleared'
+        state.cleared_at = _datetime(at[last])
+    else:
+        state.status = 'raised' if raised[last] else 'ongoing'
+    if severity_after[last] >= 0:
+        state.severity = rule.stages[severity_after[last]].severity
+    state.value = float(values[last])
+    state.last_seen_at = _datetime(at[last])
+    return transitions
+
+
+def choose_notification(rule, state, transitions):
+    """The one transition worth announcing for this batch, if any."""
+    def announced_recently(severity, at):
+        return (state.notified_at is not None and at - state.notified_at < rule.cooldown
+                and rule.rank(severity) <= rule.rank(state.notified_severity))
+
+    candidates = []
+    for kind, severity, value, at in transitions:
+        if kind == 'raised' and announced_recently(severity, at):
+            continue  # flapping across the thresholds inside the cooldown window
+        if kind == 'reminder' and state.status == 'cleared':
+            continue
+        if kind == 'cleared' and (state.notified_at is None or state.notified_at < state.raised_at):
+            continue  # the episode was never announced, so neither is its end
+        candidates.append((PRIORITY.index(kind), -rule.rank(severity), -at.timestamp(), kind, severity, value, at))
+    if not candidates:
+        return None
+    _, _, _, kind, severity, value, at = min(candidates)
+    return kind, severity, value, at
+
+
+def batch_columns(readings):
+    """
+    A batch of reading dicts as NumPy columns sorted by (tank_id,
+    timestamp, id), plus the slice of each tank's rows.
+    """
+    n = len(readings)
+    columns = {
+        'tank_id': np.fromiter((r.get('tank_id') or DEFAULT_TANK_ID for r in readings), np.int64, n),
+        'timestamp': np.array([r['timestamp'] for r in readings], dtype='datetime64[us]'),
+        'id': np.fromiter((r.get('id') or 0 for r in readings), np.int64, n),
+    }
+    for metric in METRICS:
+        columns[metric] = np.fromiter((r[metric] for r in readings), np.float64, n)
+
+    order = np.lexsort((columns['id'], columns['timestamp'], columns['tank_id']))
+    columns = {name: column[order] for name, column in columns.items()}
+    tanks, starts = np.unique(columns['tank_id'], return_index=True)
+    ends = np.append(starts[1:], n)
+    return columns, [(int(tank_id), slice(start, end)) for tank_id, start, end in zip(tanks, starts, ends)]
+
+
+def load_history(tank_id, timestamp, reading_id, rows):
+    """Up to `rows` of a tank's readings stored before (timestamp, id), oldest first, as columns."""
+    history = db.session.execute(
+        select(SensorReading.timestamp, SensorReading.temp, SensorReading.ph, SensorReading.tank_level_per)
+        .where(
+            SensorReading.tank_id == tank_id,
+            or_(SensorReading.timestamp < timestamp,
+                and_(SensorReading.timestamp == timestamp, SensorReading.id < reading_id))
+        )
+        .order_by(SensorReading.timestamp.desc(), SensorReading.id.desc())
+        .limit(rows)
+    ).all()[::-1]
+    columns = {'timestamp': np.array([row[0] for row in history], dtype='datetime64[us]')}
+    for i, metric in enumerate(METRICS, start=1):
+        columns[metric] = np.fromiter((row[i] for row in history), np.float64, len(history))
+    return columns
+
+
+def evaluate(rule, tank_id, at, values, state=None):
+    """
+    Apply one tank's readings (oldest first) to its alert state for the
+    rule inside the caller's transaction. `state` is the row as already
+    loaded, if any. Returns the Notification created (already flushed) and
+    whether it should be emailed, or (None, False).
+    """
+    # Common case: nothing active and nothing to raise, decided without a lock or a write
+    if (state is None or state.status == 'cleared') and rule.ranks(rule.score(values).max()) < 0:
+        return None, False
+
+    # Row lock: concurrent ingests of the same tank and condition serialize here
+    key = (tank_id, rule.condition)
+    state = db.session.get(AlertState, key, with_for_update=True, populate_existing=True)
+    if state is None:
+        state = AlertState(tank_id=tank_id, condition=rule.condition, status='cleared', reading_count=0)
+        db.session.add(state)
+
+    chosen = choose_notification(rule, state, advance(rule, state, at, values))
+    if chosen is None:
+        db.session.flush()
+        return None, False
+
+    kind, severity, value, at = chosen
+    tank = db.session.get(Tank, tank_id)
+    notification = Notification(
+        message=rule.message(kind, tank.name if tank else f"Tank {tank_id}", value, severity, state),
+        severity='info' if kind == 'cleared' else severity,
+        notification_type=rule.condition,
+        tank_id=tank_id
+    )
+    db.session.add(notification)
+    db.session.flush()
+    record_notifications(1, notification.id)
+
+    if kind != 'cleared':
+        state.notified_at = at
+        state.notified_severity = severity
+    state.notification_id = notification.id
+    db.session.flush()
+
+    stage = rule.stage(severity)
+    return notification, bool(kind in ('raised', 'escalated') and stage and stage.email)
+
+
+def evaluate_batch(rules, readings):
+    """
+    Run every rule over stored readings (dicts with tank_id, timestamp, id
+    and the metrics) inside the caller's transaction. Returns
+    (notification, email) for each notification created, at most one per
+    tank and rule.
+    """
+    if not rules or not readings:
+        return []
+
+    columns, tanks = batch_columns(readings)
+    history_rows = max(rule.history for rule in rules)
+    conditions = [rule.condition for rule in rules]
+    # Every state the batch could touch, in one query; only the ones that change get locked
+    states = {
+        (state.tank_id, state.condition): state
+        for state in AlertState.query.filter(
+            AlertState.tank_id.in_([tank_id for tank_id, _ in tanks]),
+            AlertState.condition.in_(conditions)
+        )
+    }
+
+    results = []
+    for tank_id, rows in tanks:
+        at = columns['timestamp'][rows]
+        history = None
+        if history_rows:
+            history = load_history(tank_id, _datetime(at[0]), int(columns['id'][rows][0]), history_rows)
+        for rule in rules:
+            if rule.history:
+                values = rule.values(at, columns[rule.metric][rows],
+                                     history['timestamp'][-rule.history:], history[rule.metric][-rule.history:])
+            else:
+                values = rule.values(at, columns[rule.metric][rows], None, None)
+            notification, email = evaluate(rule, tank_id, at, values, states.get((tank_id, rule.condition)))
+            if notification is not None:
+                results.append((notification, email))
+    return results
+
+
+def notify_subscribers(notification, subject):
+    """
+    Queue the alert email for every opted-in user following the notification's
+    tank (subscribed to it, or to no tank at all); returns how many were queued.
+    """
+    query = db.session.query(User.email).filter_by(receive_email_alerts=True)
+    if notification.tank_id is not None:
+        query = query.filter(or_(
+            User.id.in_(select(TankSubscription.user_id).where(TankSubscription.tank_id == notification.tank_id)),
+            ~exists().where(TankSubscription.user_id == User.id)
+        ))
+    recipients = [email for (email,) in query]
+    return enqueue_emails(recipients, notification.message, subject)
@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_restful import Api, Resource, reqparse
 from flask_jwt_extended import (
     JWTManager,
@@ -18,14 +18,49 @@ from models import User
 from models import SensorReading
 from models import Notification
 from models import UserNotification
+from models import NotificationReadState
+from models import AlertState
+from models import AlertRule
+from models import Tank, TankSubscription, DEFAULT_TANK_ID
 
 from database import db
 import random 
-from datetime import datetime, timedelta
-from utils import is_valid_email, send_email_alert, check_tank_conditions, init_mail
-from predictor import TankPredictor
+from datetime import datetime, timedelta, timezone
+from utils import (
+    is_valid_email,
+    check_tank_conditions,
+    check_batch_conditions,
+    validate_sensor_reading,
+    unknown_tank_ids,
+    init_mail,
+)
+from events import EVENT_TYPES, StreamSlots, create_event_broker, format_sse, publish
+from mail_queue import MailWorker
+import metrics
+from notification_state import (
+    user_notifications_query,
+    read_status_columns,
+    unread_count,
+    read_totals,
+    mark_read,
+    mark_all_read,
+    start_read_state,
+)
+from pagination import InvalidCursor, encode_cursor, decode_cursor, page_link, count_rows
+from identity import get_current_user, get_current_user_id, get_current_admin, invalidate_user, user_cache
+from feature_store import FeatureStore
+from alert_engine import RuleSet, compile_rule
+from predictor import FEATURES, TankPredictor
+from model_registry import ModelRegistry, ModelWatcher, RegistryError, ShadowScorer
+from revocation import create_revocation_list
+from rollups import apply_readings as apply_rollups, query_rollups, BUCKETS as ROLLUP_BUCKETS, METRICS as ROLLUP_METRICS
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy import desc
+from sqlalchemy import case, desc, insert, or_, select, true, tuple_
+import csv
+import io
+import json
+import time
+import numpy as np
 
 # Load environment variables
 load_dotenv()
@@ -63,16 +98,122 @@ app.config['MAIL_PORT'] = int(os.getenv('MAIL_PORT', 465)) #set default value an
 app.config['MAIL_USE_SSL'] = True # force to True, since we are using 465
 app.config['MAIL_USE_TLS'] = False # force to False, since we are using 465
 
+# Logout revocations: 'database' (shared by all workers) or 'memory' (single process only)
+app.config['JWT_REVOCATION_STORE'] = os.getenv('JWT_REVOCATION_STORE', 'database')
+app.config['JWT_REVOCATION_REFRESH_SECONDS'] = int(os.getenv('JWT_REVOCATION_REFRESH_SECONDS', 10))
+
+# How long each worker trusts a cached user row (role, existence) before re-reading it
+app.config['USER_CACHE_TTL_SECONDS'] = int(os.getenv('USER_CACHE_TTL_SECONDS', 30))
+
+# Alert email outbox worker (set MAIL_WORKER_THREADS=0 when running `python mail_queue.py` as a sidecar)
+app.config['MAIL_WORKER_THREADS'] = int(os.getenv('MAIL_WORKER_THREADS', 1))
+app.config['MAIL_BATCH_SIZE'] = int(os.getenv('MAIL_BATCH_SIZE', 50))
+app.config['MAIL_POLL_SECONDS'] = int(os.getenv('MAIL_POLL_SECONDS', 30))
+
+# Live updates over /stream: 'auto' uses LISTEN/NOTIFY on PostgreSQL, in-process otherwise
+app.config['EVENTS_BACKEND'] = os.getenv('EVENTS_BACKEND', 'auto')
+app.config['SSE_KEEPALIVE_SECONDS'] = int(os.getenv('SSE_KEEPALIVE_SECONDS', 15))
+app.config['SSE_MAX_PENDING_EVENTS'] = int(os.getenv('SSE_MAX_PENDING_EVENTS', 100))
+# Each open stream holds a worker thread: end streams after SSE_MAX_STREAM_SECONDS (clients
+# reconnect) and refuse more than SSE_MAX_STREAMS per worker, leaving the other threads to the API
+app.config['SSE_MAX_STREAM_SECONDS'] = int(os.getenv('SSE_MAX_STREAM_SECONDS', 90))
+app.config['SSE_MAX_STREAMS'] = int(os.getenv('SSE_MAX_STREAMS', max(1, int(os.getenv('GUNICORN_THREADS', 16)) // 2)))
+
+# Forecast model artifact; 'r' memory-maps its arrays read-only (set MODEL_MMAP_MODE= to load into memory)
+app.config['MODEL_PATH'] = os.getenv('MODEL_PATH', 'tank_model.pkl')
+app.config['MODEL_MMAP_MODE'] = os.getenv('MODEL_MMAP_MODE', 'r') or None
+
+# Versioned models (see model_registry.py); MODEL_PATH is only used while the registry is empty.
+# Each worker checks for a newly activated version this often and swaps it in without a restart
+app.config['MODEL_REGISTRY_DIR'] = os.getenv('MODEL_REGISTRY_DIR', 'model_registry')
+app.config['MODEL_WATCH_SECONDS'] = int(os.getenv('MODEL_WATCH_SECONDS', 10))
+
+# Predictor lag features: readings kept per worker, and how often the window is reloaded
+# from sensor_readings to pick up rows written without an event
+app.config['FEATURE_WINDOW_SIZE'] = int(os.getenv('FEATURE_WINDOW_SIZE', 6))
+app.config['FEATURE_STORE_REFRESH_SECONDS'] = int(os.getenv('FEATURE_STORE_REFRESH_SECONDS', 300))
+
+# Rows fetched per round trip by /sensorreadings/export
+app.config['EXPORT_CHUNK_ROWS'] = int(os.getenv('EXPORT_CHUNK_ROWS', 1000))
+
+# Upper bound on rows accepted by /sensor-readings/batch and /predict/batch in one request
+app.config['SENSOR_BATCH_MAX_ROWS'] = int(os.getenv('SENSOR_BATCH_MAX_ROWS', 1000))
+app.config['PREDICT_BATCH_MAX_ROWS'] = int(os.getenv('PREDICT_BATCH_MAX_ROWS', 1000))
+
+# Alerts (see alert_engine.py) come from the alert_rules table, compiled once per worker and
+# reloaded every ALERT_RULES_REFRESH_SECONDS. Re-raises inside the cooldown are not re-announced,
+# and an alert still active after ALERT_REMINDER_MINUTES is announced again
+app.config['ALERT_RULES_REFRESH_SECONDS'] = int(os.getenv('ALERT_RULES_REFRESH_SECONDS', 60))
+app.config['ALERT_COOLDOWN_MINUTES'] = int(os.getenv('ALERT_COOLDOWN_MINUTES', 60))
+app.config['ALERT_REMINDER_MINUTES'] = int(os.getenv('ALERT_REMINDER_MINUTES', 360))
+
+
+# /metrics (Prometheus text format). With METRICS_DIR set, workers share snapshots there so a
+# scrape of any worker covers all of them; METRICS_TOKEN, when set, is required as a Bearer token.
+# A request repeating one SQL statement N_PLUS_ONE_THRESHOLD times is logged as an N+1 pattern
+app.config['METRICS_DIR'] = os.getenv('METRICS_DIR')
+app.config['METRICS_FLUSH_SECONDS'] = int(os.getenv('METRICS_FLUSH_SECONDS', 15))
+app.config['METRICS_TOKEN'] = os.getenv('METRICS_TOKEN')
+app.config['N_PLUS_ONE_THRESHOLD'] = int(os.getenv('N_PLUS_ONE_THRESHOLD', 10))
+
+# Let Flask-JWT-Extended's handlers answer expired or revoked tokens with 401
+# instead of Flask-RESTful turning its exceptions into 500s
+app.config['PROPAGATE_EXCEPTIONS'] = True
 
 # Initialize extensions
 migrate = Migrate(app, db)
 db.init_app(app)
 api = Api(app)
 jwt = JWTManager(app)
+metrics.init_app(app)
+
+user_cache.ttl_seconds = app.config['USER_CACHE_TTL_SECONDS']
 
 # Initialize Flask-Mail
 mail = init_mail(app)  # Initialize flask-mail here
-predictor = TankPredictor()
+app.extensions['mail_worker'] = MailWorker(
+    app,
+    threads=app.config['MAIL_WORKER_THREADS'],
+    batch_size=app.config['MAIL_BATCH_SIZE'],
+    poll_seconds=app.config['MAIL_POLL_SECONDS']
+)
+
+
+@app.before_request
+def start_mail_worker():
+    # Outside gunicorn (no post_fork) the first request starts the pool
+    app.extensions['mail_worker'].start()
+
+
+app.extensions['events'] = create_event_broker(app)
+app.extensions['sse_streams'] = StreamSlots()
+app.extensions['alert_rules'] = RuleSet(
+    cooldown=timedelta(minutes=app.config['ALERT_COOLDOWN_MINUTES']),
+    reminder=timedelta(minutes=app.config['ALERT_REMINDER_MINUTES']),
+    refresh_seconds=app.config['ALERT_RULES_REFRESH_SECONDS']
+)
+model_registry = ModelRegistry(app.config['MODEL_REGISTRY_DIR'], mmap_mode=app.config['MODEL_MMAP_MODE'])
+active_version = model_registry.state().get('version')
+predictor = TankPredictor(
+    cache_size=int(os.getenv('FORECAST_CACHE_SIZE', 1024)),
+    cache_quantum=float(os.getenv('FORECAST_CACHE_QUANTUM', 0.01)),
+    model_path=app.config['MODEL_PATH'],
+    mmap_mode=app.config['MODEL_MMAP_MODE'],
+    loaded=model_registry.load(active_version) if active_version else None
+)
+predictor.feature_store = FeatureStore(
+    predictor.calculate_reading,
+    capacity=app.config['FEATURE_WINDOW_SIZE'],
+    refresh_seconds=app.config['FEATURE_STORE_REFRESH_SECONDS'],
+    broker=app.extensions['events']
+)
+shadow_scorer = ShadowScorer(predictor)
+predictor.observer = shadow_scorer.observe
+app.extensions['events'].add_listener(shadow_scorer.on_event)
+model_watcher = ModelWatcher(
+    model_registry, predictor, shadow=shadow_scorer, interval=app.config['MODEL_WATCH_SECONDS']
+)
+model_watcher.check()
 
 
 @jwt.unauthorized_loader
@@ -83,13 +224,13 @@ def missing_token_callback(error):
     }), 401
 
 
-# JWT token blocklist (for logout)
-blacklist = set()
+# JWT token blocklist (for logout), shared across workers and self-expiring
+blacklist = create_revocation_list(app.config)
 
 @jwt.token_in_blocklist_loader
 def check_if_token_in_blacklist(jwt_header, jwt_payload):
     jti = jwt_payload['jti']
-    return jti in blacklist
+    return blacklist.is_revoked(jti)
 
 class Register(Resource):
     def post(self):
@@ -123,6 +264,8 @@ class Register(Resource):
         new_user.set_password(password)
         
         db.session.add(new_user)
+        db.session.flush()
+        start_read_state(new_user.id)
         db.session.commit()
 
         return {
@@ -180,25 +323,28 @@ class Login(Resource):
 class Logout(Resource):
     @jwt_required()
     def post(self):
-        jti = get_jwt()["jti"]
-        if jti in blacklist:
+        token = get_jwt()
+        jti = token["jti"]
+        if blacklist.is_revoked(jti):
             return {"message": "Already logged out"}, 200
         
-        blacklist.add(jti)
+        blacklist.revoke(jti, datetime.utcfromtimestamp(token["exp"]))
         return {"message": "Successfully logged out"}, 200
 
 
 class RefreshToken(Resource):
     @jwt_required(refresh=True)
     def post(self):
-        user_id = get_jwt_identity()
-        claims = get_jwt()
+        user = get_current_user()
+        if not user:
+            return {"error": "User not found"}, 404
 
+        # Claims come from the current row, so role changes reach new tokens
         new_token = create_access_token(
-            identity=user_id,
+            identity=str(user.id),
             additional_claims={
-                "email": claims.get("email"),
-                "role": claims.get("role")
+                "email": user.email,
+                "role": user.role
             }
         )
         return {"access_token": new_token}, 200
@@ -206,8 +352,7 @@ class RefreshToken(Resource):
 class Protected(Resource):
     @jwt_required()
     def get(self):
-        user_id = get_jwt_identity()
-        user = User.query.get(int(user_id))
+        user = get_current_user()
 
         if not user:
             return {"error": "User not found."}, 404
@@ -223,11 +368,27 @@ class Protected(Resource):
         }, 200
 
 class UsersList(Resource):
+    """
+    Admin user listing: ?q= searches full_name and email (substring, or
+    prefix with match=prefix), ?role= filters, ?sort=/&order= choose a
+    keyset order and ?count=estimate|exact|none controls the total.
+    """
+    SORTS = {
+        'full_name': (User.full_name, str),
+        'email': (User.email, str),
+        'created_at': (User.created_at, datetime),
+        'id': (User.id, int),
+    }
+    MAX_LIMIT = 100
+
+    @staticmethod
+    def _escape_like(value):
+        return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
     @jwt_required()
     def get(self):
         # Get current user identity from JWT
-        current_user_id = get_jwt_identity()
-        current_user = User.query.get(int(current_user_id))
+        current_user = get_current_user()
         
         # Check if user exists and is admin
         if not current_user:
@@ -235,10 +396,51 @@ class UsersList(Resource):
             
         if current_user.role != 'Admin':
             return {"error": "Admin privileges required"}, 403
-        
-        # Get all users from database
-        users = User.query.all()
-        
+
+        sort = request.args.get('sort', 'full_name')
+        order = request.args.get('order', 'asc')
+        if sort not in self.SORTS or order not in ('asc', 'desc'):
+            return {"error": f"sort must be one of {', '.join(self.SORTS)} and order asc or desc"}, 400
+        sort_column, sort_type = self.SORTS[sort]
+        limit = max(1, min(request.args.get('limit', 25, type=int), self.MAX_LIMIT))
+
+        query = select(User.id, User.full_name, User.email, User.role, User.created_at)
+
+        # Trigram indexes on PostgreSQL serve both prefix and substring ILIKE
+        search = request.args.get('q', '').strip()
+        if search:
+            pattern = self._escape_like(search) + '%'
+            if request.args.get('match') != 'prefix':
+                pattern = '%' + pattern
+            query = query.where(or_(
+                User.full_name.ilike(pattern, escape='\\'),
+                User.email.ilike(pattern, escape='\\')
+            ))
+        if request.args.get('role') in ('Admin', 'Normal'):
+            query = query.where(User.role == request.args['role'])
+
+        key = tuple_(sort_column, User.id)
+        page_query = query
+        cursor = request.args.get('cursor')
+        if cursor:
+            try:
+                values, _ = decode_cursor(cursor, (sort_type, int))
+            except InvalidCursor as e:
+                return {"error": str(e)}, 400
+            page_query = page_query.where(key > tuple_(*values) if order == 'asc' else key < tuple_(*values))
+
+        ordering = (sort_column.asc(), User.id.asc()) if order == 'asc' else (sort_column.desc(), User.id.desc())
+        users = db.session.execute(page_query.order_by(*ordering).limit(limit + 1)).all()
+        has_more = len(users) > limit
+        users = users[:limit]
+
+        next_cursor = None
+        if has_more:
+            last = users[-1]
+            next_cursor = encode_cursor((getattr(last, sort), last.id))
+
+        total, is_estimate = count_rows(query, request.args.get('count', 'estimate'))
+
         # Prepare response data
         users_data = [{
             "id": user.id,
@@ -251,18 +453,25 @@ class UsersList(Resource):
         return {
             "message": "Users retrieved successfully",
             "users": users_data,
-            "count": len(users_data)
+            "count": len(users_data),
+            "pagination": {
+                "mode": "cursor",
+                "limit": limit,
+                "next_cursor": next_cursor,
+                "next": page_link(next_cursor),
+                "total_items": total,
+                "total_is_estimate": is_estimate
+            }
         }, 200
 class UserUpdateDelete(Resource):
     @jwt_required()
     def put(self, user_id):
-        current_user_id = get_jwt_identity()
-        current_user = User.query.get(int(current_user_id))
+        current_user = get_current_admin()
 
-        if not current_user or current_user.role != 'Admin':
+        if not current_user:
             return {"error": "Admin privileges required"}, 403
 
-        user = User.query.get(int(user_id))
+        user = db.session.get(User, int(user_id))
         if not user:
             return {"error": "User not found"}, 404
 
@@ -288,6 +497,7 @@ class UserUpdateDelete(Resource):
             user.set_password(password)
 
         db.session.commit()
+        invalidate_user(user.id)
 
         return {
             "message": "User updated successfully",
@@ -301,42 +511,48 @@ class UserUpdateDelete(Resource):
 
     @jwt_required()
     def delete(self, user_id):
-        current_user_id = get_jwt_identity()
-        current_user = User.query.get(int(current_user_id))
+        current_user = get_current_admin()
 
-        if not current_user or current_user.role != 'Admin':
+        if not current_user:
             return {"error": "Admin privileges required"}, 403
 
-        if int(current_user_id) == int(user_id):
+        if current_user.id == int(user_id):
             return {"error": "Cannot delete yourself"}, 400
 
-        user = User.query.get(int(user_id))
+        user = db.session.get(User, int(user_id))
         if not user:
             return {"error": "User not found"}, 404
 
         db.session.delete(user)
         db.session.commit()
+        invalidate_user(user_id)
 
         return {"message": "User deleted successfully"}, 200
 
 class SensorReadings(Resource):
-    def get(self):
+    @staticmethod
+    def filtered_query():
+        """SensorReading query with the request's filters applied (shared with other reading endpoints)."""
         # Get all possible filters
         filters = {
+            'tank_id': request.args.get('tank_id', type=int),
             'temp': request.args.get('temp', type=float),
             'ph': request.args.get('ph', type=float),
             'tank_level_min': request.args.get('tank_level_min', type=float),
             'tank_level_max': request.args.get('tank_level_max', type=float),
             # REMOVE predicted_full
             #'predicted_full': request.args.get('predicted_full', type=lambda x: x.lower() == 'true'),
-            'start_date': request.args.get('start_date'),
-            'end_date': request.args.get('end_date')
+            'start_date': request.args.get('start_date') or request.args.get('start'),
+            'end_date': request.args.get('end_date') or request.args.get('end')
         }
 
         # Start building query
         query = SensorReading.query
 
         # Apply filters
+        if filters['tank_id'] is not None:
+            query = query.filter(SensorReading.tank_id == filters['tank_id'])
+
         if filters['temp']:
             query = query.filter(SensorReading.temp == filters['temp'])
 
@@ -354,30 +570,55 @@ class SensorReadings(Resource):
         #    query = query.filter(SensorReading.predicted_full == filters['predicted_full'])
 
         if filters['start_date']:
-            query = query.filter(SensorReading.timestamp >= filters['start_date'])
+            query = query.filter(SensorReading.timestamp >= SensorReadings._as_timestamp(filters['start_date']))
 
         if filters['end_date']:
-            query = query.filter(SensorReading.timestamp <= filters['end_date'])
+            query = query.filter(SensorReading.timestamp <= SensorReadings._as_timestamp(filters['end_date']))
+
+        return query
+
+    @staticmethod
+    def _as_timestamp(value):
+        # Compare as datetimes: SQLite stores "YYYY-MM-DD HH:MM:SS", so a raw
+        # ISO string with a "T" would compare as text and miss rows
+        try:
+            parsed = datetime.fromisoformat(value)
+        except ValueError:
+            return value
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+        return parsed
+
+    @staticmethod
+    def serialize(reading):
+        return {
+            "id": reading.id,
+            "tank_id": reading.tank_id,
+            "timestamp": reading.timestamp.isoformat(),
+            "temp": reading.temp,
+            "ph": reading.ph,
+            "tank_level_per": reading.tank_level_per,
+            # REMOVE predicted_full from output
+            #"predicted_full": reading.predicted_full
+        }
+
+    def get(self):
+        query = self.filtered_query()
+        limit = min(request.args.get('limit', 10, type=int), 100)
+
+        # ?cursor= (empty for the first page) or ?paginate=cursor selects keyset mode
+        if 'cursor' in request.args or request.args.get('paginate') == 'cursor':
+            return self._cursor_page(query, limit)
 
         # Paginate and return
         page = request.args.get('page', 1, type=int)
-        limit = min(request.args.get('limit', 10, type=int), 100)
 
         readings = query.order_by(SensorReading.timestamp.desc()).paginate(
             page=page, per_page=limit, error_out=False
         )
 
         return {
-            "readings": [
-                {
-                    "id": reading.id,
-                    "timestamp": reading.timestamp.isoformat(),
-                    "temp": reading.temp,
-                    "ph": reading.ph,
-                    "tank_level_per": reading.tank_level_per,
-                    # REMOVE predicted_full from output
-                    #"predicted_full": reading.predicted_full
-                } for reading in readings.items],
+            "readings": [self.serialize(reading) for reading in readings.items],
             "pagination": {
                 "page": page,
                 "limit": limit,
@@ -386,140 +627,483 @@ class SensorReadings(Resource):
             }
         }, 200
 
+    def _cursor_page(self, query, limit):
+        """Keyset page over (timestamp, id) DESC: no OFFSET, and no COUNT unless asked for."""
+        cursor = request.args.get('cursor')
+        direction = 'next'
+        key = tuple_(SensorReading.timestamp, SensorReading.id)
+
+        page_query = query
+        if cursor:
+            try:
+                (timestamp, reading_id), direction = decode_cursor(cursor, (datetime, int))
+            except InvalidCursor as e:
+                return {"error": str(e)}, 400
+            if direction == 'next':
+                page_query = page_query.filter(key < tuple_(timestamp, reading_id))
+            else:
+                page_query = page_query.filter(key > tuple_(timestamp, reading_id))
+
+        if direction == 'next':
+            order = (SensorReading.timestamp.desc(), SensorReading.id.desc())
+        else:
+            order = (SensorReading.timestamp.asc(), SensorReading.id.asc())
+
+        # One extra row tells us whether another page exists in this direction
+        readings = page_query.order_by(*order).limit(limit + 1).all()
+        has_more = len(readings) > limit
+        readings = readings[:limit]
+        if direction == 'prev':
+            readings.reverse()
+
+        next_cursor = prev_cursor = None
+        if readings:
+            first, last = readings[0], readings[-1]
+            if has_more or direction == 'prev':
+                next_cursor = encode_cursor((last.timestamp, last.id), 'next')
+            if (has_more and direction == 'prev') or (cursor and direction == 'next'):
+                prev_cursor = encode_cursor((first.timestamp, first.id), 'prev')
+
+        total, is_estimate = count_rows(query.statement, request.args.get('count', 'none'))
+
+        return {
+            "readings": [self.serialize(reading) for reading in readings],
+            "pagination": {
+                "mode": "cursor",
+                "limit": limit,
+                "next_cursor": next_cursor,
+                "prev_cursor": prev_cursor,
+                "next": page_link(next_cursor),
+                "prev": page_link(prev_cursor),
+                "total_items": total,
+                "total_is_estimate": is_estimate
+            }
+        }, 200
+
+class SensorReadingsExport(Resource):
+    """
+    Stream every reading matching the SensorReadings filters, oldest first,
+    as CSV or NDJSON. Rows come off a server-side cursor in chunks, so a
+    worker's memory stays flat however long the range is.
+    """
+    COLUMNS = ('id', 'tank_id', 'timestamp', 'temp', 'ph', 'tank_level_per')
+    FORMATS = {
+        'csv': ('text/csv', 'csv'),
+        'ndjson': ('application/x-ndjson', 'ndjson'),
+    }
+
+    def get(self):
+        export_format = request.args.get('format', 'csv')
+        if export_format not in self.FORMATS:
+            return {"error": "format must be one of: csv, ndjson"}, 400
+
+        statement = (
+            SensorReadings.filtered_query()
+            .with_entities(*(getattr(SensorReading, column) for column in self.COLUMNS))
+            .order_by(SensorReading.timestamp.asc(), SensorReading.id.asc())
+            .statement
+            .execution_options(yield_per=app.config['EXPORT_CHUNK_ROWS'])
+        )
+        write_chunk = self._csv_chunk if export_format == 'csv' else self._ndjson_chunk
+
+        # The request context (and its session) is gone by the time this runs,
+        # so the generator opens its own app context for the cursor's lifetime
+        def generate():
+            if export_format == 'csv':
+                yield ','.join(self.COLUMNS) + '\n'
+            with app.app_context():
+                for rows in db.session.execute(statement).partitions():
+                    yield write_chunk(rows)
+
+        mimetype, extension = self.FORMATS[export_format]
+        return Response(generate(), mimetype=mimetype, headers={
+            'Content-Disposition': f'attachment; filename=sensor_readings.{extension}'
+        })
+
+    @staticmethod
+    def _csv_chunk(rows):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator='\n')
+        writer.writerows(
+            (reading_id, tank_id, timestamp.isoformat(), temp, ph, level)
+            for reading_id, tank_id, timestamp, temp, ph, level in rows
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def _ndjson_chunk(cls, rows):
+        return ''.join(
+            json.dumps(dict(zip(cls.COLUMNS, (reading_id, tank_id, timestamp.isoformat(), temp, ph, level)))) + '\n'
+            for reading_id, tank_id, timestamp, temp, ph, level in rows
+        )
+
+class SensorReadingsAggregate(Resource):
+    # Default window per bucket size when start/end are omitted
+    DEFAULT_SPANS = {'5m': timedelta(days=1), '1h': timedelta(days=7), '1d': timedelta(days=90)}
+
+    @staticmethod
+    def _as_utc(value):
+        # Rollups are stored as naive UTC; offset-aware bounds are converted to match
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+
+    def get(self):
+        bucket = request.args.get('bucket', '1h')
+        if bucket not in ROLLUP_BUCKETS:
+            return {"error": f"bucket must be one of {', '.join(ROLLUP_BUCKETS)}"}, 400
+
+        try:
+            end = request.args.get('end')
+            end = self._as_utc(datetime.fromisoformat(end)) if end else datetime.utcnow()
+            start = request.args.get('start')
+            start = self._as_utc(datetime.fromisoformat(start)) if start else end - self.DEFAULT_SPANS[bucket]
+        except ValueError:
+            return {"error": "start and end must be ISO 8601 timestamps"}, 400
+        if start > end:
+            return {"error": "start must be before end"}, 400
+
+        # Without tank_id every bucket combines the whole fleet
+        tank_id = request.args.get('tank_id', type=int)
+
+        buckets = []
+        for rollup in query_rollups(bucket, start, end, tank_id):
+            entry = {
+                "bucket_start": rollup.bucket_start.isoformat(),
+                "count": rollup.reading_count
+            }
+            for metric in ROLLUP_METRICS:
+                entry[metric] = {
+                    "min": getattr(rollup, f'{metric}_min'),
+                    "max": getattr(rollup, f'{metric}_max'),
+                    "avg": round(getattr(rollup, f'{metric}_sum') / rollup.reading_count, 3)
+                }
+            buckets.append(entry)
+
+        return {
+            "bucket": bucket,
+            "tank_id": tank_id,
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "buckets": buckets
+        }, 200
+
 class CreateSensorReading(Resource):
     def post(self):
         data = request.get_json()
 
+        # Sensors that predate multi-tank support send no tank_id
+        tank_id = data.get('tank_id', DEFAULT_TANK_ID)
+        if isinstance(tank_id, bool) or not isinstance(tank_id, int) or \
+                (tank_id != DEFAULT_TANK_ID and unknown_tank_ids([tank_id])):
+            return {"error": "Unknown tank_id"}, 400
+
         new_reading = SensorReading(
+            tank_id=tank_id,
             temp=data.get('temp'),
             ph=data.get('ph'),
             tank_level_per=data.get('tank_level_per')
         )
 
         db.session.add(new_reading)
+        db.session.flush()
+        apply_rollups([new_reading])  # Same transaction as the insert
         db.session.commit()
 
+        reading = {
+            "id": new_reading.id,
+            "tank_id": new_reading.tank_id,
+            "timestamp": new_reading.timestamp.isoformat(),
+            "temp": new_reading.temp,
+            "ph": new_reading.ph,
+            "tank_level_per": new_reading.tank_level_per,
+        }
+        publish(app, 'reading', reading)
+
         check_tank_conditions(new_reading, app, db)  # Call check_tank_conditions
 
         return {
             "message": "Sensor reading created successfully",
-            "reading": {
-                "id": new_reading.id,
-                "timestamp": new_reading.timestamp.isoformat(),
-                "temp": new_reading.temp,
-                "ph": new_reading.ph,
-                "tank_level_per": new_reading.tank_level_per,
-            }
+            "reading": reading
         }, 201
 
+class CreateSensorReadingsBatch(Resource):
+    NDJSON_MIMETYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+
+    def _parse_body(self):
+        """Return (rows, parse_errors) from a JSON array or an NDJSON body."""
+        raw = request.get_data(as_text=True)
+
+        if request.mimetype in self.NDJSON_MIMETYPES:
+            rows, parse_errors = [], {}
+            for line in raw.splitlines():
+                if not line.strip():
+                    continue
+                try:
+                    rows.append(json.loads(line))
+                except ValueError:
+                    parse_errors[len(rows)] = {"row": "Invalid JSON line"}
+                    rows.append(None)
+            return rows, parse_errors
+
+        try:
+            rows = json.loads(raw)
+        except ValueError:
+            return None, None
+        if isinstance(rows, dict):
+            rows = rows.get('readings')
+        if not isinstance(rows, list):
+            return None, None
+        return rows, {}
+
+    def post(self):
+        rows, parse_errors = self._parse_body()
+        if rows is None:
+            return {"error": "Body must be a JSON array, {\"readings\": [...]} or NDJSON"}, 400
+        if not rows:
+            return {"error": "No readings supplied"}, 400
+
+        max_rows = app.config['SENSOR_BATCH_MAX_ROWS']
+        if len(rows) > max_rows:
+            return {"error": f"Batch too large (max {max_rows} readings)"}, 413
+
+        # Validate the whole payload before touching the database
+        results = []
+        valid = []
+        for index, row in enumerate(rows):
+            if index in parse_errors:
+                results.append({"index": index, "status": "rejected", "errors": parse_errors[index]})
+                continue
+            values, errors = validate_sensor_reading(row)
+            if errors:
+                results.append({"index": index, "status": "rejected", "errors": errors})
+                continue
+            values.setdefault('timestamp', func.now())
+            values.setdefault('tank_id', DEFAULT_TANK_ID)
+            results.append({"index": index, "status": "created"})
+            valid.append((index, values))
+
+        # One lookup for every tank the batch names
+        unknown = unknown_tank_ids({values['tank_id'] for _, values in valid} - {DEFAULT_TANK_ID})
+        if unknown:
+            for index, values in valid:
+                if values['tank_id'] in unknown:
+                    results[index] = {"index": index, "status": "rejected", "errors": {"tank_id": "Unknown tank"}}
+            valid = [(index, values) for index, values in valid if values['tank_id'] not in unknown]
+
+        if not valid:
+            return {
+                "error": "No valid readings in batch",
+                "accepted": 0,
+                "rejected": len(rows),
+                "results": results
+            }, 400
+
+        # One multi-row INSERT ... RETURNING and a single commit for the batch
+        try:
+            inserted = db.session.execute(
+                insert(SensorReading)
+                .values([values for _, values in valid])
+                .returning(
+                    SensorReading.id,
+                    SensorReading.tank_id,
+                    SensorReading.timestamp,
+                    SensorReading.temp,
+                    SensorReading.ph,
+                    SensorReading.tank_level_per
+                )
+            ).mappings().all()
+            # Ids are assigned in VALUES order, so sorting by id lines rows back up
+            created = sorted((dict(r) for r in inserted), key=lambda r: r['id'])
+            apply_rollups(created)
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+            return {"error": "Database error"}, 500
+
+        for (index, _), reading in zip(valid, created):
+            results[index].update({
+                "id": reading['id'],
+                "timestamp": reading['timestamp'].isoformat()
+            })
+
+        # One event for the batch: listeners refetch rather than replay every row
+        newest = max(created, key=lambda r: (r['timestamp'], r['id']))
+        publish(app, 'reading', dict(newest, timestamp=newest['timestamp'].isoformat(), batch_size=len(created)))
+
+        check_batch_conditions(created, app, db)
+
+        rejected = len(rows) - len(created)
+        return {
+            "message": f"Created {len(created)} sensor readings",
+            "accepted": len(created),
+            "rejected": rejected,
+            "results": results
+        }, 207 if rejected else 201
+
+
+class EventStream(Resource):
+    """
+    Server-Sent Events feed of new readings and notifications. EventSource
+    cannot set headers, so clients authenticate with ?jwt=<access token>.
+    The stream ends after SSE_MAX_STREAM_SECONDS ("reconnect") or when the
+    token expires ("token-expired"); the client reconnects either way.
+    Past SSE_MAX_STREAMS open streams in this worker it answers 503.
+    """
+    @jwt_required()
+    def get(self):
+        kinds = {k for k in request.args.get('types', '').split(',') if k}
+        unknown = kinds - set(EVENT_TYPES)
+        if unknown:
+            return {"error": f"Unknown event types: {', '.join(sorted(unknown))}"}, 400
+
+        slots = app.extensions['sse_streams']
+        if not slots.acquire(app.config['SSE_MAX_STREAMS']):
+            return {"error": "Too many open streams; retry shortly"}, 503, {'Retry-After': '30'}
+
+        expires_at = get_jwt()['exp']
+        ends_at = min(expires_at, time.time() + app.config['SSE_MAX_STREAM_SECONDS'])
+        keepalive = app.config['SSE_KEEPALIVE_SECONDS']
+        broker = app.extensions['events']
+        subscription = broker.subscribe(kinds or None)
+        closed = []
+
+        def close():
+            # From the generator's finally or the response's close, whichever comes first
+            if not closed:
+                closed.append(True)
+                broker.unsubscribe(subscription)
+                slots.release()
+
+        # Runs after the request context is gone, so it must not touch db.session
+        def generate():
+            try:
+                yield f"retry: {keepalive * 1000}\n\n"
+                while True:
+                    remaining = ends_at - time.time()
+                    if remaining <= 0:
+                        kind = "token-expired" if ends_at >= expires_at else "reconnect"
+                        yield format_sse({"type": kind, "data": {}})
+                        return
+                    event = subscription.next(timeout=min(keepalive, remaining))
+                    yield format_sse(event) if event else ": keepalive\n\n"
+            finally:
+                close()
+
+        response = Response(generate(), mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'  # don't let a proxy buffer the stream
+        })
+        # A client gone before the first chunk never runs the generator's finally
+        response.call_on_close(close)
+        return response
+
 
 class UserNotifications(Resource):
+    """
+    The caller's notifications since they registered, newest first,
+    keyset-paginated over (created_at, id) DESC with ?limit= and ?cursor=.
+    """
+    MAX_LIMIT = 200
+
     @jwt_required()
     def get(self):
-        user_id = get_jwt_identity()
-        user = User.query.get(int(user_id))
+        user = get_current_user()
         
         if not user:
             return {"error": "User not found"}, 404
-        
-        user_notifications = (
-            UserNotification.query
-            .join(Notification)
-            .filter(UserNotification.user_id == user.id)
-            .order_by(Notification.created_at.desc())
-            .all()
+
+        limit = max(1, min(request.args.get('limit', 50, type=int), self.MAX_LIMIT))
+        before = None
+        cursor = request.args.get('cursor')
+        if cursor:
+            try:
+                before, _ = decode_cursor(cursor, (datetime, int))
+            except InvalidCursor as e:
+                return {"error": str(e)}, 400
+
+        rows = user_notifications_query(
+            user.id, limit=limit + 1, tank_id=request.args.get('tank_id', type=int), before=before
         )
-        
+        next_cursor = encode_cursor((rows[limit - 1].created_at, rows[limit - 1].id)) if len(rows) > limit else None
+
         notifications_data = []
-        for un in user_notifications:
+        for n in rows[:limit]:
             notifications_data.append({
-                "user_notification_id": un.id,  # Join table ID
-                "notification_id": un.notification.id,
-                "message": un.notification.message,
-                "severity": un.notification.severity,
-                "notification_type": un.notification.notification_type,
-                "created_at": un.notification.created_at.isoformat(),
-                "is_read": un.is_read,
-                "read_at": un.read_at.isoformat() if un.read_at else None
+                # Broadcasts have no per-user row; the client keys reads on this id
+                "user_notification_id": n.id,
+                "notification_id": n.id,
+                "message": n.message,
+                "severity": n.severity,
+                "notification_type": n.notification_type,
+                "tank_id": n.tank_id,
+                "created_at": n.created_at.isoformat(),
+                "is_read": bool(n.is_read),
+                "read_at": n.read_at.isoformat() if n.read_at else None
             })
         
         return {
             "message": "Notifications retrieved successfully",
-            "notifications": notifications_data
+            "notifications": notifications_data,
+            "pagination": {
+                "mode": "cursor",
+                "limit": limit,
+                "next_cursor": next_cursor,
+                "next": page_link(next_cursor)
+            }
         }, 200
 
 class MarkNotificationRead(Resource):
     @jwt_required()
     def patch(self, user_notification_id):  # Changed parameter name
-        user_id = get_jwt_identity()
-        user = User.query.get(int(user_id))
+        user = get_current_user()
         
         if not user:
             return {"error": "User not found"}, 404
         
-        user_notification = UserNotification.query.filter_by(
-            id=user_notification_id,  # Using join table ID
-            user_id=user.id
-        ).first()
+        status = mark_read(user.id, user_notification_id)
+        db.session.commit()
         
-        if not user_notification:
+        if status is None:
             return {"error": "User notification not found"}, 404
         
-        if not user_notification.is_read:
-            user_notification.is_read = True
-            user_notification.read_at = func.now()
-            db.session.commit()
-        
+        is_read, read_at = status
         return jsonify({
             "success": True,
-            "user_notification_id": user_notification.id,
-            "is_read": user_notification.is_read,
-            "read_at": user_notification.read_at.isoformat() if user_notification.read_at else None
+            "user_notification_id": user_notification_id,
+            "is_read": is_read,
+            "read_at": read_at.isoformat() if read_at else None
         })
 
 class UnreadNotificationsCount(Resource):
     @jwt_required()
     def get(self):
         # Get current user identity
-        user_id = get_jwt_identity()
-        user = User.query.get(int(user_id))
+        user = get_current_user()
         
         if not user:
             return {"error": "User not found"}, 404
         
         # Count unread notifications
-        unread_count = (
-            UserNotification.query
-            .filter_by(user_id=user.id, is_read=False)
-            .count()
-        )
+        unread = unread_count(user.id)
         
         return {
             "message": "Unread notifications count retrieved",
-            "unread_count": unread_count
+            "unread_count": unread
         }, 200
 class MarkAllNotificationsRead(Resource):
     @jwt_required()
     def patch(self):
         # Get current user identity
-        user_id = get_jwt_identity()
-        user = User.query.get(int(user_id))
+        user = get_current_user()
         
         if not user:
             return {"error": "User not found"}, 404
         
         try:
-            # Get current timestamp
-            current_time = func.now()
-            
-            # Update all unread notifications for this user
-            updated = UserNotification.query.filter_by(
-                user_id=user.id,
-                is_read=False
-            ).update({
-                'is_read': True,
-                'read_at': current_time
-            })
+            # Move the read watermark; one row regardless of how many were unread
+            updated = unread_count(user.id)
+            mark_all_read(user.id)
             
             db.session.commit()
             
@@ -536,8 +1120,7 @@ class UserEmailAlerts(Resource):
     @jwt_required()
     def get(self):
         """Get current email alert preference"""
-        user_id = get_jwt_identity()
-        user = User.query.get(int(user_id))
+        user = get_current_user()
         
         if not user:
             return {"error": "User not found"}, 404
@@ -549,14 +1132,14 @@ class UserEmailAlerts(Resource):
     @jwt_required()
     def patch(self):
         """Toggle email alert preference"""
-        user_id = get_jwt_identity()
-        user = User.query.get(int(user_id))
+        user = db.session.get(User, get_current_user_id())
         
         if not user:
             return {"error": "User not found"}, 404
         
         user.receive_email_alerts = not user.receive_email_alerts
         db.session.commit()
+        invalidate_user(user.id)
         
         return {
             "message": f"Email alerts {'enabled' if user.receive_email_alerts else 'disabled'}",
@@ -574,140 +1157,645 @@ class UserNotificationsWithStatus(Resource):
             - Last read timestamp
         """
         parser = reqparse.RequestParser()
-        parser.add_argument('limit', type=int, default=50, help='Limit results')
+        parser.add_argument('limit', type=int, default=50, location='args', help='Limit results')
         args = parser.parse_args()
 
-        user_id = get_jwt_identity()
-        user = User.query.get(int(user_id))
+        user = get_current_user()
         
         if not user:
             return {"error": "User not found"}, 404
         
         try:
             # Get both read and unread notifications
-            notifications = db.session.query(
-                Notification,
-                UserNotification.is_read,
-                UserNotification.read_at
-            ).join(
-                UserNotification,
-                Notification.id == UserNotification.notification_id
-            ).filter(
-                UserNotification.user_id == user.id
-            ).order_by(
-                desc(Notification.created_at)
-            ).limit(args['limit']).all()
+            limit = max(1, min(args['limit'], UserNotifications.MAX_LIMIT))
+            notifications = user_notifications_query(user.id, limit=limit)
 
             # Format response with explicit status
             notifications_data = []
-            for notif, is_read, read_at in notifications:
+            for notif in notifications:
+                is_read = bool(notif.is_read)
                 status = "read" if is_read else "unread"
                 notifications_data.append({
                     "id": notif.id,
                     "message": notif.message,
                     "type": notif.notification_type,
+                    "tank_id": notif.tank_id,
                     "severity": notif.severity,
                     "created_at": notif.created_at.isoformat(),
                     "status": status,  # Explicit status field
                     "status_icon": "✓" if is_read else "✕",  # Visual indicator
                     "status_class": f"status-{status}",  # For CSS styling
-                    "read_at": read_at.isoformat() if read_at else None,
+                    "read_at": notif.read_at.isoformat() if notif.read_at else None,
                     "is_read": is_read  # Boolean flag for easy filtering
                 })
 
             # Add summary stats
-            unread_count = sum(1 for n in notifications if not n[1])
+            unread = sum(1 for n in notifications if not n.is_read)
             
             return {
                 "success": True,
                 "notifications": notifications_data,
                 "stats": {
                     "total": len(notifications),
-                    "unread": unread_count,
-                    "read": len(notifications) - unread_count
+                    "unread": unread,
+                    "read": len(notifications) - unread
                 }
             }, 200
             
         except Exception as e:
             return {"error": str(e)}, 500
         
+
+def compact_json(data, code, headers=None):
+    """JSON without the indentation Flask-RESTful adds in debug mode, for large pages."""
+    response = Response(json.dumps(data, separators=(',', ':')) + "\n", code, mimetype='application/json')
+    response.headers.extend(headers or {})
+    return response
+
+
 class AllNotificationsWithStatus(Resource):
+    """
+    Admin view of every (user, notification) pair with its read state.
+    Keyset-paginated over (created_at, notification id, user id) DESC and
+    filterable by user_id, severity, type, tank_id, read=true|false and start/end.
+    An unfiltered first page carries total/read/unread counts from the
+    notification counters; ?summary=1 asks for exact counts of the filtered
+    pairs with a per-severity breakdown, which groups over every pair.
+    """
+    MAX_LIMIT = 200
+    representations = {'application/json': compact_json}
+
+    def _filters(self, is_read):
+        args = request.args
+        conditions = []
+        user_id = args.get('user_id', type=int)
+        if user_id is not None:
+            conditions.append(User.id == user_id)
+        if args.get('severity'):
+            conditions.append(Notification.severity == args['severity'])
+        if args.get('type'):
+            conditions.append(Notification.notification_type == args['type'])
+        tank_id = args.get('tank_id', type=int)
+        if tank_id is not None:
+            conditions.append(Notification.tank_id == tank_id)
+        if args.get('read') in ('true', 'false'):
+            conditions.append(is_read if args['read'] == 'true' else ~is_read)
+        try:
+            if args.get('start'):
+                conditions.append(Notification.created_at >= datetime.fromisoformat(args['start']))
+            if args.get('end'):
+                conditions.append(Notification.created_at <= datetime.fromisoformat(args['end']))
+        except ValueError:
+            raise ValueError("start and end must be ISO 8601 timestamps")
+        return conditions
+
+    @staticmethod
+    def _pairs(*columns):
+        # Every user sees every broadcast; outer joins supply each pair's read state
+        return (
+            select(*columns)
+            .select_from(Notification)
+            .join(User, true())
+            .outerjoin(NotificationReadState, NotificationReadState.user_id == User.id)
+            .outerjoin(
+                UserNotification,
+                (UserNotification.notification_id == Notification.id)
+                & (UserNotification.user_id == User.id)
+            )
+        )
+
+    def _summary(self, is_read, conditions):
+        read_total = func.coalesce(func.sum(case((is_read, 1), else_=0)), 0)
+        rows = db.session.execute(
+            self._pairs(Notification.severity, func.count().label('total'), read_total.label('read'))
+            .where(*conditions)
+            .group_by(Notification.severity)
+        ).all()
+        total = sum(row.total for row in rows)
+        read = sum(row.read for row in rows)
+        return {
+            "total": total,
+            "read": read,
+            "unread": total - read,
+            "by_severity": {
+                row.severity: {"total": row.total, "read": row.read, "unread": row.total - row.read}
+                for row in rows
+            }
+        }
+
     @jwt_required()
     def get(self):
         # Get current user and check admin privileges
-        current_user_id = get_jwt_identity()
-        current_user = User.query.get(int(current_user_id))
-        if not current_user or current_user.role != 'Admin':
+        current_user = get_current_admin()
+        if not current_user:
             return {"error": "Admin privileges required"}, 403
 
-        # Query all UserNotifications, joining with User and Notification
-        all_user_notifications = (
-            db.session.query(UserNotification, User, Notification)
-            .join(User, UserNotification.user_id == User.id)
-            .join(Notification, UserNotification.notification_id == Notification.id)
-            .order_by(Notification.created_at.desc())
-            .all()
+        is_read, read_at = read_status_columns(
+            func.coalesce(NotificationReadState.read_through_id, 0),
+            NotificationReadState.read_at
         )
+        try:
+            conditions = self._filters(is_read)
+        except ValueError as e:
+            return {"error": str(e)}, 400
+
+        limit = max(1, min(request.args.get('limit', 50, type=int), self.MAX_LIMIT))
+        key = tuple_(Notification.created_at, Notification.id, User.id)
+        page_conditions = list(conditions)
+        cursor = request.args.get('cursor')
+        if cursor:
+            try:
+                values, _ = decode_cursor(cursor, (datetime, int, int))
+            except InvalidCursor as e:
+                return {"error": str(e)}, 400
+            page_conditions.append(key < tuple_(*values))
+
+        rows = db.session.execute(
+            self._pairs(
+                User.id.label('user_id'),
+                User.email,
+                Notification.id,
+                Notification.message,
+                Notification.severity,
+                Notification.notification_type,
+                Notification.tank_id,
+                Notification.created_at,
+                is_read.label('is_read'),
+                read_at.label('read_at')
+            )
+            .where(*page_conditions)
+            .order_by(Notification.created_at.desc(), Notification.id.desc(), User.id.desc())
+            .limit(limit + 1)
+        ).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        next_cursor = None
+        if has_more:
+            last = rows[-1]
+            next_cursor = encode_cursor((last.created_at, last.id, last.user_id))
+
+        notifications_data = [
+            {
+                "user_id": row.user_id,
+                "user_email": row.email,
+                "notification_id": row.id,
+                "message": row.message,
+                "severity": row.severity,
+                "notification_type": row.notification_type,
+                "tank_id": row.tank_id,
+                "created_at": row.created_at.isoformat(),
+                "is_read": bool(row.is_read),
+                "read_at": row.read_at.isoformat() if row.read_at else None
+            }
+            for row in rows
+        ]
 
-        # Format response
-        notifications_data = []
-        for un, user, notification in all_user_notifications:
-            notifications_data.append({
-                "user_id": user.id,
-                "user_email": user.email,
-                "notification_id": notification.id,
-                "message": notification.message,
-                "severity": notification.severity,
-                "notification_type": notification.notification_type,
-                "created_at": notification.created_at.isoformat(),
-                "is_read": un.is_read,
-                "read_at": un.read_at.isoformat() if un.read_at else None
-            })
-
-        return {
+        response = {
             "message": "All notifications with user read status retrieved successfully",
             "notifications": notifications_data,
-            "count": len(notifications_data)
-        }, 200
+            "count": len(notifications_data),
+            "pagination": {
+                "mode": "cursor",
+                "limit": limit,
+                "next_cursor": next_cursor,
+                "next": page_link(next_cursor)
+            }
+        }
+        if request.args.get('summary') == '1':
+            response["summary"] = self._summary(is_read, conditions)
+        elif not cursor and not conditions:
+            total, read = read_totals()
+            response["summary"] = {"total": total, "read": read, "unread": total - read}
+        return response, 200
+
 class PredictionResource(Resource):
     def __init__(self):
         self.parser = reqparse.RequestParser()
-        self.parser.add_argument('sensor_cm', type=float, required=True,
-                              help='Current sensor reading in cm (22-27)')
+        self.parser.add_argument('sensor_cm', type=float, location='args',
+                              help='Current sensor reading in cm (22-27); defaults to the latest stored reading')
+        self.parser.add_argument('tank_id', type=int, location='args', default=DEFAULT_TANK_ID,
+                              help='Tank whose recent readings supply the lag features')
         
     def get(self):
         """GET endpoint for testing with query parameters"""
         args = self.parser.parse_args()
-        return self._make_prediction(args['sensor_cm'])
+        return self._make_prediction(args['sensor_cm'], args['tank_id'])
     
     def post(self):
         """POST endpoint for regular JSON payloads"""
-        data = request.get_json()
-        if not data or 'sensor_cm' not in data:
-            return {"error": "JSON body with sensor_cm required"}, 400
-        return self._make_prediction(data['sensor_cm'])
+        data = request.get_json(silent=True)
+        if data is not None and not isinstance(data, dict):
+            return {"error": "JSON body must be an object"}, 400
+        data = data or {}
+        tank_id = data.get('tank_id', DEFAULT_TANK_ID)
+        if isinstance(tank_id, bool) or not isinstance(tank_id, int):
+            return {"error": "tank_id must be an integer"}, 400
+        return self._make_prediction(data.get('sensor_cm'), tank_id)
     
-    def _make_prediction(self, sensor_cm):
-        """Shared prediction logic"""
+    def _make_prediction(self, sensor_cm, tank_id):
+        """Shared prediction logic; lag features come from the tank's window in the feature store"""
         try:
-            if not 22.0 <= sensor_cm <= 27.0:
+            if sensor_cm is not None and not 22.0 <= sensor_cm <= 27.0:
                 return {"error": "Invalid reading (must be 22-27cm)"}, 400
+
+            # Without sensor_cm the tank's newest stored reading is the current one
+            try:
+                features = predictor.current_features(sensor_cm, tank_id)
+            except ValueError as e:
+                return {"error": str(e)}, 400
             
-            current_level = predictor.calculate_level(sensor_cm)
-            result = predictor.predict_critical(sensor_cm)
+            model_watcher.ensure_running()
+            model_version = predictor.model_version
+            current_level = predictor.calculate_level(features['sensor_cm'])
+            result, cached = predictor.predict_features_cached(features, tank_id)
             
             return {
                 "status": "success",
                 "data": {
+                    "tank_id": tank_id,
                     "current_level": current_level,
                     "prediction": result,
+                    "cached": cached,
                     "timestamp": datetime.utcnow().isoformat(),
-                    "model_version": "1.1"
+                    "model_version": model_version
                 }
             }
         except Exception as e:
             return {"error": str(e)}, 500
 
+class PredictionCacheStats(Resource):
+    def get(self):
+        """Hit/miss counters for this worker's forecast cache"""
+        return {"cache": predictor.cache.stats()}, 200
+
+class BatchPredictionResource(Resource):
+    # Optional per-row overrides of the lag features the tank's window would supply
+    OVERRIDES = {'prev_reading': (22.0, 27.0), '3h_avg': (22.0, 27.0), 'roc_1h': (-5.0, 5.0)}
+
+    @staticmethod
+    def _number(value, low, high):
+        return not isinstance(value, bool) and isinstance(value, (int, float)) and low <= value <= high
+
+    def post(self):
+        """
+        Score many tanks at once: one model call per forecast hour for the whole batch.
+        Each row names a tank_id (default tank otherwise) and may give sensor_cm;
+        lag features come from that tank's window in the feature store.
+        """
+        data = request.get_json(silent=True)
+        readings = data.get('readings') if isinstance(data, dict) else data
+        if not isinstance(readings, list) or not readings:
+            return {"error": "JSON body with a non-empty readings list required"}, 400
+
+        max_rows = app.config['PREDICT_BATCH_MAX_ROWS']
+        if len(readings) > max_rows:
+            return {"error": f"Batch too large (max {max_rows} readings)"}, 413
+
+        rows = []
+        errors = {}
+        for index, reading in enumerate(readings):
+            if not isinstance(reading, dict):
+                reading = {'sensor_cm': reading}
+            sensor_cm = reading.get('sensor_cm')
+            if sensor_cm is not None and not self._number(sensor_cm, 22.0, 27.0):
+                errors[index] = "Invalid reading (must be 22-27cm)"
+                continue
+            tank_id = reading.get('tank_id', DEFAULT_TANK_ID)
+            if isinstance(tank_id, bool) or not isinstance(tank_id, int):
+                errors[index] = "tank_id must be an integer"
+                continue
+            invalid = [
+                name for name, (low, high) in self.OVERRIDES.items()
+                if name in reading and not self._number(reading[name], low, high)
+            ]
+            if invalid:
+                errors[index] = f"Invalid {', '.join(invalid)}"
+                continue
+            rows.append((index, tank_id, sensor_cm, reading))
+
+        unknown = unknown_tank_ids({tank_id for _, tank_id, _, _ in rows} - {DEFAULT_TANK_ID})
+        features = []
+        for index, tank_id, sensor_cm, reading in rows:
+            if tank_id in unknown:
+                errors[index] = "Unknown tank"
+                continue
+            try:
+                row_features = predictor.current_features(sensor_cm, tank_id)
+            except ValueError as e:
+                errors[index] = str(e)
+                continue
+            row_features.update({name: reading[name] for name in self.OVERRIDES if name in reading})
+            features.append((tank_id, row_features))
+
+        if errors:
+            return {"error": "Invalid readings in batch", "invalid": errors}, 400
+
+        model_watcher.ensure_running()
+        active = predictor.active  # one model for the whole batch, even across a swap
+        try:
+            columns = {name: np.array([f[name] for _, f in features], dtype=float) for name in FEATURES}
+            sensor_cm = columns['sensor_cm']
+            forecasts = predictor.predict_many(
+                sensor_cm,
+                prev_reading=columns['prev_reading'],
+                avg_3h=columns['3h_avg'],
+                roc_1h=columns['roc_1h'],
+                hour=columns['hour'],
+                day_of_week=columns['day_of_week'],
+                model=active.estimator
+            )
+        except Exception as e:
+            return {"error": str(e)}, 500
+
+        return {
+            "status": "success",
+            "data": {
+                "predictions": [
+                    {
+                        "index": index,
+                        "tank_id": tank_id,
+                        "current_level": predictor.calculate_level(cm),
+                        "prediction": predictor.summarize(forecast)
+                    }
+                    for index, ((tank_id, _), cm, forecast) in enumerate(zip(features, sensor_cm, forecasts))
+                ],
+                "count": len(forecasts),
+                "timestamp": datetime.utcnow().isoformat(),
+                "model_version": active.version
+            }
+        }
+
+class AlertStates(Resource):
+    @jwt_required()
+    def get(self):
+        """Current state of each tank's alert conditions (active or last cleared)"""
+        query = db.session.query(AlertState)
+        tank_id = request.args.get('tank_id', type=int)
+        if tank_id is not None:
+            query = query.filter(AlertState.tank_id == tank_id)
+        states = query.order_by(AlertState.tank_id, AlertState.condition).all()
+        return {
+            "alerts": [state.to_dict() for state in states]
+        }, 200
+
+class AlertRules(Resource):
+    FIELDS = ('condition', 'metric', 'kind', 'direction', 'warning', 'critical', 'clear_at',
+              'window_size', 'noise_floor', 'enabled')
+
+    @staticmethod
+    def apply(rule, data):
+        """
+        Copy the given fields onto `rule` and check that it compiles;
+        returns an error message or None.
+        """
+        for field in AlertRules.FIELDS:
+            if field in data:
+                setattr(rule, field, data[field])
+        if not isinstance(rule.condition, str) or not rule.condition.strip():
+            return "condition is required"
+        for field in ('warning', 'critical', 'clear_at', 'noise_floor'):
+            value = getattr(rule, field)
+            if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float))):
+                return f"{field} must be a number"
+        if rule.clear_at is None:
+            return "clear_at is required"
+        if isinstance(rule.window_size, bool) or not isinstance(rule.window_size, int):
+            return "window_size must be an integer"
+        if not isinstance(rule.enabled, bool):
+            return "enabled must be true or false"
+        try:
+            compile_rule(rule, timedelta(0), timedelta(0))
+        except ValueError as e:
+            return str(e)
+        return None
+
+    @jwt_required()
+    def get(self):
+        """Every alert rule, enabled or not"""
+        rules = AlertRule.query.order_by(AlertRule.condition).all()
+        return {"rules": [rule.to_dict() for rule in rules]}, 200
+
+    @jwt_required()
+    def post(self):
+        """Add a rule; admins only. Its condition names its alerts and notifications"""
+        if not get_current_admin():
+            return {"error": "Admin privileges required"}, 403
+        data = request.get_json(silent=True) or {}
+        rule = AlertRule(direction='above', window_size=1, noise_floor=0.0, enabled=True)
+        error = self.apply(rule, data)
+        if error:
+            return {"error": error}, 400
+        if AlertRule.query.filter_by(condition=rule.condition).first():
+            return {"error": "A rule with this condition already exists"}, 409
+
+        db.session.add(rule)
+        db.session.commit()
+        app.extensions['alert_rules'].invalidate()
+        return {"message": "Alert rule created", "rule": rule.to_dict()}, 201
+
+class AlertRuleDetail(Resource):
+    @jwt_required()
+    def patch(self, rule_id):
+        """Change a rule's thresholds, window or enabled flag; admins only"""
+        if not get_current_admin():
+            return {"error": "Admin privileges required"}, 403
+        rule = db.session.get(AlertRule, rule_id)
+        if not rule:
+            return {"error": "Alert rule not found"}, 404
+        data = request.get_json(silent=True) or {}
+        if 'condition' in data and data['condition'] != rule.condition:
+            # Alert states and notifications are keyed on the condition
+            db.session.rollback()
+            return {"error": "condition cannot be changed; add a new rule instead"}, 400
+        error = AlertRules.apply(rule, data)
+        if error:
+            db.session.rollback()
+            return {"error": error}, 400
+
+        db.session.commit()
+        app.extensions['alert_rules'].invalidate()
+        return {"message": "Alert rule updated", "rule": rule.to_dict()}, 200
+
+class Tanks(Resource):
+    @staticmethod
+    def serialize(tank, subscribed):
+        return {
+            "id": tank.id,
+            "name": tank.name,
+            "location": tank.location,
+            "owner_id": tank.owner_id,
+            "created_at": tank.created_at.isoformat() if tank.created_at else None,
+            "subscribed": subscribed
+        }
+
+    @staticmethod
+    def subscribed_ids(user_id):
+        return set(db.session.scalars(
+            select(TankSubscription.tank_id).where(TankSubscription.user_id == user_id)
+        ))
+
+    @jwt_required()
+    def get(self):
+        """Every tank, with whether the caller subscribes to its alerts"""
+        subscribed = self.subscribed_ids(get_current_user_id())
+        tanks = Tank.query.order_by(Tank.id).all()
+        return {
+            "tanks": [self.serialize(tank, tank.id in subscribed) for tank in tanks],
+            # Without subscriptions a user is alerted about every tank
+            "follows_all": not subscribed
+        }, 200
+
+    @jwt_required()
+    def post(self):
+        """Register a tank; admins only. owner_id defaults to the caller"""
+        current_user = get_current_admin()
+        if not current_user:
+            return {"error": "Admin privileges required"}, 403
+
+        data = request.get_json(silent=True) or {}
+        name = data.get('name')
+        if not isinstance(name, str) or not name.strip():
+            return {"error": "name is required"}, 400
+        owner_id = data.get('owner_id', current_user.id)
+        if owner_id is not None and not db.session.get(User, owner_id):
+            return {"error": "Owner not found"}, 404
+
+        tank = Tank(name=name.strip(), location=data.get('location'), owner_id=owner_id)
+        db.session.add(tank)
+        db.session.commit()
+
+        return {"message": "Tank created successfully", "tank": self.serialize(tank, False)}, 201
+
+class TankDetail(Resource):
+    @jwt_required()
+    def get(self, tank_id):
+        """One tank with its alert states"""
+        tank = db.session.get(Tank, tank_id)
+        if not tank:
+            return {"error": "Tank not found"}, 404
+        states = AlertState.query.filter_by(tank_id=tank_id).order_by(AlertState.condition).all()
+        return {
+            "tank": Tanks.serialize(tank, tank_id in Tanks.subscribed_ids(get_current_user_id())),
+            "alerts": [state.to_dict() for state in states]
+        }, 200
+
+    @jwt_required()
+    def patch(self, tank_id):
+        """Rename or relocate a tank (its owner or an admin); only admins change the owner"""
+        current_user = get_current_user()
+        if not current_user:
+            return {"error": "User not found"}, 404
+        tank = db.session.get(Tank, tank_id)
+        if not tank:
+            return {"error": "Tank not found"}, 404
+        is_admin = current_user.role == 'Admin'
+        if not is_admin and tank.owner_id != current_user.id:
+            return {"error": "Only the tank's owner or an admin can change it"}, 403
+
+        data = request.get_json(silent=True) or {}
+        if 'name' in data:
+            if not isinstance(data['name'], str) or not data['name'].strip():
+                return {"error": "name cannot be empty"}, 400
+            tank.name = data['name'].strip()
+        if 'location' in data:
+            tank.location = data['location']
+        if 'owner_id' in data:
+            if not is_admin:
+                return {"error": "Admin privileges required to change the owner"}, 403
+            if data['owner_id'] is not None and not db.session.get(User, data['owner_id']):
+                return {"error": "Owner not found"}, 404
+            tank.owner_id = data['owner_id']
+
+        db.session.commit()
+        return {
+            "message": "Tank updated successfully",
+            "tank": Tanks.serialize(tank, tank_id in Tanks.subscribed_ids(current_user.id))
+        }, 200
+
+class TankSubscriptionResource(Resource):
+    @jwt_required()
+    def put(self, tank_id):
+        """Subscribe the caller to a tank's alert emails"""
+        user_id = get_current_user_id()
+        if not db.session.get(Tank, tank_id):
+            return {"error": "Tank not found"}, 404
+        if not db.session.get(TankSubscription, (user_id, tank_id)):
+            db.session.add(TankSubscription(user_id=user_id, tank_id=tank_id))
+            db.session.commit()
+        return {"message": "Subscribed", "tank_id": tank_id, "subscribed": True}, 200
+
+    @jwt_required()
+    def delete(self, tank_id):
+        """Unsubscribe the caller; with no subscriptions left they follow every tank again"""
+        user_id = get_current_user_id()
+        subscription = db.session.get(TankSubscription, (user_id, tank_id))
+        if not subscription:
+            return {"error": "Not subscribed to this tank"}, 404
+        db.session.delete(subscription)
+        db.session.commit()
+        return {"message": "Unsubscribed", "tank_id": tank_id, "subscribed": False}, 200
+
+class ModelVersions(Resource):
+    @jwt_required()
+    def get(self):
+        """Registered versions, the registry state and this worker's shadow comparison"""
+        if not get_current_admin():
+            return {"error": "Admin privileges required"}, 403
+        model_watcher.check()
+        return {
+            "serving": predictor.model_version,
+            "state": model_registry.state(),
+            "versions": model_registry.versions(),
+            "shadow": shadow_scorer.stats()
+        }, 200
+
+class ActiveModelVersion(Resource):
+    @jwt_required()
+    def put(self):
+        """Activate a version; pin it to keep newly trained versions from replacing it"""
+        if not get_current_admin():
+            return {"error": "Admin privileges required"}, 403
+        data = request.get_json(silent=True) or {}
+        version = data.get('version')
+        if not isinstance(version, str) or not version:
+            return {"error": "version is required"}, 400
+        try:
+            state = model_registry.activate(version, pin=bool(data.get('pin', False)))
+        except RegistryError as e:
+            return {"error": str(e)}, 404
+        model_watcher.check()
+        return {"message": f"Model {version} activated", "state": state}, 200
+
+class ModelRollback(Resource):
+    @jwt_required()
+    def post(self):
+        """Go back to the previously active version and pin it"""
+        if not get_current_admin():
+            return {"error": "Admin privileges required"}, 403
+        try:
+            state = model_registry.rollback()
+        except RegistryError as e:
+            return {"error": str(e)}, 409
+        model_watcher.check()
+        return {"message": f"Rolled back to model {state['version']}", "state": state}, 200
+
+class ShadowModelVersion(Resource):
+    @jwt_required()
+    def put(self):
+        """Score a candidate version alongside live traffic, or stop with {"version": null}"""
+        if not get_current_admin():
+            return {"error": "Admin privileges required"}, 403
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict) or 'version' not in data:
+            return {"error": "version is required (null to stop shadow scoring)"}, 400
+        try:
+            state = model_registry.set_shadow(data['version'])
+        except RegistryError as e:
+            return {"error": str(e)}, 404
+        model_watcher.check()
+        return {"message": "Shadow model updated", "state": state}, 200
+
 # Add resources
 api.add_resource(Register, '/auth/register')
 api.add_resource(Login, '/auth/login')
@@ -717,7 +1805,10 @@ api.add_resource(Protected, '/protected')
 api.add_resource(UsersList, '/users')
 api.add_resource(UserUpdateDelete, '/users/<int:user_id>')
 api.add_resource(SensorReadings, '/sensorreadings')
+api.add_resource(SensorReadingsExport, '/sensorreadings/export')
+api.add_resource(SensorReadingsAggregate, '/sensorreadings/aggregate')
 api.add_resource(CreateSensorReading, '/sensor-readings')
+api.add_resource(CreateSensorReadingsBatch, '/sensor-readings/batch')
 api.add_resource(UserNotifications, '/notifications')
 api.add_resource(MarkNotificationRead, '/notifications/<int:user_notification_id>/read') 
 api.add_resource(UnreadNotificationsCount, '/notifications/unread-count')
@@ -725,7 +1816,20 @@ api.add_resource(MarkAllNotificationsRead, '/notifications/read-all')
 api.add_resource(UserNotificationsWithStatus, '/user/notifications/status')
 api.add_resource(UserEmailAlerts, '/user/email-alerts')
 api.add_resource(AllNotificationsWithStatus, '/notifications/all')
+api.add_resource(EventStream, '/stream')
 api.add_resource(PredictionResource, '/predict')
+api.add_resource(BatchPredictionResource, '/predict/batch')
+api.add_resource(PredictionCacheStats, '/predict/cache')
+api.add_resource(AlertStates, '/alerts')
+api.add_resource(AlertRules, '/alert-rules')
+api.add_resource(AlertRuleDetail, '/alert-rules/<int:rule_id>')
+api.add_resource(Tanks, '/tanks')
+api.add_resource(TankDetail, '/tanks/<int:tank_id>')
+api.add_resource(TankSubscriptionResource, '/tanks/<int:tank_id>/subscription')
+api.add_resource(ModelVersions, '/models')
+api.add_resource(ActiveModelVersion, '/models/active')
+api.add_resource(ModelRollback, '/models/rollback')
+api.add_resource(ShadowModelVersion, '/models/shadow')
 
 
 if __name__ == '__main__':
@@ -0,0 +1,416 @@
+"""
+Endpoint latency benchmark.
+
+Runs the app in-process against a freshly seeded database and drives every
+resource registered on the API with concurrent requests, one endpoint at a
+time. Throughput and p50/p95/p99 latency per endpoint go to a JSON file
+that can be kept as a baseline and compared against later runs.
+
+    python benchmark.py                                  # throwaway SQLite file
+    python benchmark.py --database-url postgresql://localhost/ptank_bench --readings 500000 --tanks 50
+    python benchmark.py --save-baseline                  # write benchmark_baseline.json
+    python benchmark.py --compare                        # exit 1 if an endpoint regressed
+    python benchmark.py --only predict,sensorreadings --requests 500 --concurrency 16
+
+The database is dropped and recreated, so never point it at real data.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+
+BASELINE_PATH = 'benchmark_baseline.json'
+RESULTS_PATH = 'benchmark_results.json'
+
+# method, path, auth ('user', 'admin', 'refresh', 'fresh' or None), request factory, accepted statuses.
+# The factory gets the seeded Fixture and a per-request sequence number and returns
+# (url, test-client keyword arguments).
+Scenario = namedtuple('Scenario', 'method route auth make ok')
+
+# Long-lived or otherwise unsuitable for request/response timing
+SKIPPED = {
+    '/stream': "Server-Sent Events; a connection never completes",
+}
+
+
+def _const(url, **kwargs):
+    return lambda fixture, seq: (url, kwargs)
+
+
+SCENARIOS = {
+    'register': Scenario('POST', '/auth/register', None, lambda f, seq: ('/auth/register', {'json': {
+        'full_name': f'Bench Signup {f.run_id}-{seq}', 'email': f'signup{f.run_id}-{seq}@bench.test', 'password': 'bench-pass'
+    }}), (201,)),
+    'login': Scenario('POST', '/auth/login', None, lambda f, seq: ('/auth/login', {'json': {
+        'email': f.user_emails[seq % len(f.user_emails)], 'password': 'bench-pass'
+    }}), (200,)),
+    'logout': Scenario('POST', '/auth/logout', 'fresh', _const('/auth/logout'), (200,)),
+    'refresh': Scenario('POST', '/auth/refresh', 'refresh', _const('/auth/refresh'), (200,)),
+    'protected': Scenario('GET', '/protected', 'user', _const('/protected'), (200,)),
+    'users_list': Scenario('GET', '/users', 'admin', _const('/users?limit=50'), (200,)),
+    'users_search': Scenario('GET', '/users', 'admin', _const('/users?q=bench%20user%201&limit=50'), (200,)),
+    'user_update': Scenario('PUT', '/users/<int:user_id>', 'admin', lambda f, seq: (
+        f'/users/{f.user_ids[seq % len(f.user_ids)]}', {'json': {'full_name': f'Bench User {f.user_ids[seq % len(f.user_ids)]}'}}
+    ), (200,)),
+    'user_delete': Scenario('DELETE', '/users/<int:user_id>', 'admin', lambda f, seq: (
+        f'/users/{f.victim_ids.pop()}', {}
+    ), (200,)),
+    'sensorreadings': Scenario('GET', '/sensorreadings', None, _const('/sensorreadings?limit=100'), (200,)),
+    'sensorreadings_filtered': Scenario('GET', '/sensorreadings', None, lambda f, seq: (
+        f'/sensorreadings?limit=100&tank_level_min=50&start={f.window_start}', {}
+    ), (200,)),
+    'sensorreadings_export': Scenario('GET', '/sensorreadings/export', None, lambda f, seq: (
+        f'/sensorreadings/export?format=ndjson&start={f.window_start}', {}
+    ), (200,)),
+    'sensorreadings_aggregate': Scenario('GET', '/sensorreadings/aggregate', None, lambda f, seq: (
+        f'/sensorreadings/aggregate?bucket=1d&start={f.first_reading}&end={f.last_reading}', {}
+    ), (200,)),
+    'sensorreadings_tank': Scenario('GET', '/sensorreadings', None, lambda f, seq: (
+        f'/sensorreadings?tank_id={f.tank_ids[seq % len(f.tank_ids)]}&paginate=cursor&limit=100', {}
+    ), (200,)),
+    'ingest': Scenario('POST', '/sensor-readings', None, lambda f, seq: ('/sensor-readings', {'json': {
+        'tank_id': f.tank_ids[seq % len(f.tank_ids)], 'temp': 24.0, 'ph': 7.1, 'tank_level_per': 40 + seq % 40
+    }}), (201,)),
+    'ingest_batch': Scenario('POST', '/sensor-readings/batch', None, lambda f, seq: ('/sensor-readings/batch', {'json': [
+        {'tank_id': f.tank_ids[i % len(f.tank_ids)], 'temp': 24.0, 'ph': 7.1, 'tank_level_per': 40 + i % 40}
+        for i in range(f.batch_size)
+    ]}), (201,)),
+    'notifications': Scenario('GET', '/notifications', 'user', _const('/notifications'), (200,)),
+    'notification_read': Scenario('PATCH', '/notifications/<int:user_notification_id>/read', 'user', lambda f, seq: (
+        f'/notifications/{f.notification_ids[seq % len(f.notification_ids)]}/read', {}
+    ), (200,)),
+    'unread_count': Scenario('GET', '/notifications/unread-count', 'user', _const('/notifications/unread-count'), (200,)),
+    'read_all': Scenario('PATCH', '/notifications/read-all', 'user', _const('/notifications/read-all'), (200,)),
+    'notifications_status': Scenario('GET', '/user/notifications/status', 'user', _const('/user/notifications/status'), (200,)),
+    'email_alerts': Scenario('GET', '/user/email-alerts', 'user', _const('/user/email-alerts'), (200,)),
+    'email_alerts_toggle': Scenario('PATCH', '/user/email-alerts', 'user', _const('/user/email-alerts'), (200,)),
+    'notifications_all': Scenario('GET', '/notifications/all', 'admin', _const('/notifications/all?limit=50'), (200,)),
+    'predict': Scenario('GET', '/predict', None, lambda f, seq: (f'/predict?sensor_cm={22 + (seq % 500) / 100:.2f}', {}), (200,)),
+    'predict_latest': Scenario('GET', '/predict', None, _const('/predict'), (200,)),
+    'predict_batch': Scenario('POST', '/predict/batch', None, lambda f, seq: ('/predict/batch', {'json': {
+        'readings': [{'sensor_cm': 22 + (i % 500) / 100} for i in range(f.batch_size)]
+    }}), (200,)),
+    'predict_cache': Scenario('GET', '/predict/cache', None, _const('/predict/cache'), (200,)),
+    'alerts': Scenario('GET', '/alerts', 'user', _const('/alerts'), (200,)),
+    'alert_rules': Scenario('GET', '/alert-rules', 'user', _const('/alert-rules'), (200,)),
+    # An empty PATCH still validates, commits and recompiles the rule without changing it
+    'alert_rule_update': Scenario('PATCH', '/alert-rules/<int:rule_id>', 'admin', lambda f, seq: (
+        f'/alert-rules/{f.alert_rule_ids[seq % len(f.alert_rule_ids)]}', {'json': {}}
+    ), (200,)),
+    'tanks': Scenario('GET', '/tanks', 'user', _const('/tanks'), (200,)),
+    'tank_create': Scenario('POST', '/tanks', 'admin', lambda f, seq: ('/tanks', {'json': {
+        'name': f'Bench tank {f.run_id}-{seq}'
+    }}), (201,)),
+    'tank_detail': Scenario('GET', '/tanks/<int:tank_id>', 'user', lambda f, seq: (
+        f'/tanks/{f.tank_ids[seq % len(f.tank_ids)]}', {}
+    ), (200,)),
+    'tank_update': Scenario('PATCH', '/tanks/<int:tank_id>', 'admin', lambda f, seq: (
+        f'/tanks/{f.tank_ids[seq % len(f.tank_ids)]}', {'json': {'location': f'Site {seq}'}}
+    ), (200,)),
+    # Alternates subscribe/unsubscribe on one tank, so the DELETE always has a row to remove
+    'tank_subscription': Scenario('PUT', '/tanks/<int:tank_id>/subscription', 'user', lambda f, seq: (
+        f'/tanks/{f.tank_ids[0]}/subscription', {'method': 'PUT' if seq % 2 == 0 else 'DELETE'}
+    ), (200, 404)),
+    'models': Scenario('GET', '/models', 'admin', _const('/models'), (200,)),
+    'models_activate': Scenario('PUT', '/models/active', 'admin', lambda f, seq: ('/models/active', {'json': {
+        'version': f.model_version
+    }}), (200,)),
+    'models_rollback': Scenario('POST', '/models/rollback', 'admin', _const('/models/rollback'), (200, 409)),
+    'models_shadow': Scenario('PUT', '/models/shadow', 'admin', _const('/models/shadow', json={'version': None}), (200,)),
+    'metrics': Scenario('GET', '/metrics', None, _const('/metrics'), (200,)),
+}
+
+
+class Fixture:
+    """Ids and credentials of the seeded data that scenarios refer to."""
+
+    def __init__(self):
+        self.run_id = int(time.time())
+        self.user_ids = []
+        self.user_emails = []
+        self.victim_ids = []
+        self.tank_ids = []
+        self.alert_rule_ids = []
+        self.notification_ids = []
+        self.batch_size = 100
+        self.model_version = None
+        self.first_reading = self.last_reading = self.window_start = None
+        self.tokens = {}
+
+
+def seed(app, readings=100_000, users=1_000, notifications=500, batch_size=100, victims=0, tanks=1):
+    """Drop and recreate the schema, fill it and return a Fixture."""
+    from flask_jwt_extended import create_access_token, create_refresh_token
+    from sqlalchemy import func, insert, select
+    from werkzeug.security import generate_password_hash
+
+    from database import db
+    from generate_data import generate_chunks
+    from models import AlertRule, Notification, SensorReading, Tank, User, UserNotification
+    from notification_state import reconcile_read_counts, record_notifications
+    from rollups import rebuild_rollups
+
+    fixture = Fixture()
+    fixture.batch_size = batch_size
+    password_hash = generate_password_hash('bench-pass')  # hashing per user would dominate seeding
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+        # `tanks` tanks at one reading every 10 minutes each, ending now (tank 1 comes with the schema)
+        if tanks > 1:
+            db.session.execute(insert(Tank), [{'name': f'Bench tank {i}'} for i in range(2, tanks + 1)])
+        fixture.tank_ids = db.session.scalars(select(Tank.id).order_by(Tank.id)).all()
+        fixture.alert_rule_ids = db.session.scalars(select(AlertRule.id).order_by(AlertRule.id)).all()
+        days = max(1, -(-readings // (144 * len(fixture.tank_ids))))
+        start = datetime.utcnow().replace(second=0, microsecond=0) - timedelta(days=days)
+        remaining = readings
+        for chunk in generate_chunks(tanks=len(fixture.tank_ids), days=days, interval_minutes=10,
+                                     chunk_rows=50_000, start=start.isoformat()):
+            chunk = chunk.iloc[:remaining]
+            db.session.execute(insert(SensorReading), [
+                {'tank_id': tank, 'timestamp': ts, 'temp': temp, 'ph': ph, 'tank_level_per': level}
+                for tank, ts, temp, ph, level in zip(
+                    chunk['tank_id'].tolist(), chunk['timestamp'].to_numpy().astype('datetime64[us]').tolist(),
+                    chunk['temp'].tolist(), chunk['ph'].tolist(), chunk['percent_full'].tolist())
+            ])
+            remaining -= len(chunk)
+            if remaining <= 0:
+                break
+        db.session.commit()
+        rebuild_rollups()
+        first, last = db.session.execute(select(func.min(SensorReading.timestamp), func.max(SensorReading.timestamp))).one()
+        fixture.first_reading, fixture.last_reading = first.isoformat(), last.isoformat()
+        fixture.window_start = (last - timedelta(days=1)).isoformat()
+
+        rows = [{'full_name': 'Bench Admin', 'email': 'admin@bench.test', 'role': 'Admin', 'password_hash': password_hash}]
+        rows += [{'full_name': f'Bench User {i}', 'email': f'user{i}@bench.test', 'password_hash': password_hash}
+                 for i in range(1, users + 1)]
+        rows += [{'full_name': f'Bench Victim {i}', 'email': f'victim{i}@bench.test', 'password_hash': password_hash}
+                 for i in range(1, victims + 1)]
+        db.session.execute(insert(User), rows)
+
+        kinds = [('Tank level critical', 'critical', 'tank_full'), ('pH anomaly detected', 'warning', 'ph_anomaly'),
+                 ('Temperature drift', 'info', 'temp_anomaly')]
+        db.session.execute(insert(Notification), [
+            {'message': kinds[i % 3][0], 'severity': kinds[i % 3][1], 'notification_type': kinds[i % 3][2],
+             'created_at': last - timedelta(minutes=notifications - i)}
+            for i in range(notifications)
+        ])
+        db.session.flush()
+        fixture.notification_ids = db.session.scalars(select(Notification.id).order_by(Notification.id)).all()
+        if fixture.notification_ids:
+            record_notifications(len(fixture.notification_ids), fixture.notification_ids[-1])
+
+        users_by_email = dict(db.session.execute(select(User.email, User.id)).all())
+        admin_id = users_by_email['admin@bench.test']
+        fixture.user_emails = [f'user{i}@bench.test' for i in range(1, users + 1)]
+        fixture.user_ids = [users_by_email[email] for email in fixture.user_emails]
+        fixture.victim_ids = [users_by_email[f'victim{i}@bench.test'] for i in range(1, victims + 1)]
+
+        # A sparse set of individual reads for the first user, as the UI would leave behind
+        if fixture.user_ids:
+            db.session.execute(insert(UserNotification), [
+                {'user_id': fixture.user_ids[0], 'notification_id': nid, 'is_read': True, 'read_at': last}
+                for nid in fixture.notification_ids[::7]
+            ])
+        db.session.commit()
+        reconcile_read_counts()
+
+        user_id = str(fixture.user_ids[0]) if fixture.user_ids else str(admin_id)
+        fixture.tokens = {
+            'user': create_access_token(identity=user_id),
+            'admin': create_access_token(identity=str(admin_id)),
+            'refresh': create_refresh_token(identity=user_id),
+        }
+        fixture.fresh_token = lambda: create_access_token(identity=user_id)
+
+    return fixture
+
+
+def percentile(latencies, q):
+    return round(float(np.percentile(latencies, q)) * 1000, 3)
+
+
+def run_scenario(app, fixture, scenario, requests=200, concurrency=8, warmup=10):
+    """Fire `requests` calls with `concurrency` threads and summarize them."""
+    local = threading.local()
+    sequence = itertools.count()
+    headers = {}
+    if scenario.auth in ('user', 'admin', 'refresh'):
+        headers = {'Authorization': f'Bearer {fixture.tokens[scenario.auth]}'}
+    if scenario.auth == 'fresh':
+        # Logout revokes its token, so every call gets its own (made outside the timed section)
+        with app.app_context():
+            fresh = [fixture.fresh_token() for _ in range(requests + warmup)]
+
+    def call(_):
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = app.test_client()
+        seq = next(sequence)
+        url, kwargs = scenario.make(fixture, seq)
+        kwargs = dict(kwargs)
+        method = kwargs.pop('method', scenario.method)  # a scenario may vary the method per request
+        request_headers = {'Authorization': f'Bearer {fresh[seq]}'} if scenario.auth == 'fresh' else headers
+        started = time.perf_counter()
+        response = client.open(url, method=method, headers=request_headers, **kwargs)
+        response.get_data()  # include streamed bodies
+        return time.perf_counter() - started, response.status_code
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(call, range(warmup)))
+        started = time.perf_counter()
+        results = list(pool.map(call, range(requests)))
+        elapsed = time.perf_counter() - started
+
+    latencies = [seconds for seconds, _ in results]
+    statuses = Counter(status for _, status in results)
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'errors': sum(count for status, count in statuses.items() if status not in scenario.ok),
+        'status_codes': {str(status): count for status, count in sorted(statuses.items())},
+        'throughput_rps': round(requests / elapsed, 2),
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3),
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99),
+    }
+
+
+def uncovered_routes(app):
+    """Registered routes with neither a scenario nor a reason to skip them."""
+    routes = {rule.rule for rule in app.url_map.iter_rules() if rule.endpoint != 'static'}
+    covered = {scenario.route for scenario in SCENARIOS.values()} | set(SKIPPED)
+    return sorted(routes - covered)
+
+
+def compare(results, baseline, tolerance=0.2, floor_ms=1.0):
+    """(name, message) for each endpoint whose p95 or throughput got worse beyond tolerance."""
+    regressions = []
+    for name, current in results['endpoints'].items():
+        before = baseline.get('endpoints', {}).get(name)
+        if before is None:
+            continue
+        # Sub-millisecond p95s are noise on a shared machine; require an absolute change too
+        if current['p95_ms'] > before['p95_ms'] * (1 + tolerance) and current['p95_ms'] - before['p95_ms'] > floor_ms:
+            regressions.append((name, f"p95 {before['p95_ms']:.1f} -> {current['p95_ms']:.1f} ms"))
+        if current['throughput_rps'] < before['throughput_rps'] * (1 - tolerance):
+            regressions.append((name, f"throughput {before['throughput_rps']:.0f} -> {current['throughput_rps']:.0f} req/s"))
+        if current['errors'] > before.get('errors', 0):
+            regressions.append((name, f"errors {before.get('errors', 0)} -> {current['errors']}"))
+    return regressions
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every API endpoint in-process")
+    parser.add_argument('--database-url', help="throwaway database (default: a temporary SQLite file)")
+    parser.add_argument('--readings', type=int, default=100_000)
+    parser.add_argument('--users', type=int, default=1_000)
+    parser.add_argument('--tanks', type=int, default=1, help="tanks the seeded readings are spread over")
+    parser.add_argument('--notifications', type=int, default=500)
+    parser.add_argument('--batch-size', type=int, default=100, help="rows per /sensor-readings/batch and /predict/batch call")
+    parser.add_argument('--requests', type=int, default=200, help="timed requests per endpoint")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--only', help="comma-separated scenario names (substring match)")
+    parser.add_argument('--output', default=RESULTS_PATH)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--compare', action='store_true', help="exit 1 when an endpoint regressed against the baseline")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed relative slowdown (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    # Configure the app before it is imported; load_dotenv() never overrides these
+    workdir = tempfile.mkdtemp(prefix='ptank-bench-')
+    os.environ['DATABASE_URL'] = args.database_url or f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ['MAIL_WORKER_THREADS'] = '0'
+    os.environ['MODEL_REGISTRY_DIR'] = os.path.join(workdir, 'models')
+    os.environ.setdefault('SECRET_KEY', 'bench-secret')
+    os.environ.setdefault('JWT_SECRET_KEY', 'bench-jwt-secret-key-with-enough-bytes')
+    from app import app, model_registry, model_watcher, predictor
+
+    names = [name for name in SCENARIOS
+             if not args.only or any(part in name for part in args.only.split(','))]
+    victims = (args.requests + args.warmup) if 'user_delete' in names else 0
+
+    started = time.perf_counter()
+    fixture = seed(app, args.readings, args.users, args.notifications, args.batch_size, victims, args.tanks)
+    fixture.model_version = model_registry.register(predictor.model, version='bench')
+    model_watcher.check()
+    print(f"Seeded {args.readings:,} readings and {args.users:,} users in {time.perf_counter() - started:.1f}s "
+          f"({app.config['SQLALCHEMY_DATABASE_URI'].split(':')[0]})")
+    for route in uncovered_routes(app):
+        print(f"  warning: no scenario for {route}; add one to SCENARIOS")
+
+    results = {
+        'meta': {
+            'created_at': datetime.utcnow().isoformat(),
+            'revision': _git_revision(),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'cpus': os.cpu_count(),
+            'database': app.config['SQLALCHEMY_DATABASE_URI'].split(':')[0],
+            'readings': args.readings,
+            'users': args.users,
+            'notifications': args.notifications,
+            'batch_size': args.batch_size,
+        },
+        'endpoints': {}
+    }
+    print(f"{'endpoint':<26}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}")
+    for name in names:
+        scenario = SCENARIOS[name]
+        stats = run_scenario(app, fixture, scenario, args.requests, args.concurrency, args.warmup)
+        results['endpoints'][name] = {'method': scenario.method, 'route': scenario.route, **stats}
+        print(f"{name:<26}{stats['throughput_rps']:>9.1f}{stats['p50_ms']:>9.1f}{stats['p95_ms']:>9.1f}"
+              f"{stats['p99_ms']:>9.1f}{stats['errors']:>8}")
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+
+    if args.compare:
+        try:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        except FileNotFoundError:
+            print(f"No baseline at {args.baseline}; run with --save-baseline first")
+            return 2
+        regressions = compare(results, baseline, args.tolerance)
+        for name, message in regressions:
+            print(f"REGRESSION {name}: {message}")
+        if regressions:
+            return 1
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,29 @@
+import os
+
+# Point the app at a throwaway database before it is imported; load_dotenv()
+# never overrides variables that are already set.
+os.environ['DATABASE_URL'] = os.getenv('TEST_DATABASE_URL', 'sqlite://')
+os.environ.setdefault('SECRET_KEY', 'test-secret')
+os.environ.setdefault('JWT_SECRET_KEY', 'test-jwt-secret-key-with-enough-bytes')
+os.environ['MAIL_WORKER_THREADS'] = '0'
+
+import pytest
+
+
+@pytest.fixture
+def app():
+    from app import app as flask_app
+    from database import db
+
+    with flask_app.app_context():
+        db.create_all()
+        # Rules compiled for a previous test's database must not leak into this one
+        flask_app.extensions['alert_rules'].invalidate()
+        yield flask_app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
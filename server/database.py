@@ -1,3 +1,18 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.dialects import postgresql, sqlite
 
-db = SQLAlchemy()
\ No newline at end of file
+db = SQLAlchemy()
+
+def upsert(model, values, index_elements, set_=None):
+    """
+    Build an INSERT ... ON CONFLICT DO UPDATE for the bound dialect.
+    `set_` may reference the proposed row through the returned statement's
+    `excluded` columns, so it is given as a callable taking that namespace.
+    Without `set_` a conflicting row is left as it is (ON CONFLICT DO NOTHING).
+    """
+    dialect = db.session.get_bind().dialect.name
+    insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+    stmt = insert(model).values(values)
+    if set_ is None:
+        return stmt.on_conflict_do_nothing(index_elements=index_elements)
+    return stmt.on_conflict_do_update(index_elements=index_elements, set_=set_(stmt.excluded))
@@ -0,0 +1,207 @@
+"""
+Live event fan-out for the /stream Server-Sent Events endpoint and for
+in-process listeners such as the predictor's feature store.
+
+Publishers call publish(kind, data) once their transaction has committed.
+Each worker hands events to the streams connected to it; the PostgreSQL
+broker relays events between gunicorn workers (and the mail sidecar or
+any other process) through LISTEN/NOTIFY, while the local broker is an
+in-process stand-in for SQLite and single-worker runs.
+"""
+import json
+import queue
+import select
+import threading
+import time
+
+from sqlalchemy import text
+
+from database import db
+
+CHANNEL = 'ptank_events'
+EVENT_TYPES = ('reading', 'notification')
+
+
+class Subscription:
+    """One connected stream: a bounded queue of events it asked for."""
+
+    def __init__(self, kinds=None, max_pending=100):
+        self.kinds = kinds
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.overflowed = False
+
+    def deliver(self, event):
+        if self.kinds and event['type'] not in self.kinds:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            # A stalled client: drop its backlog and tell it to refetch instead
+            self.overflowed = True
+
+    def next(self, timeout):
+        """The next event, or None once `timeout` seconds pass without one."""
+        if self.overflowed:
+            self.overflowed = False
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            return {'type': 'resync', 'data': {}}
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class LocalEventBroker:
+    """Delivers to the streams connected to this process only."""
+
+    def __init__(self, max_pending=100):
+        self.max_pending = max_pending
+        self._subscriptions = set()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def add_listener(self, callback):
+        """Call `callback(event)` for every event this process receives."""
+        self._callbacks.append(callback)
+
+    def ensure_listening(self):
+        """Nothing to start for in-process delivery."""
+
+    def subscribe(self, kinds=None):
+        subscription = Subscription(kinds, self.max_pending)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def subscriber_count(self):
+        return len(self._subscriptions)
+
+    def publish(self, kind, data):
+        self.dispatch({'type': kind, 'data': data})
+
+    def dispatch(self, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            subscription.deliver(event)
+        for callback in self._callbacks:
+            try:
+                callback(event)
+            except Exception as e:
+                print(f"[events] Listener failed on {event.get('type')}: {e!r}")
+
+
+class PostgresEventBroker(LocalEventBroker):
+    """
+    Publishes with pg_notify and runs one LISTEN connection per worker,
+    started on first use, that dispatches to local streams and listeners.
+    Every worker (the publisher's included) receives events the same way.
+    """
+
+    def __init__(self, app, max_pending=100, reconnect_seconds=5):
+        super().__init__(max_pending)
+        self.app = app
+        self.reconnect_seconds = reconnect_seconds
+        self._listener = None
+
+    def publish(self, kind, data):
+        payload = json.dumps({'type': kind, 'data': data}, default=str)
+        with self.app.app_context():
+            with db.engine.connect() as conn:
+                conn.execute(text("SELECT pg_notify(:channel, :payload)"),
+                             {'channel': CHANNEL, 'payload': payload})
+                conn.commit()
+
+    def ensure_listening(self):
+        # Started on first use rather than at import so it lives in the forked worker
+        if self._listener is None or not self._listener.is_alive():
+            with self._lock:
+                if self._listener is None or not self._listener.is_alive():
+                    self._listener = threading.Thread(target=self._listen, name='event-listener', daemon=True)
+                    self._listener.start()
+
+    def subscribe(self, kinds=None):
+        self.ensure_listening()
+        return super().subscribe(kinds)
+
+    def _listen(self):
+        while True:
+            try:
+                with self.app.app_context():
+                    # A dedicated connection taken out of the pool for good
+                    pooled = db.engine.raw_connection()
+                    pooled.detach()
+                conn = pooled.driver_connection
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(f"LISTEN {CHANNEL}")
+                try:
+                    while True:
+                        if select.select([conn], [], [], self.reconnect_seconds) == ([], [], []):
+                            continue
+                        conn.poll()
+                        while conn.notifies:
+                            notify = conn.notifies.pop(0)
+                            try:
+                                self.dispatch(json.loads(notify.payload))
+                            except ValueError:
+                                print(f"[events] Ignoring malformed payload: {notify.payload[:200]!r}")
+                finally:
+                    conn.close()
+            except Exception as e:
+                print(f"[events] Listener error, reconnecting: {e!r}")
+                time.sleep(self.reconnect_seconds)
+
+
+class StreamSlots:
+    """
+    Counts the streams open in this worker. Each one holds a request
+    thread, so they are capped below the thread count to leave the rest
+    for ordinary API requests.
+    """
+
+    def __init__(self):
+        self.open = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, limit):
+        with self._lock:
+            if self.open >= limit:
+                return False
+            self.open += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.open -= 1
+
+
+def create_event_broker(app):
+    kind = app.config.get('EVENTS_BACKEND', 'auto')
+    if kind == 'auto':
+        uri = app.config.get('SQLALCHEMY_DATABASE_URI') or ''
+        kind = 'postgres' if uri.startswith('postgres') else 'local'
+    max_pending = app.config.get('SSE_MAX_PENDING_EVENTS', 100)
+    if kind == 'postgres':
+        return PostgresEventBroker(app, max_pending=max_pending)
+    return LocalEventBroker(max_pending=max_pending)
+
+
+def publish(app, kind, data):
+    """Best-effort publish; a broker hiccup never fails the write that caused it."""
+    broker = app.extensions.get('events')
+    if broker is None:
+        return
+    try:
+        broker.publish(kind, data)
+    except Exception as e:
+        print(f"[events] Failed to publish {kind}: {e!r}")
+
+
+def format_sse(event):
+    return f"event: {event['type']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
@@ -0,0 +1,97 @@
+"""
+Rolling windows of the latest readings per tank for the predictor's lag features.
+
+Each worker keeps a small ring buffer of (timestamp, id, sensor_cm) per
+tank, warm-started from that tank's newest sensor_readings rows and then
+advanced by the 'reading' events every ingest path publishes (relayed
+across workers by the events broker). sensor_readings itself is the
+durable copy: after a crash or restart a window is simply reloaded from it.
+"""
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from sqlalchemy import select
+
+from database import db
+from models import DEFAULT_TANK_ID, SensorReading
+
+
+class FeatureStore:
+    def __init__(self, to_sensor_cm, capacity=6, refresh_seconds=300, broker=None):
+        self.to_sensor_cm = to_sensor_cm
+        self.capacity = capacity
+        self.refresh_seconds = refresh_seconds
+        self.broker = broker
+        self._windows = {}  # tank_id -> deque, oldest first
+        self._loaded_at = {}  # tank_id -> monotonic time of the last warm start
+        self._lock = threading.Lock()
+        if broker is not None:
+            broker.add_listener(self.on_event)
+
+    def warm_start(self, tank_id=None):
+        """Reload a tank's window from its newest rows (an index walk of `capacity` rows)."""
+        tank_id = tank_id or DEFAULT_TANK_ID
+        rows = db.session.execute(
+            select(SensorReading.timestamp, SensorReading.id, SensorReading.tank_level_per)
+            .where(SensorReading.tank_id == tank_id)
+            .order_by(SensorReading.timestamp.desc(), SensorReading.id.desc())
+            .limit(self.capacity)
+        ).all()
+        with self._lock:
+            self._windows[tank_id] = deque(
+                ((timestamp, reading_id, self.to_sensor_cm(level)) for timestamp, reading_id, level in reversed(rows)),
+                maxlen=self.capacity
+            )
+            self._loaded_at[tank_id] = time.monotonic()
+
+    def invalidate(self, tank_id=None):
+        """Reload one tank's window on its next use, or every tank's without `tank_id`."""
+        with self._lock:
+            if tank_id is None:
+                self._loaded_at.clear()
+            else:
+                self._loaded_at.pop(tank_id, None)
+
+    def record(self, reading):
+        """Fold one new reading (an event payload) into its tank's window."""
+        if reading.get('batch_size', 1) > 1:
+            # Batches publish only their newest row (and may span tanks); reload to pick up the rest
+            self.invalidate()
+            return
+
+        tank_id = reading.get('tank_id') or DEFAULT_TANK_ID
+        entry = (
+            datetime.fromisoformat(reading['timestamp']),
+            reading['id'],
+            self.to_sensor_cm(reading['tank_level_per'])
+        )
+        with self._lock:
+            window = self._windows.get(tank_id)
+            if tank_id not in self._loaded_at or window is None:
+                return  # the next warm start reads it from the table
+            if any(held[:2] == entry[:2] for held in window):
+                return  # already loaded by the warm start, or a replayed event
+            if not window or entry[:2] > window[-1][:2]:
+                window.append(entry)
+            else:
+                # Late (back-dated) reading: keep the window in time order
+                ordered = sorted([*window, entry])[-self.capacity:]
+                self._windows[tank_id] = deque(ordered, maxlen=self.capacity)
+
+    def on_event(self, event):
+        if event.get('type') == 'reading':
+            self.record(event['data'])
+
+    def readings(self, tank_id=None):
+        """A tank's buffered sensor_cm values, oldest first. Needs an app context on a reload."""
+        tank_id = tank_id or DEFAULT_TANK_ID
+        if self.broker is not None:
+            self.broker.ensure_listening()
+        loaded_at = self._loaded_at.get(tank_id)
+        if loaded_at is None or time.monotonic() - loaded_at > self.refresh_seconds:
+            # Periodic reloads also catch rows written without an event (bulk loads)
+            self.warm_start(tank_id)
+        with self._lock:
+            return [sensor_cm for _, _, sensor_cm in self._windows[tank_id]]
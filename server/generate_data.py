@@ -1,3 +1,21 @@
+"""
+Synthetic septic tank readings for training and load tests.
+
+    python generate_data.py                                   # septic_tank_data.csv, one tank, 120 days
+    python generate_data.py --tanks 200 --days 365 --interval 1 --out readings.csv --sql load.sql
+    python generate_data.py --tanks 50 --days 90 --format parquet --out readings.parquet
+    python generate_data.py --tanks 1 --days 30 --interval 10 --load-db   # into DATABASE_URL
+
+Each tank fills with seasonal, weekend and time-of-day usage plus random
+spikes, and is pumped out every 30-45 days. Readings are generated per tank
+in blocks of --chunk-rows with array operations, carrying the fill level
+and pumping schedule across blocks, so memory stays bounded however many
+rows are written.
+"""
+import argparse
+import os
+import time
+
 import numpy as np
 import pandas as pd
 
@@ -5,51 +23,199 @@ EMPTY_READING = 22.0
 TANK_DEPTH = 27.0
 MAX_FILL_RANGE = TANK_DEPTH - EMPTY_READING
 DAYS = 120  # 4 months for better seasonality
+START = "2023-01-01"
+# Usage rates below were tuned for a reading every 6 hours
+BASE_INTERVAL_MINUTES = 360
+COLUMNS = ["timestamp", "tank_id", "sensor_cm", "true_level", "percent_full", "temp", "ph"]
+
+
+def _pump_days(rng, days):
+    """Days on which the tank is emptied (a 30-45 day cycle)."""
+    gaps = rng.integers(31, 46, size=days // 30 + 2)
+    return np.concatenate(([0], np.cumsum(gaps)))
+
+
+def generate_tank(tank_id, start, days, interval_minutes, chunk_rows, seed):
+    """Yield DataFrames of at most `chunk_rows` readings for one tank, in time order."""
+    rng = np.random.default_rng([seed, tank_id])
+    pump_days = _pump_days(rng, days)
+    usage_scale = rng.uniform(0.7, 1.3)  # households differ
+    rate = interval_minutes / BASE_INTERVAL_MINUTES
+
+    total = days * 24 * 60 // interval_minutes
+    start = np.datetime64(pd.Timestamp(start), "m")
+    level_carry = 0.0  # fill level before the block's first reading
+    cycle_carry = -1  # pumping cycle of the previous reading
+
+    for first in range(0, total, chunk_rows):
+        minutes = np.arange(first, min(first + chunk_rows, total), dtype=np.int64) * interval_minutes
+        n = minutes.shape[0]
+        day = minutes // 1440
+        hour = (minutes // 60) % 24
+
+        seasonal = 0.7 + 0.6 * np.sin(2 * np.pi * day / 120)
+        weekend = np.where(day % 7 >= 5, 1.8, 1.0)
+        time_of_day = np.select([(hour >= 6) & (hour <= 9), (hour >= 18) & (hour <= 21)], [2.0, 2.5], 1.0)
+        spikes = np.where(rng.random(n) < 0.15, rng.uniform(2, 5, n), 1.0)
+        usage = rng.uniform(0.03, 0.08, n) * seasonal * time_of_day * spikes * weekend * usage_scale * rate
+
+        # Level is the usage summed since the last pump-out, capped at full. Usage is
+        # never negative, so capping the running sum equals capping at every step.
+        cycle = np.searchsorted(pump_days, day, side="right")
+        running = np.cumsum(usage)
+        resets = np.flatnonzero(cycle != np.concatenate(([cycle_carry], cycle[:-1])))
+        # Offset to subtract from the running sum: the sum just before the cycle began
+        # (the carried level, negated, for a cycle that started in an earlier block)
+        base_at = np.zeros(n, dtype=np.int64)
+        base_at[resets] = resets
+        base_at = np.maximum.accumulate(base_at)
+        in_block = np.zeros(n, dtype=bool)
+        in_block[resets] = True
+        in_block = np.logical_or.accumulate(in_block)
+        base = np.where(in_block, running[base_at] - usage[base_at], -level_carry)
+        true_level = np.minimum(running - base, 1.0)
+        level_carry = float(true_level[-1])
+        cycle_carry = int(cycle[-1])
+
+        sensor_cm = EMPTY_READING - MAX_FILL_RANGE * true_level + rng.normal(0, 0.05, n)  # 5mm noise
+        yield pd.DataFrame({
+            "timestamp": start + minutes.astype("timedelta64[m]"),
+            "tank_id": np.full(n, tank_id, dtype=np.int32),
+            "sensor_cm": sensor_cm.round(2),
+            "true_level": true_level.round(4),
+            "percent_full": (true_level * 100).round(1),
+            "temp": (22 + 6 * np.sin(2 * np.pi * (day - 100) / 365) + rng.normal(0, 0.5, n)).round(2),
+            "ph": (7.0 + rng.normal(0, 0.15, n)).round(2)
+        }, columns=COLUMNS)
+
+
+def generate_chunks(tanks=1, days=DAYS, interval_minutes=BASE_INTERVAL_MINUTES, chunk_rows=1_000_000,
+                    seed=42, start=START):
+    for tank_id in range(1, tanks + 1):
+        yield from generate_tank(tank_id, start, days, interval_minutes, chunk_rows, seed)
+
+
+# One %-format per row is ~3x faster than DataFrame.to_csv's float formatting
+CSV_ROW = "%s,%d,%.2f,%.4f,%.1f,%.2f,%.2f\n"
+
+
+def write_csv(chunks, path):
+    rows = 0
+    with open(path, "w") as f:
+        f.write(",".join(COLUMNS) + "\n")
+        for chunk in chunks:
+            columns = [np.datetime_as_string(chunk["timestamp"].to_numpy(), unit="s").tolist()]
+            columns += [chunk[name].tolist() for name in COLUMNS[1:]]
+            f.writelines(map(CSV_ROW.__mod__, zip(*columns)))
+            rows += len(chunk)
+    return rows
+
+
+def write_parquet(chunks, path):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise SystemExit("Parquet output needs pyarrow (pip install pyarrow)")
+
+    rows = 0
+    writer = None
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)  # one row group per chunk
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+def write_load_sql(csv_path, sql_path):
+    """psql script that bulk-loads a generated CSV into sensor_readings with COPY."""
+    with open(sql_path, "w") as f:
+        f.write(f"""\\set ON_ERROR_STOP on
+BEGIN;
+CREATE TEMP TABLE generated_readings (
+    timestamp timestamp, tank_id integer, sensor_cm real, true_level real,
+    percent_full real, temp real, ph real
+) ON COMMIT DROP;
+\\copy generated_readings FROM '{os.path.abspath(csv_path)}' WITH (FORMAT csv, HEADER true)
+INSERT INTO tanks (id, name)
+SELECT DISTINCT tank_id, 'Tank ' || tank_id FROM generated_readings ORDER BY tank_id
+ON CONFLICT (id) DO NOTHING;
+SELECT setval(pg_get_serial_sequence('tanks', 'id'), (SELECT max(id) FROM tanks));
+INSERT INTO sensor_readings (timestamp, tank_id, temp, ph, tank_level_per)
+SELECT timestamp, tank_id, temp, ph, percent_full FROM generated_readings ORDER BY timestamp;
+COMMIT;
+ANALYZE sensor_readings;
+""")
+
+
+def load_db(chunks):
+    """Insert straight into DATABASE_URL's sensor_readings, one transaction per chunk."""
+    from sqlalchemy import insert, select, text
+
+    from app import app
+    from database import db
+    from models import SensorReading, Tank
+
+    rows = 0
+    with app.app_context():
+        known = set(db.session.scalars(select(Tank.id)))
+        for chunk in chunks:
+            missing = set(chunk["tank_id"].unique().tolist()) - known
+            if missing:
+                db.session.add_all(Tank(id=tank_id, name=f"Tank {tank_id}") for tank_id in sorted(missing))
+                known |= missing
+                if db.session.get_bind().dialect.name == 'postgresql':
+                    # Explicit ids don't advance the sequence; keep POST /tanks from colliding with them
+                    db.session.flush()
+                    db.session.execute(text("SELECT setval(pg_get_serial_sequence('tanks', 'id'), (SELECT max(id) FROM tanks))"))
+            db.session.execute(insert(SensorReading), [
+                {"timestamp": ts, "tank_id": tank_id, "temp": temp, "ph": ph, "tank_level_per": level}
+                for ts, tank_id, temp, ph, level in zip(
+                    chunk["timestamp"].to_numpy().astype("datetime64[us]").tolist(), chunk["tank_id"].tolist(),
+                    chunk["temp"].tolist(), chunk["ph"].tolist(), chunk["percent_full"].tolist())
+            ])
+            db.session.commit()
+            rows += len(chunk)
+    return rows
+
+
+def generate_data(path="septic_tank_data.csv", **options):
+    """Write one CSV and return it as a DataFrame (small runs only)."""
+    write_csv(generate_chunks(**options), path)
+    return pd.read_csv(path, parse_dates=["timestamp"])
 
-def generate_data():
-    np.random.seed(42)
-    timestamps = pd.date_range("2023-01-01", periods=DAYS, freq="D")
-    data = []
-    current_level = 0.0
-    last_pumped = 0
-
-    for day in range(DAYS):
-        # Tank emptying simulation (every 30-45 days)
-        if day - last_pumped > np.random.randint(30, 45):
-            current_level = 0.0
-            last_pumped = day
-            
-        seasonal_factor = 0.7 + 0.6*np.sin(2*np.pi*day/120)
-        weekend_factor = 1.8 if day % 7 >= 5 else 1.0
-        
-        for hour in [6, 12, 18, 22]:
-            # Base usage with realistic patterns
-            base = np.random.uniform(0.03, 0.08) * seasonal_factor
-            
-            # Time-of-day effects
-            if 6 <= hour <= 9:
-                base *= 2.0  # Morning usage
-            elif 18 <= hour <= 21:
-                base *= 2.5  # Evening peak
-                
-            # Random spikes (15% chance)
-            if np.random.random() < 0.15:
-                base *= np.random.uniform(2, 5)
-                
-            current_level = min(current_level + base * weekend_factor, 1.0)
-            reading = EMPTY_READING - (MAX_FILL_RANGE * current_level)
-            reading += np.random.normal(0, 0.05)  # 5mm noise
-            
-            data.append({
-                "timestamp": timestamps[day] + pd.Timedelta(hours=hour),
-                "sensor_cm": round(reading, 2),
-                "true_level": round(current_level, 4)
-            })
-    
-    df = pd.DataFrame(data)
-    df["percent_full"] = (df["true_level"] * 100).round(1)
-    df.to_csv("septic_tank_data.csv", index=False)
-    return df
 
 if __name__ == "__main__":
-    generate_data()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generate synthetic tank readings")
+    parser.add_argument("--tanks", type=int, default=1)
+    parser.add_argument("--days", type=int, default=DAYS)
+    parser.add_argument("--interval", type=int, default=BASE_INTERVAL_MINUTES, help="minutes between readings")
+    parser.add_argument("--start", default=START)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-rows", type=int, default=1_000_000)
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--out", default="septic_tank_data.csv")
+    parser.add_argument("--sql", help="also write a psql COPY script that loads the CSV into sensor_readings")
+    parser.add_argument("--load-db", action="store_true", help="insert into DATABASE_URL instead of writing a file")
+    args = parser.parse_args()
+
+    chunks = generate_chunks(args.tanks, args.days, args.interval, args.chunk_rows, args.seed, args.start)
+    started = time.perf_counter()
+    if args.load_db:
+        rows = load_db(chunks)
+        target = "sensor_readings"
+    elif args.format == "parquet":
+        rows = write_parquet(chunks, args.out)
+        target = args.out
+    else:
+        rows = write_csv(chunks, args.out)
+        target = args.out
+        if args.sql:
+            write_load_sql(args.out, args.sql)
+    print(f"Wrote {rows:,} readings to {target} in {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,46 @@
+"""
+Gunicorn settings (picked up automatically from the working directory).
+
+The app, and with it the forecast model, is imported once in the master
+and forked into every worker, so workers share those pages copy-on-write
+instead of each deserializing their own copy at boot.
+"""
+import gc
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+# Open /stream connections each hold a thread, so use threaded workers; SSE_MAX_STREAMS
+# (default half of GUNICORN_THREADS) keeps the rest of each worker's threads for the API
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 16))
+preload_app = True
+
+# Per the gc docs for fork-without-exec: no collections in the master while
+# the app loads, freeze what it built right before each fork so collections
+# in the workers never write to (and so un-share) those objects' headers,
+# then collect normally in the workers
+gc.disable()
+
+
+def on_starting(server):
+    # Metric snapshots left by a previous run's workers would be merged into this one's
+    from metrics import clear_snapshots
+    clear_snapshots(os.getenv('METRICS_DIR'))
+
+
+def pre_fork(server, worker):
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    gc.enable()
+
+    # Pooled connections must not be shared across processes
+    from app import app
+    from database import db
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+    # Drain the outbox from the start, including mail queued before a restart
+    app.extensions['mail_worker'].start()
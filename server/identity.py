@@ -0,0 +1,72 @@
+"""
+Request identity resolved from the JWT subject plus a small per-worker TTL
+cache of user rows, so hot endpoints don't query `users` just to confirm
+the caller still exists. Writers call invalidate_user() after changing a user;
+other workers pick the change up when their entry expires.
+"""
+import threading
+import time
+from collections import namedtuple
+
+from flask_jwt_extended import get_jwt_identity
+
+from database import db
+from models import User
+
+CachedUser = namedtuple('CachedUser', 'id full_name email role receive_email_alerts created_at')
+
+
+class UserCache:
+    def __init__(self, ttl_seconds=30, max_entries=10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        entry = self._entries.get(user_id)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+
+        user = db.session.get(User, user_id)
+        # Missing users are cached too, so a deleted account's tokens stay cheap to reject
+        cached = None if user is None else CachedUser(
+            user.id, user.full_name, user.email, user.role, user.receive_email_alerts, user.created_at
+        )
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._entries.clear()
+            self._entries[user_id] = (time.monotonic() + self.ttl_seconds, cached)
+        return cached
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+
+user_cache = UserCache()
+
+
+def get_current_user_id():
+    return int(get_jwt_identity())
+
+
+def get_current_user():
+    """The caller as a CachedUser, or None if the account no longer exists."""
+    return user_cache.get(get_current_user_id())
+
+
+def get_current_admin():
+    """
+    The caller if they are an admin, else None. The role comes from the
+    cached row rather than the token's claim, so promotions and demotions
+    apply without waiting for the token to expire.
+    """
+    user = get_current_user()
+    if user is None or user.role != 'Admin':
+        return None
+    return user
+
+
+def invalidate_user(user_id):
+    user_cache.invalidate(int(user_id))
@@ -0,0 +1,230 @@
+"""
+Durable outbox for alert emails.
+
+Requests only insert rows into `email_outbox`; a small pool of worker threads
+(or the `python mail_queue.py` sidecar) drains it, sending every claimed
+message over one authenticated SMTP session and retrying failures with
+exponential backoff.
+"""
+import smtplib
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from email.mime.text import MIMEText
+
+from sqlalchemy import insert, select, text, update
+
+from database import db
+from metrics import SMTP_SECONDS
+from models import EmailOutbox
+from models.email_outbox import CLAIMABLE
+
+MAX_ATTEMPTS = 5
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 3600
+LEASE_SECONDS = 300  # a crashed worker's claimed rows become claimable again after this
+
+
+def enqueue_emails(recipients, body, subject):
+    """Queue one message per recipient in the current session (caller commits)."""
+    rows = [
+        {"recipient": recipient, "subject": subject, "body": body}
+        for recipient in recipients
+    ]
+    if rows:
+        db.session.execute(insert(EmailOutbox), rows)
+    return len(rows)
+
+
+def backoff_seconds(attempts):
+    return min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS)
+
+
+def open_smtp(config):
+    """Open and authenticate a single SMTP session from app config."""
+    server = config.get('MAIL_SERVER', 'smtp.gmail.com')
+    port = int(config.get('MAIL_PORT', 465))
+    timeout = config.get('MAIL_TIMEOUT', 10)
+
+    if config.get('MAIL_USE_SSL', True):
+        smtp = smtplib.SMTP_SSL(server, port, timeout=timeout)
+    else:
+        smtp = smtplib.SMTP(server, port, timeout=timeout)
+        if config.get('MAIL_USE_TLS'):
+            smtp.starttls()
+
+    username = config.get('MAIL_USERNAME')
+    if username:
+        try:
+            smtp.login(username, config.get('MAIL_PASSWORD'))
+        except Exception:
+            smtp.close()
+            raise
+    return smtp
+
+
+def claim_batch(limit):
+    """
+    Atomically lease up to `limit` due messages to this caller.
+    SKIP LOCKED lets concurrent workers on PostgreSQL claim disjoint rows.
+    Due rows are claimed oldest-first; the partial ix_email_outbox_due index
+    holds only claimable rows in that order, so no sort is needed.
+    """
+    now = datetime.utcnow()
+    token = uuid.uuid4().hex
+    due = (
+        select(EmailOutbox.id)
+        .where(
+            text(CLAIMABLE),
+            EmailOutbox.next_attempt_at <= now
+        )
+        .order_by(EmailOutbox.next_attempt_at, EmailOutbox.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    db.session.execute(
+        update(EmailOutbox)
+        .where(EmailOutbox.id.in_(due.scalar_subquery()))
+        .values(
+            status='sending',
+            claim_token=token,
+            next_attempt_at=now + timedelta(seconds=LEASE_SECONDS)
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+    return EmailOutbox.query.filter_by(claim_token=token, status='sending').all()
+
+
+def _record_failure(message, error):
+    message.attempts += 1
+    message.last_error = repr(error)[:1000]
+    message.claim_token = None
+    if message.attempts >= MAX_ATTEMPTS:
+        message.status = 'failed'
+    else:
+        message.status = 'pending'
+        message.next_attempt_at = datetime.utcnow() + timedelta(seconds=backoff_seconds(message.attempts))
+
+
+def deliver_pending(app, batch_size=50):
+    """
+    Send one batch of due messages over a single SMTP session.
+    Returns the number of messages claimed, so callers can keep draining.
+    """
+    messages = claim_batch(batch_size)
+    if not messages:
+        return 0
+
+    sender = app.config.get('MAIL_USERNAME')
+    started = time.perf_counter()
+    try:
+        smtp = open_smtp(app.config)
+    except Exception as e:
+        SMTP_SECONDS.observe(time.perf_counter() - started, operation='connect', result='error')
+        print(f"[mail_queue] Could not open SMTP session: {e!r}")
+        for message in messages:
+            _record_failure(message, e)
+        db.session.commit()
+        return len(messages)
+
+    SMTP_SECONDS.observe(time.perf_counter() - started, operation='connect', result='ok')
+
+    with smtp:
+        for message in messages:
+            msg = MIMEText(message.body)
+            msg['Subject'] = message.subject
+            msg['From'] = sender
+            msg['To'] = message.recipient
+            started = time.perf_counter()
+            try:
+                smtp.send_message(msg)
+            except Exception as e:
+                SMTP_SECONDS.observe(time.perf_counter() - started, operation='send', result='error')
+                print(f"[mail_queue] Error sending email {message.id} to {message.recipient}: {e!r}")
+                _record_failure(message, e)
+                if isinstance(e, smtplib.SMTPServerDisconnected):
+                    break
+            else:
+                SMTP_SECONDS.observe(time.perf_counter() - started, operation='send', result='ok')
+                message.status = 'sent'
+                message.sent_at = datetime.utcnow()
+                message.claim_token = None
+            db.session.commit()
+
+    # Anything left unsent after a dropped connection goes back on the queue
+    for message in messages:
+        if message.status == 'sending':
+            _record_failure(message, smtplib.SMTPServerDisconnected("Connection lost mid-batch"))
+    db.session.commit()
+
+    sent = sum(1 for m in messages if m.status == 'sent')
+    print(f"[mail_queue] Sent {sent}/{len(messages)} queued emails")
+    return len(messages)
+
+
+class MailWorker:
+    """
+    In-process pool draining the outbox. Threads start in each gunicorn
+    worker after the fork (or on the first request or wake()), never at
+    import, so seeding, tests and the gunicorn master spawn nothing. Each
+    thread drains once on start, so mail left by a previous run goes out
+    without waiting for a new alert.
+    """
+
+    def __init__(self, app, threads=1, batch_size=50, poll_seconds=30):
+        self.app = app
+        self.threads = threads
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._workers = []
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self._workers or self.threads <= 0:
+            return
+        with self._lock:
+            if self._workers or self.threads <= 0:
+                return
+            for i in range(self.threads):
+                worker = threading.Thread(target=self.run, name=f"mail-worker-{i}", daemon=True)
+                worker.start()
+                self._workers.append(worker)
+
+    def wake(self):
+        self.start()
+        self._wakeup.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+
+    def run(self):
+        while not self._stop.is_set():
+            with self.app.app_context():
+                try:
+                    while not self._stop.is_set() and deliver_pending(self.app, self.batch_size):
+                        pass
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"[mail_queue] Worker error: {e!r}")
+                finally:
+                    db.session.remove()
+            self._wakeup.wait(self.poll_seconds)
+            self._wakeup.clear()
+
+
+if __name__ == '__main__':
+    # Sidecar mode: `python mail_queue.py` drains the outbox in the foreground
+    from app import app
+
+    worker = MailWorker(
+        app,
+        batch_size=app.config['MAIL_BATCH_SIZE'],
+        poll_seconds=app.config['MAIL_POLL_SECONDS']
+    )
+    worker.run()
@@ -0,0 +1,319 @@
+"""
+Request, SQL, model and SMTP timings in Prometheus text format.
+
+init_app() hooks the Flask request cycle and SQLAlchemy's cursor events:
+every request records its latency plus how many statements it ran and
+how long they took, and a request that repeats one statement many times
+(an N+1 pattern) is logged as a JSON line. The predictor and the mail
+queue observe their own timings into the histograms below.
+
+Each process keeps its own counters. With METRICS_DIR set, every worker
+also writes a snapshot there periodically, and /metrics merges the
+snapshots of all workers, so any worker can answer a scrape for the
+whole service.
+"""
+import hmac
+import json
+import os
+import threading
+import time
+from collections import Counter as Tally
+from contextvars import ContextVar
+from math import inf
+
+from flask import Response, g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(key), value if not isinstance(value, list) else list(value)]
+                    for key, value in self._values.items()]
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    @staticmethod
+    def merge(values, other):
+        return values + other
+
+    def samples(self, key, value):
+        yield self.name + '_total', key, value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            # [count per bucket (non-cumulative, +Inf last)..., sum]
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    break
+            else:
+                i = len(self.buckets)
+            entry[i] += 1
+            entry[-1] += value
+
+    @staticmethod
+    def merge(values, other):
+        return [a + b for a, b in zip(values, other)]
+
+    def samples(self, key, value):
+        cumulative = 0
+        for bound, count in zip(self.buckets + (inf,), value[:-1]):
+            cumulative += count
+            yield self.name + '_bucket', key + (('+Inf' if bound == inf else repr(float(bound))),), cumulative
+        yield self.name + '_sum', key, value[-1]
+        yield self.name + '_count', key, cumulative
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.metrics.setdefault(name, Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.metrics.setdefault(name, Histogram(name, documentation, labelnames, buckets))
+
+    def snapshot(self):
+        return {name: metric.snapshot() for name, metric in self.metrics.items()}
+
+    def render(self, snapshots):
+        """Prometheus text exposition of the merged snapshots."""
+        lines = []
+        for name, metric in self.metrics.items():
+            merged = {}
+            for snapshot in snapshots:
+                for key, value in snapshot.get(name, []):
+                    key = tuple(key)
+                    merged[key] = metric.merge(merged[key], value) if key in merged else value
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            labelnames = metric.labelnames + (('le',) if metric.kind == 'histogram' else ())
+            for key, value in sorted(merged.items()):
+                for sample, values, number in metric.samples(key, value):
+                    labels = ','.join(f'{label}="{_escape(v)}"' for label, v in zip(labelnames, values))
+                    lines.append(f"{sample}{{{labels}}} {_number(number)}" if labels else f"{sample} {_number(number)}")
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+registry = Registry()
+
+REQUEST_SECONDS = registry.histogram(
+    'http_request_duration_seconds', "Time to produce a response", ('endpoint', 'method', 'status'))
+REQUEST_DB_STATEMENTS = registry.histogram(
+    'http_request_db_statements', "SQL statements executed per request", ('endpoint',), COUNT_BUCKETS)
+REQUEST_DB_SECONDS = registry.histogram(
+    'http_request_db_seconds', "Time spent in SQL per request", ('endpoint',), FAST_BUCKETS)
+N_PLUS_ONE = registry.counter(
+    'http_request_n_plus_one', "Requests that repeated one SQL statement at least N_PLUS_ONE_THRESHOLD times",
+    ('endpoint',))
+MODEL_INFERENCE_SECONDS = registry.histogram(
+    'model_inference_seconds', "Forecast model calls (one per horizon step)", ('kind',), FAST_BUCKETS)
+SMTP_SECONDS = registry.histogram(
+    'smtp_operation_seconds', "SMTP session setup and message sends", ('operation', 'result'))
+
+
+# SQL issued by the current request; None outside requests (workers, scripts, streamed bodies)
+_request_sql = ContextVar('request_sql', default=None)
+
+
+class RequestSQL:
+    __slots__ = ('statements', 'seconds', 'by_statement')
+
+    def __init__(self):
+        self.statements = 0
+        self.seconds = 0.0
+        self.by_statement = Tally()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['query_started'].pop()
+    tracker = _request_sql.get()
+    if tracker is not None:
+        tracker.statements += 1
+        tracker.seconds += time.perf_counter() - started
+        tracker.by_statement[statement] += 1
+
+
+def _handle_error(context):
+    # The after hook never runs for a failed statement; drop its start time
+    started = context.connection.info.get('query_started') if context.connection is not None else None
+    if started:
+        started.pop()
+
+
+_engine_hooks_installed = False
+
+
+def install_engine_hooks():
+    global _engine_hooks_installed
+    if not _engine_hooks_installed:
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+        _engine_hooks_installed = True
+
+
+class SnapshotWriter:
+    """Writes this worker's snapshot to METRICS_DIR so other workers can merge it."""
+
+    def __init__(self, directory, interval=15):
+        self.directory = directory
+        self.interval = interval
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def write(self):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f'{os.getpid()}.json')
+        tmp = f'{path}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(registry.snapshot(), f)
+        os.replace(tmp, path)
+
+    def read_all(self):
+        snapshots = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue  # a worker replaced it mid-read; its next write has it
+        return snapshots
+
+    def ensure_running(self):
+        # Started on first use rather than at import so it lives in the forked worker
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name='metrics-writer', daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.write()
+            except OSError as e:
+                print(f"[metrics] Could not write snapshot: {e!r}")
+
+
+def clear_snapshots(directory):
+    """Forget snapshots of a previous run (called by gunicorn before it forks)."""
+    if directory and os.path.isdir(directory):
+        for name in os.listdir(directory):
+            if name.endswith('.json'):
+                os.remove(os.path.join(directory, name))
+
+
+def init_app(app):
+    install_engine_hooks()
+    threshold = app.config.get('N_PLUS_ONE_THRESHOLD', 10)
+    writer = SnapshotWriter(app.config['METRICS_DIR'], app.config.get('METRICS_FLUSH_SECONDS', 15)) \
+        if app.config.get('METRICS_DIR') else None
+
+    @app.before_request
+    def start_request_metrics():
+        if writer is not None:
+            writer.ensure_running()
+        g.metrics_started = time.perf_counter()
+        g.metrics_sql_token = _request_sql.set(RequestSQL())
+
+    def finish(status):
+        started = g.pop('metrics_started', None)
+        token = g.pop('metrics_sql_token', None)
+        if started is None:
+            return
+        tracker = token.var.get()
+        token.var.reset(token)
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint, method=request.method, status=status)
+        REQUEST_DB_STATEMENTS.observe(tracker.statements, endpoint=endpoint)
+        REQUEST_DB_SECONDS.observe(tracker.seconds, endpoint=endpoint)
+
+        repeated = [(statement, count) for statement, count in tracker.by_statement.items() if count >= threshold]
+        if repeated:
+            N_PLUS_ONE.inc(endpoint=endpoint)
+            for statement, count in repeated:
+                print(json.dumps({
+                    'event': 'n_plus_one',
+                    'endpoint': endpoint,
+                    'method': request.method,
+                    'path': request.path,
+                    'count': count,
+                    'statements': tracker.statements,
+                    'statement': ' '.join(statement.split())[:300]
+                }))
+
+    @app.after_request
+    def record_request_metrics(response):
+        finish(response.status_code)
+        return response
+
+    @app.teardown_request
+    def record_failed_request(error):
+        # Only still pending when the request died before producing a response
+        finish(500)
+
+    @app.route('/metrics')
+    def metrics():
+        token = app.config.get('METRICS_TOKEN')
+        supplied = request.headers.get('Authorization', '')
+        if token and not hmac.compare_digest(supplied.encode(), f'Bearer {token}'.encode()):
+            return {"error": "Invalid metrics token"}, 401
+        if writer is None:
+            snapshots = [registry.snapshot()]
+        else:
+            writer.write()
+            snapshots = writer.read_all()
+        return Response(registry.render(snapshots), mimetype='text/plain; version=0.0.4')
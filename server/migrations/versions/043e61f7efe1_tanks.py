@@ -0,0 +1,263 @@
+"""tanks
+
+Revision ID: 043e61f7efe1
+Revises: 5d1f0b43ff0e
+Create Date: 2026-10-18 16:48:33.410626
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '043e61f7efe1'
+down_revision = '5d1f0b43ff0e'
+branch_labels = None
+depends_on = None
+
+# Everything recorded so far came from the one tank the app knew about
+DEFAULT_TANK_ID = 1
+READING_COLUMNS = 'id, timestamp, temp, ph, tank_level_per'
+
+
+def _recreate_with_tank_id(table, columns, primary_key, copy_columns):
+    """
+    Rebuild `table` with a leading tank_id in its primary key (SQLite cannot
+    alter a primary key in place), assigning existing rows to the default tank.
+    """
+    op.create_table(f'{table}_new',
+        sa.Column('tank_id', sa.Integer(), nullable=False),
+        *columns,
+        sa.ForeignKeyConstraint(['tank_id'], ['tanks.id'], name=f'fk_{table}_tank_id_tanks'),
+        sa.PrimaryKeyConstraint('tank_id', *primary_key, name=f'{table}_new_pkey')
+    )
+    op.execute(sa.text(f"""
+        INSERT INTO {table}_new (tank_id, {copy_columns})
+        SELECT {DEFAULT_TANK_ID}, {copy_columns} FROM {table}
+    """))
+    op.drop_table(table)
+    op.rename_table(f'{table}_new', table)
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(sa.text(f"ALTER TABLE {table} RENAME CONSTRAINT {table}_new_pkey TO {table}_pkey"))
+
+
+def _rollup_columns():
+    columns = [
+        sa.Column('bucket', sa.String(length=3), nullable=False),
+        sa.Column('bucket_start', sa.DateTime(), nullable=False),
+        sa.Column('reading_count', sa.Integer(), nullable=False),
+    ]
+    for metric in ('temp', 'ph', 'tank_level_per'):
+        for part in ('sum', 'min', 'max'):
+            columns.append(sa.Column(f'{metric}_{part}', sa.Float(), nullable=False))
+    return columns
+
+
+def _alert_state_columns():
+    return [
+        sa.Column('condition', sa.String(length=50), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('severity', sa.String(length=20), nullable=True),
+        sa.Column('value', sa.Float(), nullable=True),
+        sa.Column('peak_value', sa.Float(), nullable=True),
+        sa.Column('reading_count', sa.Integer(), nullable=False),
+        sa.Column('raised_at', sa.DateTime(), nullable=True),
+        sa.Column('cleared_at', sa.DateTime(), nullable=True),
+        sa.Column('last_seen_at', sa.DateTime(), nullable=True),
+        sa.Column('notified_at', sa.DateTime(), nullable=True),
+        sa.Column('notified_severity', sa.String(length=20), nullable=True),
+        sa.Column('notification_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['notification_id'], ['notifications.id'], ondelete='SET NULL'),
+    ]
+
+
+def _column_names(columns):
+    return ', '.join(c.name for c in columns if isinstance(c, sa.Column))
+
+
+def _partition_sensor_readings():
+    """
+    PostgreSQL: rebuild sensor_readings as a table partitioned by RANGE
+    (timestamp), one partition per month from the oldest reading through
+    three months ahead plus a DEFAULT partition, and copy every row across.
+    The primary key has to include the partition key, so it becomes
+    (id, timestamp); ids keep coming from the same sequence.
+    """
+    op.execute(sa.text("ALTER TABLE sensor_readings RENAME TO sensor_readings_unpartitioned"))
+    op.execute(sa.text("""
+        CREATE TABLE sensor_readings (
+            id integer NOT NULL,
+            timestamp timestamp without time zone DEFAULT CURRENT_TIMESTAMP NOT NULL,
+            temp double precision NOT NULL,
+            ph double precision NOT NULL,
+            tank_level_per double precision NOT NULL,
+            tank_id integer NOT NULL REFERENCES tanks (id)
+        ) PARTITION BY RANGE (timestamp)
+    """))
+    op.execute(sa.text("""
+        DO $$
+        DECLARE seq text := pg_get_serial_sequence('sensor_readings_unpartitioned', 'id');
+        BEGIN
+            EXECUTE format('ALTER TABLE sensor_readings ALTER COLUMN id SET DEFAULT nextval(%L)', seq);
+            EXECUTE format('ALTER SEQUENCE %s OWNED BY sensor_readings.id', seq);
+        END $$
+    """))
+    op.execute(sa.text("""
+        DO $$
+        DECLARE month date;
+        BEGIN
+            FOR month IN
+                SELECT generate_series(
+                    date_trunc('month', COALESCE((SELECT min(timestamp) FROM sensor_readings_unpartitioned), now())),
+                    date_trunc('month', now()) + interval '3 months',
+                    interval '1 month'
+                )::date
+            LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF sensor_readings FOR VALUES FROM (%L) TO (%L)',
+                    'sensor_readings_' || to_char(month, 'YYYY_MM'), month, (month + interval '1 month')::date
+                );
+            END LOOP;
+        END $$
+    """))
+    op.execute(sa.text("CREATE TABLE sensor_readings_default PARTITION OF sensor_readings DEFAULT"))
+    op.execute(sa.text(f"""
+        INSERT INTO sensor_readings ({READING_COLUMNS}, tank_id)
+        SELECT {READING_COLUMNS}, {DEFAULT_TANK_ID} FROM sensor_readings_unpartitioned
+    """))
+    op.execute(sa.text("DROP TABLE sensor_readings_unpartitioned"))
+
+    # Indexes after the copy: built once per partition instead of maintained row by row
+    op.execute(sa.text("ALTER TABLE sensor_readings ADD PRIMARY KEY (id, timestamp)"))
+    op.create_index('ix_sensor_readings_timestamp_id', 'sensor_readings', ['timestamp', 'id'],
+                    unique=False, postgresql_include=['temp', 'ph', 'tank_level_per'])
+    op.create_index('ix_sensor_readings_tank_id_timestamp_id', 'sensor_readings', ['tank_id', 'timestamp', 'id'],
+                    unique=False, postgresql_include=['temp', 'ph', 'tank_level_per'])
+    op.execute(sa.text("ANALYZE sensor_readings"))
+
+
+def _unpartition_sensor_readings():
+    """PostgreSQL: back to one plain sensor_readings table (tank_id dropped)."""
+    op.execute(sa.text("ALTER TABLE sensor_readings RENAME TO sensor_readings_partitioned"))
+    op.execute(sa.text("ALTER INDEX ix_sensor_readings_timestamp_id RENAME TO ix_sensor_readings_partitioned_timestamp_id"))
+    op.execute(sa.text("""
+        CREATE TABLE sensor_readings (
+            id integer NOT NULL PRIMARY KEY,
+            timestamp timestamp without time zone DEFAULT CURRENT_TIMESTAMP NOT NULL,
+            temp double precision NOT NULL,
+            ph double precision NOT NULL,
+            tank_level_per double precision NOT NULL
+        )
+    """))
+    op.execute(sa.text("""
+        DO $$
+        DECLARE seq text := pg_get_serial_sequence('sensor_readings_partitioned', 'id');
+        BEGIN
+            EXECUTE format('ALTER TABLE sensor_readings ALTER COLUMN id SET DEFAULT nextval(%L)', seq);
+            EXECUTE format('ALTER SEQUENCE %s OWNED BY sensor_readings.id', seq);
+        END $$
+    """))
+    op.execute(sa.text(f"""
+        INSERT INTO sensor_readings ({READING_COLUMNS})
+        SELECT {READING_COLUMNS} FROM sensor_readings_partitioned
+    """))
+    op.execute(sa.text("DROP TABLE sensor_readings_partitioned"))
+    op.create_index('ix_sensor_readings_timestamp_id', 'sensor_readings', ['timestamp', 'id'],
+                    unique=False, postgresql_include=['temp', 'ph', 'tank_level_per'])
+
+
+def upgrade():
+    op.create_table('tanks',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('location', sa.String(length=255), nullable=True),
+    sa.Column('owner_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.ForeignKeyConstraint(['owner_id'], ['users.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('tank_subscriptions',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('tank_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.ForeignKeyConstraint(['tank_id'], ['tanks.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'tank_id')
+    )
+    with op.batch_alter_table('tank_subscriptions', schema=None) as batch_op:
+        batch_op.create_index('ix_tank_subscriptions_tank_id', ['tank_id'], unique=False)
+
+    # The first row of a fresh table: id 1 is DEFAULT_TANK_ID
+    op.execute(sa.text("INSERT INTO tanks (name) VALUES ('Main tank')"))
+
+    with op.batch_alter_table('notifications', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('tank_id', sa.Integer(), nullable=True))
+        batch_op.create_index('ix_notifications_tank_id_created_at_id', ['tank_id', 'created_at', 'id'], unique=False)
+        batch_op.create_foreign_key('fk_notifications_tank_id_tanks', 'tanks', ['tank_id'], ['id'])
+    op.execute(sa.text(f"UPDATE notifications SET tank_id = {DEFAULT_TANK_ID}"))
+
+    alert_columns = _alert_state_columns()
+    _recreate_with_tank_id('alert_states', alert_columns, ['condition'], _column_names(alert_columns))
+
+    rollup_columns = _rollup_columns()
+    _recreate_with_tank_id('sensor_reading_rollups', rollup_columns, ['bucket', 'bucket_start'],
+                           _column_names(rollup_columns))
+    with op.batch_alter_table('sensor_reading_rollups', schema=None) as batch_op:
+        batch_op.create_index('ix_sensor_reading_rollups_bucket_bucket_start', ['bucket', 'bucket_start'], unique=False)
+
+    if op.get_bind().dialect.name == 'postgresql':
+        _partition_sensor_readings()
+    else:
+        with op.batch_alter_table('sensor_readings', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('tank_id', sa.Integer(), nullable=True))
+        op.execute(sa.text(f"UPDATE sensor_readings SET tank_id = {DEFAULT_TANK_ID}"))
+        with op.batch_alter_table('sensor_readings', schema=None) as batch_op:
+            batch_op.alter_column('tank_id', existing_type=sa.Integer(), nullable=False)
+            batch_op.create_index('ix_sensor_readings_tank_id_timestamp_id', ['tank_id', 'timestamp', 'id'], unique=False, postgresql_include=['temp', 'ph', 'tank_level_per'])
+            batch_op.create_foreign_key('fk_sensor_readings_tank_id_tanks', 'tanks', ['tank_id'], ['id'])
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        _unpartition_sensor_readings()
+    else:
+        with op.batch_alter_table('sensor_readings', schema=None) as batch_op:
+            batch_op.drop_constraint('fk_sensor_readings_tank_id_tanks', type_='foreignkey')
+            batch_op.drop_index('ix_sensor_readings_tank_id_timestamp_id', postgresql_include=['temp', 'ph', 'tank_level_per'])
+            batch_op.drop_column('tank_id')
+
+    # Per-tank rows fold back into one row per key; only the default tank's survive
+    rollup_columns = _rollup_columns()
+    op.create_table('sensor_reading_rollups_old', *rollup_columns,
+                    sa.PrimaryKeyConstraint('bucket', 'bucket_start', name='sensor_reading_rollups_old_pkey'))
+    op.execute(sa.text(f"""
+        INSERT INTO sensor_reading_rollups_old ({_column_names(rollup_columns)})
+        SELECT {_column_names(rollup_columns)} FROM sensor_reading_rollups WHERE tank_id = {DEFAULT_TANK_ID}
+    """))
+    op.drop_table('sensor_reading_rollups')
+    op.rename_table('sensor_reading_rollups_old', 'sensor_reading_rollups')
+
+    alert_columns = _alert_state_columns()
+    op.create_table('alert_states_old', *alert_columns,
+                    sa.PrimaryKeyConstraint('condition', name='alert_states_old_pkey'))
+    op.execute(sa.text(f"""
+        INSERT INTO alert_states_old ({_column_names(alert_columns)})
+        SELECT {_column_names(alert_columns)} FROM alert_states WHERE tank_id = {DEFAULT_TANK_ID}
+    """))
+    op.drop_table('alert_states')
+    op.rename_table('alert_states_old', 'alert_states')
+
+    if op.get_bind().dialect.name == 'postgresql':
+        for table in ('sensor_reading_rollups', 'alert_states'):
+            op.execute(sa.text(f"ALTER TABLE {table} RENAME CONSTRAINT {table}_old_pkey TO {table}_pkey"))
+
+    with op.batch_alter_table('notifications', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_notifications_tank_id_tanks', type_='foreignkey')
+        batch_op.drop_index('ix_notifications_tank_id_created_at_id')
+        batch_op.drop_column('tank_id')
+
+    with op.batch_alter_table('tank_subscriptions', schema=None) as batch_op:
+        batch_op.drop_index('ix_tank_subscriptions_tank_id')
+
+    op.drop_table('tank_subscriptions')
+    op.drop_table('tanks')
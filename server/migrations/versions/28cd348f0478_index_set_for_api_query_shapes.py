@@ -0,0 +1,48 @@
+"""index set for api query shapes
+
+Indexes for the API's hot queries. INCLUDE (covering) and WHERE (partial)
+clauses apply on PostgreSQL; SQLite gets the plain or partial equivalent.
+Run with CREATE INDEX CONCURRENTLY by hand on a busy production table.
+
+Revision ID: 28cd348f0478
+Revises: e1cdd511bd1f
+Create Date: 2026-10-18 15:47:31.121511
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '28cd348f0478'
+down_revision = 'e1cdd511bd1f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Ordering, date-range filters and keyset paging on /sensorreadings
+    op.create_index('ix_sensor_readings_timestamp_id', 'sensor_readings', ['timestamp', 'id'],
+                    postgresql_include=['temp', 'ph', 'tank_level_per'])
+    # Newest-first notification listings
+    op.create_index('ix_notifications_created_at_id', 'notifications', ['created_at', 'id'])
+    # Per-user overrides: lookups, outer joins and the unread count
+    op.create_index('uq_user_notifications_user_id_notification_id', 'user_notifications',
+                    ['user_id', 'notification_id'], unique=True,
+                    postgresql_include=['is_read', 'read_at'])
+    # Notification-side joins and cascading deletes
+    op.create_index('ix_user_notifications_notification_id', 'user_notifications', ['notification_id'])
+    # Outbox claiming and lease lookups
+    op.create_index('ix_email_outbox_status_next_attempt_at', 'email_outbox', ['status', 'next_attempt_at'])
+    op.create_index('ix_email_outbox_claim_token', 'email_outbox', ['claim_token'],
+                    postgresql_where=sa.text('claim_token IS NOT NULL'),
+                    sqlite_where=sa.text('claim_token IS NOT NULL'))
+
+
+def downgrade():
+    op.drop_index('ix_email_outbox_claim_token', table_name='email_outbox')
+    op.drop_index('ix_email_outbox_status_next_attempt_at', table_name='email_outbox')
+    op.drop_index('ix_user_notifications_notification_id', table_name='user_notifications')
+    op.drop_index('uq_user_notifications_user_id_notification_id', table_name='user_notifications')
+    op.drop_index('ix_notifications_created_at_id', table_name='notifications')
+    op.drop_index('ix_sensor_readings_timestamp_id', table_name='sensor_readings')
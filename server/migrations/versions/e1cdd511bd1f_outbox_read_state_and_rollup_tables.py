@@ -0,0 +1,83 @@
+"""outbox read state and rollup tables
+
+Adds email_outbox, notification_read_states and sensor_reading_rollups.
+Existing per-user user_notifications rows are folded into a read
+watermark per user; only individual reads are kept as overrides.
+Run `python rollups.py` afterwards to build rollups for existing readings.
+
+Revision ID: e1cdd511bd1f
+Revises: cc5626bc75c0
+Create Date: 2026-10-18 15:47:25.006544
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1cdd511bd1f'
+down_revision = 'cc5626bc75c0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('email_outbox',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('recipient', sa.String(length=100), nullable=False),
+    sa.Column('subject', sa.String(length=255), nullable=False),
+    sa.Column('body', sa.Text(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+    sa.Column('claim_token', sa.String(length=32), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.Column('sent_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('notification_read_states',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('read_through_id', sa.Integer(), nullable=False),
+    sa.Column('read_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_table('sensor_reading_rollups',
+    sa.Column('bucket', sa.String(length=3), nullable=False),
+    sa.Column('bucket_start', sa.DateTime(), nullable=False),
+    sa.Column('reading_count', sa.Integer(), nullable=False),
+    sa.Column('temp_sum', sa.Float(), nullable=False),
+    sa.Column('temp_min', sa.Float(), nullable=False),
+    sa.Column('temp_max', sa.Float(), nullable=False),
+    sa.Column('ph_sum', sa.Float(), nullable=False),
+    sa.Column('ph_min', sa.Float(), nullable=False),
+    sa.Column('ph_max', sa.Float(), nullable=False),
+    sa.Column('tank_level_per_sum', sa.Float(), nullable=False),
+    sa.Column('tank_level_per_min', sa.Float(), nullable=False),
+    sa.Column('tank_level_per_max', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('bucket', 'bucket_start')
+    )
+
+    # Everything before a user's oldest unread notification becomes read
+    # via the watermark; unread rows are then implied and can go.
+    op.execute(sa.text("""
+        INSERT INTO notification_read_states (user_id, read_through_id, read_at)
+        SELECT users.id,
+               COALESCE(
+                   (SELECT MIN(un.notification_id) - 1 FROM user_notifications un
+                    WHERE un.user_id = users.id AND un.is_read = false),
+                   (SELECT COALESCE(MAX(id), 0) FROM notifications)
+               ),
+               NULL
+        FROM users
+    """))
+    op.execute(sa.text("""
+        DELETE FROM user_notifications WHERE is_read = false
+    """))
+
+
+def downgrade():
+    op.drop_table('sensor_reading_rollups')
+    op.drop_table('notification_read_states')
+    op.drop_table('email_outbox')
@@ -0,0 +1,341 @@
+"""
+Versioned forecast models with hot reload.
+
+Layout of the registry directory:
+
+    versions/<version>/model.pkl       uncompressed joblib (memory-mappable)
+    versions/<version>/metadata.json   version, mae, mae_std, features, trained_at, ...
+    ACTIVE.json                        {"version", "pinned", "previous", "shadow"}
+
+Every change is a write-to-temp plus os.replace, so readers see either the
+old or the new state; changes to ACTIVE.json also hold an flock on .lock so
+concurrent admin calls or CLI runs cannot lose each other's updates. Each worker runs a ModelWatcher that notices a new
+ACTIVE.json and swaps the model in without a restart. A pinned version is
+not replaced when training registers a new one; rollback re-activates the
+previous version and pins it.
+
+    python model_registry.py list
+    python model_registry.py import tank_model.pkl --version 1.1 [--mae 2.4]
+    python model_registry.py activate <version> [--pin]
+    python model_registry.py rollback
+"""
+import fcntl
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import joblib
+
+from predictor import FEATURES, LoadedModel
+
+STATE_FILE = 'ACTIVE.json'
+LOCK_FILE = '.lock'
+MAX_PREVIOUS = 10
+# Versions become directory names, so nothing that could leave versions/
+VERSION_PATTERN = re.compile(r'[A-Za-z0-9][A-Za-z0-9._-]{0,63}')
+
+
+class RegistryError(ValueError):
+    pass
+
+
+def _write_json(path, payload):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(payload, f, indent=2)
+    os.replace(tmp, path)
+
+
+class ModelRegistry:
+    def __init__(self, root, mmap_mode='r'):
+        self.root = root
+        self.mmap_mode = mmap_mode
+        self.versions_dir = os.path.join(root, 'versions')
+        self.state_path = os.path.join(root, STATE_FILE)
+
+    def versions(self):
+        """Metadata of every registered version, oldest first."""
+        if not os.path.isdir(self.versions_dir):
+            return []
+        found = [self.metadata(v) for v in os.listdir(self.versions_dir) if not v.startswith('.')]
+        return sorted(found, key=lambda m: (m.get('trained_at') or '', m['version']))
+
+    @staticmethod
+    def _check_name(version):
+        if not isinstance(version, str) or not VERSION_PATTERN.fullmatch(version):
+            raise RegistryError(f"Invalid model version: {version!r}")
+
+    def metadata(self, version):
+        self._check_name(version)
+        if not os.path.isdir(self.versions_dir) or version not in os.listdir(self.versions_dir):
+            raise RegistryError(f"Unknown model version: {version}")
+        path = os.path.join(self.versions_dir, version, 'metadata.json')
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise RegistryError(f"Unknown model version: {version}")
+
+    def state(self):
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'version': None, 'pinned': False, 'previous': [], 'shadow': None}
+
+    def state_mtime(self):
+        try:
+            return os.stat(self.state_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def load(self, version):
+        self.metadata(version)  # raises for unknown versions
+        path = os.path.join(self.versions_dir, version, 'model.pkl')
+        return LoadedModel(version, joblib.load(path, mmap_mode=self.mmap_mode), self.metadata(version))
+
+    def register(self, estimator, version=None, activate=True, **metadata):
+        """
+        Store a trained estimator as a new version. It becomes active unless
+        `activate` is False or the active version is pinned.
+        """
+        version = version or datetime.utcnow().strftime('%Y%m%d%H%M%S')
+        self._check_name(version)
+        target = os.path.join(self.versions_dir, version)
+        if os.path.exists(target):
+            raise RegistryError(f"Version {version} already exists")
+
+        os.makedirs(self.versions_dir, exist_ok=True)
+        staging = tempfile.mkdtemp(dir=self.versions_dir, prefix='.tmp-')
+        joblib.dump(estimator, os.path.join(staging, 'model.pkl'))  # uncompressed, so it can be mmapped
+        _write_json(os.path.join(staging, 'metadata.json'), {
+            'version': version,
+            'features': FEATURES,
+            'trained_at': datetime.utcnow().isoformat(),
+            **metadata
+        })
+        os.rename(staging, target)
+
+        if activate and not self.state().get('pinned'):
+            self.activate(version)
+        return version
+
+    def activate(self, version, pin=None):
+        self.metadata(version)
+        with self._locked():
+            state = self.state()
+            if state.get('version') and state['version'] != version:
+                state['previous'] = (state.get('previous', []) + [state['version']])[-MAX_PREVIOUS:]
+            state['version'] = version
+            if pin is not None:
+                state['pinned'] = pin
+            _write_json(self.state_path, state)
+        return state
+
+    def rollback(self):
+        """Re-activate the previously active version and pin it."""
+        with self._locked():
+            state = self.state()
+            previous = state.get('previous', [])
+            if not previous:
+                raise RegistryError("No previous version to roll back to")
+            state['version'] = previous.pop()
+            state['pinned'] = True
+            _write_json(self.state_path, state)
+        return state
+
+    def set_shadow(self, version):
+        if version is not None:
+            self.metadata(version)
+        with self._locked():
+            state = self.state()
+            state['shadow'] = version
+            _write_json(self.state_path, state)
+        return state
+
+    @contextmanager
+    def _locked(self):
+        """Hold the registry lock across a read-modify-write of ACTIVE.json."""
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, LOCK_FILE), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+class ShadowScorer:
+    """
+    Scores a candidate model on the same fresh forecasts as the live one,
+    off the request thread, and grades both against the next real reading
+    of the same tank about an hour later. Counters are per worker.
+    """
+
+    def __init__(self, predictor, max_pending=1000):
+        self.predictor = predictor
+        self.candidate = None
+        self.max_pending = max_pending
+        self._pending = {}  # tank_id -> deque of (due, live_next, shadow_next), oldest first
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='shadow')
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def set_candidate(self, loaded):
+        with self._lock:
+            self.candidate = loaded
+            self._pending.clear()
+            self._stats = {}
+
+    def _stat(self, role):
+        return self._stats.setdefault(role, {
+            'version': None, 'forecasts': 0, 'latency_total': 0.0, 'graded': 0, 'abs_error_total': 0.0
+        })
+
+    def observe(self, features, forecast, seconds, tank_id=None):
+        """Predictor observer hook, called after each uncached live forecast."""
+        candidate = self.candidate
+        if candidate is None:
+            return
+        live_version = self.predictor.model_version
+        self._executor.submit(self._score, candidate, live_version, dict(features), float(forecast[0]), seconds, tank_id)
+
+    def _score(self, candidate, live_version, features, live_next, live_seconds, tank_id=None):
+        started = time.perf_counter()
+        shadow_next = float(self.predictor.forecast_features(features, candidate.estimator)[0])
+        shadow_seconds = time.perf_counter() - started
+
+        due = datetime.utcnow() + timedelta(hours=1)
+        with self._lock:
+            if self.candidate is not candidate:
+                return
+            for role, version, seconds in (('live', live_version, live_seconds),
+                                           ('shadow', candidate.version, shadow_seconds)):
+                stat = self._stat(role)
+                stat['version'] = version
+                stat['forecasts'] += 1
+                stat['latency_total'] += seconds
+            pending = self._pending.get(tank_id)
+            if pending is None:
+                pending = self._pending[tank_id] = deque(maxlen=self.max_pending)
+            pending.append((due, live_next, shadow_next))
+
+    def on_event(self, event):
+        """Grade forecasts whose +1h target a new reading has reached."""
+        if event.get('type') != 'reading':
+            return
+        reading = event['data']
+        observed_at = datetime.fromisoformat(reading['timestamp'])
+        actual = reading['tank_level_per']
+        with self._lock:
+            pending = self._pending.get(reading.get('tank_id'), ())
+            while pending and pending[0][0] <= observed_at:
+                due, live_next, shadow_next = pending.popleft()
+                if observed_at - due > timedelta(hours=1):
+                    continue  # no reading near the target time; don't grade against a stale one
+                for role, predicted in (('live', live_next), ('shadow', shadow_next)):
+                    stat = self._stat(role)
+                    stat['graded'] += 1
+                    stat['abs_error_total'] += abs(predicted - actual)
+
+    def stats(self):
+        with self._lock:
+            report = {'candidate': self.candidate.version if self.candidate else None, 'pending': sum(map(len, self._pending.values()))}
+            for role, stat in self._stats.items():
+                report[role] = {
+                    'version': stat['version'],
+                    'forecasts': stat['forecasts'],
+                    'mean_latency_ms': round(stat['latency_total'] / stat['forecasts'] * 1000, 3) if stat['forecasts'] else None,
+                    'graded': stat['graded'],
+                    'mae': round(stat['abs_error_total'] / stat['graded'], 3) if stat['graded'] else None
+                }
+            return report
+
+
+class ModelWatcher:
+    """Polls ACTIVE.json and hot-swaps the live and shadow models in this worker."""
+
+    def __init__(self, registry, predictor, shadow=None, interval=10):
+        self.registry = registry
+        self.predictor = predictor
+        self.shadow = shadow
+        self.interval = interval
+        self._seen_mtime = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def check(self):
+        """Apply the registry's current state if it changed since the last check."""
+        with self._lock:
+            mtime = self.registry.state_mtime()
+            if mtime is None or mtime == self._seen_mtime:
+                return False
+            state = self.registry.state()
+            try:
+                if state.get('version') and state['version'] != self.predictor.model_version:
+                    # Load fully before swapping: requests keep the old model until then
+                    self.predictor.swap_model(self.registry.load(state['version']))
+                    print(f"[models] Now serving version {state['version']}")
+                if self.shadow is not None:
+                    current = self.shadow.candidate.version if self.shadow.candidate else None
+                    if state.get('shadow') != current:
+                        self.shadow.set_candidate(self.registry.load(state['shadow']) if state.get('shadow') else None)
+            except (RegistryError, OSError) as e:
+                print(f"[models] Could not apply registry state {state}: {e!r}")
+                return False
+            self._seen_mtime = mtime
+            return True
+
+    def ensure_running(self):
+        # Started on first use rather than at import so it lives in the forked worker
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name='model-watcher', daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.check()
+            except Exception as e:
+                print(f"[models] Watcher error: {e!r}")
+            time.sleep(self.interval)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Manage the forecast model registry")
+    parser.add_argument('--root', default=os.getenv('MODEL_REGISTRY_DIR', 'model_registry'))
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list')
+    imported = commands.add_parser('import')
+    imported.add_argument('path')
+    imported.add_argument('--version')
+    imported.add_argument('--mae', type=float)
+    activated = commands.add_parser('activate')
+    activated.add_argument('version')
+    activated.add_argument('--pin', action='store_true')
+    commands.add_parser('rollback')
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.root)
+    if args.command == 'import':
+        version = registry.register(joblib.load(args.path), version=args.version, mae=args.mae, source=args.path)
+        print(f"Registered {version}")
+    elif args.command == 'activate':
+        print(registry.activate(args.version, pin=args.pin or None))
+    elif args.command == 'rollback':
+        print(registry.rollback())
+    state = registry.state()
+    for meta in registry.versions():
+        marker = '*' if meta['version'] == state.get('version') else ' '
+        print(f"{marker} {meta['version']}  mae={meta.get('mae')}  trained_at={meta.get('trained_at')}")
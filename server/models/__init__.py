@@ -1,4 +1,12 @@
 from .users import User
+from .tanks import Tank, TankSubscription, DEFAULT_TANK_ID
 from .sensors import SensorReading
+from .sensor_rollups import SensorReadingRollup
 from .notifications import Notification
-from .user_notifications import UserNotification
\ No newline at end of file
+from .user_notifications import UserNotification
+from .notification_read_states import NotificationReadState
+from .email_outbox import EmailOutbox
+from .revoked_tokens import RevokedToken
+from .notification_counters import NotificationCounter
+from .alert_states import AlertState
+from .alert_rules import AlertRule
@@ -0,0 +1,38 @@
+from sqlalchemy_serializer import SerializerMixin
+from sqlalchemy import DDL, event
+from sqlalchemy.sql import func
+from database import db
+
+class AlertRule(db.Model, SerializerMixin):
+    __tablename__ = 'alert_rules'
+
+    # Each worker compiles the enabled rows into array operations once
+    # (see alert_engine.RuleSet) and applies them to every ingest batch.
+    # A rule's condition names its alert_states rows and notification_type.
+    id = db.Column(db.Integer, primary_key=True)
+    condition = db.Column(db.String(50), unique=True, nullable=False)
+    metric = db.Column(db.String(20), nullable=False)  # temp, ph, tank_level_per
+    kind = db.Column(db.String(20), nullable=False)  # threshold, rate_of_change (per hour), zscore
+    direction = db.Column(db.String(10), default='above', nullable=False)  # above, below, both
+    warning = db.Column(db.Float, nullable=True)  # in-app alert past this value
+    critical = db.Column(db.Float, nullable=True)  # in-app alert and email past this value
+    clear_at = db.Column(db.Float, nullable=False)  # an active alert clears once back to this value
+    window_size = db.Column(db.Integer, default=1, nullable=False)  # readings of history: rate lookback, z-score baseline
+    noise_floor = db.Column(db.Float, default=0.0, nullable=False)  # smallest standard deviation a z-score divides by
+    enabled = db.Column(db.Boolean, default=True, nullable=False)
+    updated_at = db.Column(db.DateTime, server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<AlertRule condition={self.condition}, kind={self.kind}, metric={self.metric}, enabled={self.enabled}>"
+
+
+# The rules a new database starts with; the migration inserts the same rows
+DEFAULT_RULES = """
+INSERT INTO alert_rules (condition, metric, kind, direction, warning, critical, clear_at, window_size, noise_floor, enabled) VALUES
+    ('tank_level_high', 'tank_level_per', 'threshold', 'above', 80, 90, 75, 1, 0, TRUE),
+    ('ph_anomaly', 'ph', 'zscore', 'both', 4, 6, 2, 24, 0.1, TRUE),
+    ('temp_anomaly', 'temp', 'zscore', 'both', 4, 6, 2, 24, 0.5, TRUE),
+    ('tank_level_surge', 'tank_level_per', 'rate_of_change', 'above', 15, 30, 5, 1, 0, FALSE)
+"""
+
+event.listen(AlertRule.__table__, 'after_create', DDL(DEFAULT_RULES))
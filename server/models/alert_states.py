@@ -0,0 +1,26 @@
+from sqlalchemy_serializer import SerializerMixin
+from database import db
+
+class AlertState(db.Model, SerializerMixin):
+    __tablename__ = 'alert_states'
+
+    # One row per tank and alert condition, updated in place as readings
+    # arrive, so deciding what a reading means is a primary-key lookup
+    # rather than a scan of past notifications (see alert_engine.py).
+    tank_id = db.Column(db.Integer, db.ForeignKey('tanks.id'), primary_key=True)
+    condition = db.Column(db.String(50), primary_key=True)
+    status = db.Column(db.String(20), default='cleared', nullable=False)  # raised, ongoing, cleared
+    severity = db.Column(db.String(20), nullable=True)  # highest stage reached in the current episode
+    value = db.Column(db.Float, nullable=True)  # latest evaluated reading
+    peak_value = db.Column(db.Float, nullable=True)
+    reading_count = db.Column(db.Integer, default=0, nullable=False)  # readings in the current episode
+    raised_at = db.Column(db.DateTime, nullable=True)
+    cleared_at = db.Column(db.DateTime, nullable=True)
+    last_seen_at = db.Column(db.DateTime, nullable=True)
+    # Last notification sent for this condition, for cooldowns and reminders
+    notified_at = db.Column(db.DateTime, nullable=True)
+    notified_severity = db.Column(db.String(20), nullable=True)
+    notification_id = db.Column(db.Integer, db.ForeignKey('notifications.id', ondelete='SET NULL'), nullable=True)
+
+    def __repr__(self):
+        return f"<AlertState tank_id={self.tank_id}, condition={self.condition}, status={self.status}, severity={self.severity}>"
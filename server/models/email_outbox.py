@@ -0,0 +1,43 @@
+from datetime import datetime
+from sqlalchemy_serializer import SerializerMixin
+from sqlalchemy.sql import func
+from database import db
+
+# Rows a worker may claim. Queries use this exact text so the planner can
+# match it against the partial index below (bound values would not match).
+CLAIMABLE = "email_outbox.status IN ('pending', 'sending')"
+
+class EmailOutbox(db.Model, SerializerMixin):
+    __tablename__ = 'email_outbox'
+
+    id = db.Column(db.Integer, primary_key=True)
+    recipient = db.Column(db.String(100), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), default='pending', nullable=False)  # pending, sending, sent, failed
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    # When the row may next be picked up; doubles as the lease expiry while 'sending'
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    claim_token = db.Column(db.String(32), nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, server_default=func.now(), nullable=False)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        # Claiming due work oldest-first: only claimable rows, already in
+        # (next_attempt_at, id) order, so the claim neither scans sent rows nor sorts
+        db.Index(
+            'ix_email_outbox_due', 'next_attempt_at', 'id',
+            postgresql_where=db.text("status IN ('pending', 'sending')"),
+            sqlite_where=db.text("status IN ('pending', 'sending')")
+        ),
+        # Only leased rows carry a token, so keep the index to those
+        db.Index(
+            'ix_email_outbox_claim_token', 'claim_token',
+            postgresql_where=db.text('claim_token IS NOT NULL'),
+            sqlite_where=db.text('claim_token IS NOT NULL')
+        ),
+    )
+
+    def __repr__(self):
+        return f"<EmailOutbox id={self.id}, recipient={self.recipient}, status={self.status}, attempts={self.attempts}>"
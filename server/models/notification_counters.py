@@ -0,0 +1,14 @@
+from sqlalchemy_serializer import SerializerMixin
+from database import db
+
+class NotificationCounter(db.Model, SerializerMixin):
+    __tablename__ = 'notification_counters'
+
+    # Single row (id=1) bumped in the same transaction as each new broadcast
+    # notification, so unread badges never have to count the notifications table.
+    id = db.Column(db.Integer, primary_key=True)
+    total = db.Column(db.Integer, default=0, nullable=False)
+    last_id = db.Column(db.Integer, default=0, nullable=False)
+
+    def __repr__(self):
+        return f"<NotificationCounter total={self.total}, last_id={self.last_id}>"
@@ -0,0 +1,21 @@
+from sqlalchemy_serializer import SerializerMixin
+from database import db
+
+class NotificationReadState(db.Model, SerializerMixin):
+    __tablename__ = 'notification_read_states'
+
+    # One row per user: every broadcast notification with id <= read_through_id
+    # is read; UserNotification rows override individual notifications.
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    read_through_id = db.Column(db.Integer, default=0, nullable=False)
+    read_at = db.Column(db.DateTime, nullable=True)  # when the watermark last moved
+    # Broadcasts up to this id were sent before the user registered and are not listed
+    visible_after_id = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    # Notifications this user has read (watermark plus individual reads above it);
+    # unread = NotificationCounter.total - read_count
+    read_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+
+    user = db.relationship('User', back_populates='read_state')
+
+    def __repr__(self):
+        return f"<NotificationReadState user_id={self.user_id}, read_through_id={self.read_through_id}>"
@@ -8,9 +8,15 @@ class Notification(db.Model, SerializerMixin):
     id = db.Column(db.Integer, primary_key=True)
     message = db.Column(db.String(255), nullable=False)
     severity = db.Column(db.String(20), nullable=False)  # info, warning, critical
-    notification_type = db.Column(db.String(50), nullable=False)  # ph_anomaly, temp_anomaly, tank_full
+    notification_type = db.Column(db.String(50), nullable=False)  # an alert rule condition (tank_level_high, ph_anomaly, temp_anomaly, ...)
+    tank_id = db.Column(db.Integer, db.ForeignKey('tanks.id'), nullable=True)  # None for fleet-wide notices
     created_at = db.Column(db.DateTime, server_default=func.now(), nullable=False)
 
+    __table_args__ = (
+        db.Index('ix_notifications_created_at_id', 'created_at', 'id'),
+        db.Index('ix_notifications_tank_id_created_at_id', 'tank_id', 'created_at', 'id'),
+    )
+
     # Relationship to UserNotification
     user_notifications = db.relationship('UserNotification', back_populates='notification', cascade='all, delete-orphan')
 
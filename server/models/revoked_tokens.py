@@ -0,0 +1,14 @@
+from sqlalchemy_serializer import SerializerMixin
+from sqlalchemy.sql import func
+from database import db
+
+class RevokedToken(db.Model, SerializerMixin):
+    __tablename__ = 'revoked_tokens'
+
+    jti = db.Column(db.String(64), primary_key=True)
+    # The token's own exp; once it passes the row is useless and gets purged
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    revoked_at = db.Column(db.DateTime, server_default=func.now(), nullable=False)
+
+    def __repr__(self):
+        return f"<RevokedToken jti={self.jti}, expires_at={self.expires_at}>"
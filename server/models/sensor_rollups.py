@@ -0,0 +1,27 @@
+from sqlalchemy_serializer import SerializerMixin
+from database import db
+
+class SensorReadingRollup(db.Model, SerializerMixin):
+    __tablename__ = 'sensor_reading_rollups'
+
+    tank_id = db.Column(db.Integer, db.ForeignKey('tanks.id'), primary_key=True)
+    bucket = db.Column(db.String(3), primary_key=True)  # 5m, 1h, 1d
+    bucket_start = db.Column(db.DateTime, primary_key=True)
+    reading_count = db.Column(db.Integer, nullable=False)
+    temp_sum = db.Column(db.Float, nullable=False)
+    temp_min = db.Column(db.Float, nullable=False)
+    temp_max = db.Column(db.Float, nullable=False)
+    ph_sum = db.Column(db.Float, nullable=False)
+    ph_min = db.Column(db.Float, nullable=False)
+    ph_max = db.Column(db.Float, nullable=False)
+    tank_level_per_sum = db.Column(db.Float, nullable=False)
+    tank_level_per_min = db.Column(db.Float, nullable=False)
+    tank_level_per_max = db.Column(db.Float, nullable=False)
+
+    __table_args__ = (
+        # Fleet-wide charts combine every tank's rows for a bucket range
+        db.Index('ix_sensor_reading_rollups_bucket_bucket_start', 'bucket', 'bucket_start'),
+    )
+
+    def __repr__(self):
+        return f"<SensorReadingRollup tank_id={self.tank_id}, bucket={self.bucket}, start={self.bucket_start}, count={self.reading_count}>"
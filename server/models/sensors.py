@@ -1,15 +1,38 @@
 from sqlalchemy_serializer import SerializerMixin
 from sqlalchemy.sql import func
 from database import db
+from .tanks import DEFAULT_TANK_ID
 
 class SensorReading(db.Model, SerializerMixin):
     __tablename__ = 'sensor_readings'
 
     id = db.Column(db.Integer, primary_key=True)
+    tank_id = db.Column(db.Integer, db.ForeignKey('tanks.id'), default=DEFAULT_TANK_ID, nullable=False)
     timestamp = db.Column(db.DateTime, server_default=func.now(), nullable=False)
     temp = db.Column(db.Float, nullable=False)
     ph = db.Column(db.Float, nullable=False)
     tank_level_per = db.Column(db.Float, nullable=False)  # Percentage (0-100)
 
+    __table_args__ = (
+        # Newest-first listing, date-range filters and keyset paging all walk
+        # (timestamp, id); INCLUDE lets PostgreSQL serve pages index-only
+        db.Index(
+            'ix_sensor_readings_timestamp_id', 'timestamp', 'id',
+            postgresql_include=['temp', 'ph', 'tank_level_per']
+        ),
+        # Per-tank listings, filters and the predictor's window seek on
+        # (tank_id, timestamp, id) within the time partitions they touch
+        db.Index(
+            'ix_sensor_readings_tank_id_timestamp_id', 'tank_id', 'timestamp', 'id',
+            postgresql_include=['temp', 'ph', 'tank_level_per']
+        ),
+    )
+    # On PostgreSQL the migration turns this table into one partitioned by
+    # RANGE (timestamp), one partition per month, with PRIMARY KEY (id, timestamp);
+    # see partitions.py for creating upcoming months
+
+    # Fetch the server-side timestamp with RETURNING at flush so rollups can use it
+    __mapper_args__ = {'eager_defaults': True}
+
     def __repr__(self):
-        return f"<SensorReading id={self.id}, timestamp={self.timestamp}, temp={self.temp}, ph={self.ph}>"
\ No newline at end of file
+        return f"<SensorReading id={self.id}, tank_id={self.tank_id}, timestamp={self.timestamp}, temp={self.temp}, ph={self.ph}>"
\ No newline at end of file
@@ -0,0 +1,51 @@
+from sqlalchemy_serializer import SerializerMixin
+from sqlalchemy import DDL, event
+from sqlalchemy.sql import func
+from database import db
+
+# Readings and alerts that name no tank belong to the tank every database
+# starts with, so single-tank sensors and clients keep working unchanged
+DEFAULT_TANK_ID = 1
+
+class Tank(db.Model, SerializerMixin):
+    __tablename__ = 'tanks'
+
+    serialize_rules = ('-subscriptions',)
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    location = db.Column(db.String(255), nullable=True)
+    owner_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='SET NULL'), nullable=True)
+    created_at = db.Column(db.DateTime, server_default=func.now())
+
+    subscriptions = db.relationship('TankSubscription', back_populates='tank', cascade='all, delete-orphan')
+
+    def __repr__(self):
+        return f"<Tank id={self.id}, name={self.name}>"
+
+class TankSubscription(db.Model, SerializerMixin):
+    __tablename__ = 'tank_subscriptions'
+
+    # A user with no subscriptions follows every tank; subscribing narrows
+    # their alert emails to the tanks they subscribed to
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    tank_id = db.Column(db.Integer, db.ForeignKey('tanks.id', ondelete='CASCADE'), primary_key=True)
+    created_at = db.Column(db.DateTime, server_default=func.now())
+
+    __table_args__ = (
+        # Alert fan-out looks up a tank's subscribers
+        db.Index('ix_tank_subscriptions_tank_id', 'tank_id'),
+    )
+
+    user = db.relationship('User', back_populates='tank_subscriptions')
+    tank = db.relationship('Tank', back_populates='subscriptions')
+
+    def __repr__(self):
+        return f"<TankSubscription user_id={self.user_id}, tank_id={self.tank_id}>"
+
+
+# create_all() (tests, fresh databases) gets the default tank the migration creates
+event.listen(
+    Tank.__table__, 'after_create',
+    DDL("INSERT INTO tanks (name) VALUES ('Main tank')")
+)
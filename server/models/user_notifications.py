@@ -5,12 +5,26 @@ from database import db
 class UserNotification(db.Model, SerializerMixin):
     __tablename__ = 'user_notifications'
 
+    # Sparse per-user override of a broadcast notification's read state;
+    # most read state lives in NotificationReadState's watermark instead.
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     notification_id = db.Column(db.Integer, db.ForeignKey('notifications.id'), nullable=False)
     is_read = db.Column(db.Boolean, default=False, nullable=False)
     read_at = db.Column(db.DateTime, nullable=True)
 
+    __table_args__ = (
+        # Override lookups, the per-user outer join and the unread count all
+        # seek on (user_id, notification_id); INCLUDE avoids heap visits on PostgreSQL
+        db.Index(
+            'uq_user_notifications_user_id_notification_id', 'user_id', 'notification_id',
+            unique=True,
+            postgresql_include=['is_read', 'read_at']
+        ),
+        db.Index('ix_user_notifications_notification_id', 'notification_id'),
+    )
+
     # Relationships
     user = db.relationship('User', back_populates='notifications')
     notification = db.relationship('Notification', back_populates='user_notifications')
@@ -1,4 +1,5 @@
 from sqlalchemy_serializer import SerializerMixin
+from sqlalchemy import DDL, event
 from sqlalchemy.sql import func
 from database import db
 from werkzeug.security import generate_password_hash, check_password_hash
@@ -12,10 +13,24 @@ class User(db.Model, SerializerMixin):
      password_hash = db.Column(db.Text, nullable=False)
      role = db.Column(db.String(20), default='Normal')
      receive_email_alerts = db.Column(db.Boolean, default=True)
-     created_at = db.Column(db.DateTime, server_default=func.now())
+     created_at = db.Column(db.DateTime, server_default=func.now(), nullable=False)  # keyset sort key; never NULL
+
+     __table_args__ = (
+         # Keyset orders for the admin listing (email is already unique-indexed)
+         db.Index('ix_users_full_name_id', 'full_name', 'id'),
+         db.Index('ix_users_created_at_id', 'created_at', 'id'),
+         # Trigram indexes serve ILIKE '%term%' and 'term%' searches on PostgreSQL
+         # (pg_trgm); elsewhere they are plain indexes
+         db.Index('ix_users_full_name_trgm', 'full_name',
+                  postgresql_using='gin', postgresql_ops={'full_name': 'gin_trgm_ops'}),
+         db.Index('ix_users_email_trgm', 'email',
+                  postgresql_using='gin', postgresql_ops={'email': 'gin_trgm_ops'}),
+     )
 
      # Relationship to UserNotification
      notifications = db.relationship('UserNotification', back_populates='user', cascade='all, delete-orphan')
+     read_state = db.relationship('NotificationReadState', back_populates='user', uselist=False, cascade='all, delete-orphan')
+     tank_subscriptions = db.relationship('TankSubscription', back_populates='user', cascade='all, delete-orphan')
 
     # Password hashing
      def set_password(self, password):
@@ -26,3 +41,10 @@ class User(db.Model, SerializerMixin):
 
      def __repr__(self):
        return f"<User {self.full_name}, Role: {self.role}>"
+
+
+# create_all() (tests, fresh databases) needs the extension before the trigram indexes
+event.listen(
+    User.__table__, 'before_create',
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect='postgresql')
+)
@@ -0,0 +1,270 @@
+"""
+Fan-out-on-read notification state.
+
+Broadcast notifications are stored once. Each user's read state is a
+watermark (NotificationReadState.read_through_id) plus sparse
+UserNotification overrides for notifications read individually.
+
+Listings start after the user's visible_after_id, so a new account does
+not inherit every earlier broadcast. Functions that write leave the commit
+to the caller, except the reconcile job.
+
+Unread badges are O(1): a single NotificationCounter row holds the total
+number of notifications and each read state keeps a running read_count,
+both updated in the transactions that change them. Run
+`python notification_state.py` periodically to repair any drift.
+"""
+from datetime import datetime
+
+from sqlalchemy import and_, case, func, literal, or_, select, tuple_, update
+
+from database import db, upsert
+from models import Notification, NotificationCounter, NotificationReadState, User, UserNotification
+
+COUNTER_ID = 1
+
+
+def read_status_columns(read_through_id, watermark_read_at):
+    """
+    (is_read, read_at) SQL expressions for a Notification outer-joined to a
+    user's override row. The watermark arguments may be literals or columns.
+    """
+    read_individually = UserNotification.is_read.is_(True)
+    below_watermark = Notification.id <= read_through_id
+    is_read = or_(below_watermark, read_individually)
+    read_at = case(
+        (read_individually, UserNotification.read_at),
+        (below_watermark, watermark_read_at),
+        else_=None
+    )
+    return is_read, read_at
+
+
+def get_watermark(user_id):
+    state = db.session.get(NotificationReadState, user_id)
+    if state is None:
+        return 0, None
+    return state.read_through_id, state.read_at
+
+
+def user_notifications_query(user_id, limit=None, tank_id=None, before=None):
+    """
+    Rows of (id, message, severity, notification_type, tank_id, created_at,
+    is_read, read_at) the user can see, newest first, optionally only those
+    about one tank and only those after the (created_at, id) key `before`.
+    """
+    state = db.session.get(NotificationReadState, user_id)
+    read_through_id, watermark_read_at = (state.read_through_id, state.read_at) if state else (0, None)
+    is_read, read_at = read_status_columns(literal(read_through_id), literal(watermark_read_at))
+
+    query = (
+        select(
+            Notification.id,
+            Notification.message,
+            Notification.severity,
+            Notification.notification_type,
+            Notification.tank_id,
+            Notification.created_at,
+            is_read.label('is_read'),
+            read_at.label('read_at')
+        )
+        .outerjoin(
+            UserNotification,
+            and_(
+                UserNotification.notification_id == Notification.id,
+                UserNotification.user_id == user_id
+            )
+        )
+        .where(Notification.id > (state.visible_after_id if state else 0))
+        .order_by(Notification.created_at.desc(), Notification.id.desc())
+    )
+    if before is not None:
+        query = query.where(tuple_(Notification.created_at, Notification.id) < tuple_(*before))
+    if tank_id is not None:
+        query = query.where(Notification.tank_id == tank_id)
+    if limit is not None:
+        query = query.limit(limit)
+    return db.session.execute(query).all()
+
+
+def _greatest(*args):
+    # SQLite spells GREATEST as the multi-argument max()
+    sqlite = db.session.get_bind().dialect.name == 'sqlite'
+    return (func.max if sqlite else func.greatest)(*args)
+
+
+def get_totals():
+    """(total, last_id) of all broadcast notifications, from the counter row."""
+    row = db.session.execute(
+        select(NotificationCounter.total, NotificationCounter.last_id)
+        .where(NotificationCounter.id == COUNTER_ID)
+    ).first()
+    return tuple(row) if row else (0, 0)
+
+
+def record_notifications(count, last_id):
+    """Count newly inserted notifications, in the caller's transaction (caller commits)."""
+    db.session.execute(
+        upsert(
+            NotificationCounter,
+            {"id": COUNTER_ID, "total": count, "last_id": last_id},
+            index_elements=['id'],
+            set_=lambda excluded: {
+                "total": NotificationCounter.total + excluded.total,
+                "last_id": _greatest(NotificationCounter.last_id, excluded.last_id)
+            }
+        )
+    )
+
+
+def unread_count(user_id):
+    """Two primary-key lookups in one statement, however long the history."""
+    read_count = (
+        select(NotificationReadState.read_count)
+        .where(NotificationReadState.user_id == user_id)
+        .scalar_subquery()
+    )
+    unread = db.session.scalar(
+        select(NotificationCounter.total - func.coalesce(read_count, 0))
+        .where(NotificationCounter.id == COUNTER_ID)
+    )
+    return max(unread or 0, 0)
+
+
+def read_totals():
+    """
+    (total, read) over every (user, notification) pair, from the counter row
+    and the per-user read counts rather than the pairs themselves.
+    """
+    notifications, _ = get_totals()
+    users, read = db.session.execute(
+        select(
+            select(func.count(User.id)).scalar_subquery(),
+            select(func.coalesce(func.sum(NotificationReadState.read_count), 0)).scalar_subquery()
+        )
+    ).one()
+    total = notifications * users
+    return total, min(read, total)
+
+
+def mark_read(user_id, notification_id):
+    """
+    Mark one notification read for a user, in the caller's transaction
+    (caller commits). Returns (is_read, read_at), or None if the
+    notification does not exist.
+    """
+    if db.session.get(Notification, notification_id) is None:
+        return None
+
+    override = UserNotification.query.filter_by(
+        user_id=user_id,
+        notification_id=notification_id
+    ).first()
+    read_through_id, watermark_read_at = get_watermark(user_id)
+
+    if override is None:
+        if notification_id <= read_through_id:
+            return True, watermark_read_at
+        override = UserNotification(user_id=user_id, notification_id=notification_id)
+        db.session.add(override)
+
+    if not override.is_read:
+        override.is_read = True
+        override.read_at = datetime.utcnow()
+        if notification_id > read_through_id:
+            db.session.execute(
+                upsert(
+                    NotificationReadState,
+                    {"user_id": user_id, "read_through_id": read_through_id, "read_count": 1},
+                    index_elements=['user_id'],
+                    set_=lambda excluded: {"read_count": NotificationReadState.read_count + 1}
+                )
+            )
+
+    return override.is_read, override.read_at
+
+
+def mark_all_read(user_id):
+    """
+    Move the user's watermark to the newest notification: a single-row
+    upsert in the caller's transaction (caller commits).
+    """
+    total, read_through_id = get_totals()
+    db.session.execute(
+        upsert(
+            NotificationReadState,
+            {
+                "user_id": user_id,
+                "read_through_id": read_through_id,
+                "read_at": datetime.utcnow(),
+                "read_count": total
+            },
+            index_elements=['user_id'],
+            set_=lambda excluded: {
+                "read_through_id": excluded.read_through_id,
+                "read_at": excluded.read_at,
+                "read_count": excluded.read_count
+            }
+        )
+    )
+    return read_through_id
+
+
+def start_read_state(user_id):
+    """New users begin caught up and are only shown broadcasts sent after they register."""
+    total, read_through_id = get_totals()
+    db.session.add(NotificationReadState(
+        user_id=user_id,
+        read_through_id=read_through_id,
+        visible_after_id=read_through_id,
+        read_count=total
+    ))
+
+
+def reconcile_read_counts():
+    """
+    Recompute the counter row and every user's read_count from the source
+    tables, fixing only rows that drifted. Returns how many read states changed.
+    """
+    total, last_id = db.session.execute(
+        select(func.count(Notification.id), func.coalesce(func.max(Notification.id), 0))
+    ).one()
+    db.session.execute(
+        upsert(
+            NotificationCounter,
+            {"id": COUNTER_ID, "total": total, "last_id": last_id},
+            index_elements=['id'],
+            set_=lambda excluded: {"total": excluded.total, "last_id": excluded.last_id}
+        )
+    )
+
+    below_watermark = (
+        select(func.count(Notification.id))
+        .where(Notification.id <= NotificationReadState.read_through_id)
+        .scalar_subquery()
+    )
+    read_above = (
+        select(func.count(UserNotification.id))
+        .where(
+            UserNotification.user_id == NotificationReadState.user_id,
+            UserNotification.notification_id > NotificationReadState.read_through_id,
+            UserNotification.is_read.is_(True)
+        )
+        .scalar_subquery()
+    )
+    expected = below_watermark + read_above
+    repaired = db.session.execute(
+        update(NotificationReadState)
+        .where(NotificationReadState.read_count != expected)
+        .values(read_count=expected)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return repaired
+
+
+if __name__ == '__main__':
+    from app import app
+
+    with app.app_context():
+        print(f"Repaired unread counts for {reconcile_read_counts()} users.")
@@ -0,0 +1,71 @@
+"""
+Keyset (cursor) pagination helpers.
+
+Cursors are opaque to clients: URL-safe base64 of a small JSON object
+holding the sort key of the boundary row and the paging direction.
+"""
+import base64
+import json
+from datetime import datetime
+
+from flask import request, url_for
+from sqlalchemy import func, select, text
+
+from database import db
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values, direction='next'):
+    payload = {
+        'k': [v.isoformat() if isinstance(v, datetime) else v for v in values],
+        'd': direction
+    }
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, types):
+    """Return (values, direction); `types` converts each key component back."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        values = payload['k']
+        direction = payload['d']
+        if direction not in ('next', 'prev') or len(values) != len(types):
+            raise ValueError
+        return [
+            datetime.fromisoformat(v) if t is datetime else t(v)
+            for v, t in zip(values, types)
+        ], direction
+    except (ValueError, TypeError, KeyError, json.JSONDecodeError) as e:
+        raise InvalidCursor("Invalid cursor") from e
+
+
+def page_link(cursor):
+    """Same endpoint and query string as the current request, with a new cursor."""
+    if cursor is None:
+        return None
+    args = request.args.to_dict()
+    args['cursor'] = cursor
+    return url_for(request.endpoint, **(request.view_args or {}), **args)
+
+
+def count_rows(query, mode):
+    """
+    Total for a filtered SELECT: 'exact' runs COUNT(*); 'estimate' asks the
+    PostgreSQL planner (no scan) and falls back to exact elsewhere.
+    Anything else skips counting. Returns (count, is_estimate).
+    """
+    if mode == 'estimate' and db.session.get_bind().dialect.name == 'postgresql':
+        compiled = query.compile(db.session.get_bind(), compile_kwargs={'literal_binds': True})
+        plan = db.session.execute(text(f"EXPLAIN (FORMAT JSON) {compiled}")).scalar()
+        return int(plan[0]['Plan']['Plan Rows']), True
+    if mode in ('exact', 'estimate'):
+        total = db.session.scalar(
+            select(func.count()).select_from(query.order_by(None).subquery())
+        )
+        return total, False
+    return None, False
@@ -0,0 +1,127 @@
+"""
+Monthly time partitions of sensor_readings on PostgreSQL.
+
+The migration turns sensor_readings into a table partitioned by RANGE
+(timestamp), one partition per calendar month plus a DEFAULT partition for
+anything outside them. A query with a timestamp range only scans the
+months it covers, and the (tank_id, timestamp, id) index inside each of
+them serves per-tank queries. Old months can be detached or dropped
+whole instead of being deleted row by row.
+
+Upcoming months have to exist before their readings arrive, otherwise
+rows land in the DEFAULT partition. Run this daily (e.g. cron); it creates
+any missing partitions up to --months-ahead and moves rows that already
+landed in DEFAULT into their month:
+
+    python partitions.py [--months-ahead 3]
+
+On other databases it does nothing.
+"""
+import argparse
+from datetime import date, datetime
+
+from sqlalchemy import text
+
+from database import db
+
+PARENT = 'sensor_readings'
+DEFAULT_PARTITION = 'sensor_readings_default'
+
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f'{PARENT}_{month:%Y_%m}'
+
+
+def is_partitioned():
+    """Whether sensor_readings is a partitioned table on the bound database."""
+    if db.session.get_bind().dialect.name != 'postgresql':
+        return False
+    return bool(db.session.execute(text(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = CAST(:table AS regclass)"
+    ), {'table': PARENT}).scalar())
+
+
+def existing_partitions():
+    return set(db.session.scalars(text("""
+        SELECT child.relname FROM pg_inherits
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE pg_inherits.inhparent = CAST(:table AS regclass)
+    """), {'table': PARENT}))
+
+
+def create_partition(month):
+    """
+    Create the partition for `month`. Rows of that month already sitting in
+    the DEFAULT partition would make the CREATE fail, so they are moved out
+    first (DEFAULT detached, rows copied over, DEFAULT re-attached).
+    """
+    name, lower, upper = partition_name(month), month, add_months(month, 1)
+    bounds = {'lower': lower, 'upper': upper}
+    stranded = db.session.execute(text(
+        f"SELECT 1 FROM {DEFAULT_PARTITION} WHERE timestamp >= :lower AND timestamp < :upper LIMIT 1"
+    ), bounds).scalar()
+
+    if not stranded:
+        db.session.execute(text(
+            f"CREATE TABLE {name} PARTITION OF {PARENT} FOR VALUES FROM ('{lower}') TO ('{upper}')"
+        ))
+        return 0
+
+    db.session.execute(text(f"ALTER TABLE {PARENT} DETACH PARTITION {DEFAULT_PARTITION}"))
+    db.session.execute(text(
+        f"CREATE TABLE {name} PARTITION OF {PARENT} FOR VALUES FROM ('{lower}') TO ('{upper}')"
+    ))
+    moved = db.session.execute(text(f"""
+        WITH moved AS (
+            DELETE FROM {DEFAULT_PARTITION} WHERE timestamp >= :lower AND timestamp < :upper RETURNING *
+        )
+        INSERT INTO {PARENT} SELECT * FROM moved
+    """), bounds).rowcount
+    db.session.execute(text(f"ALTER TABLE {PARENT} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT"))
+    return moved
+
+
+def ensure_partitions(months_ahead=3, today=None):
+    """Create missing monthly partitions through `months_ahead` months from now; returns the new names."""
+    if not is_partitioned():
+        return []
+
+    existing = existing_partitions()
+    current = month_start(today or datetime.utcnow())
+    # Also cover months that only the DEFAULT partition has rows for
+    oldest = db.session.execute(text(f"SELECT min(timestamp) FROM {DEFAULT_PARTITION}")).scalar()
+    month = min(current, month_start(oldest)) if oldest else current
+
+    created = []
+    while month <= add_months(current, months_ahead):
+        if partition_name(month) not in existing:
+            moved = create_partition(month)
+            created.append(partition_name(month))
+            print(f"[partitions] Created {partition_name(month)}" + (f" ({moved} rows moved from default)" if moved else ""))
+        month = add_months(month, 1)
+    db.session.commit()
+    return created
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Create upcoming monthly partitions of sensor_readings")
+    parser.add_argument('--months-ahead', type=int, default=3)
+    args = parser.parse_args()
+
+    from app import app
+
+    with app.app_context():
+        if not is_partitioned():
+            print("sensor_readings is not partitioned on this database; nothing to do.")
+        else:
+            created = ensure_partitions(args.months_ahead)
+            print(f"Created {len(created)} partition(s).")
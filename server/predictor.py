@@ -1,55 +1,230 @@
 import joblib
+import numpy as np
 import pandas as pd
+import threading
+import time
+from collections import OrderedDict, namedtuple
 from datetime import datetime
 from flask_restful import Resource, reqparse
 from flask import jsonify, request
 
+from metrics import MODEL_INFERENCE_SECONDS
+
+FEATURES = ['hour', 'sensor_cm', 'prev_reading', 'day_of_week', '3h_avg', 'roc_1h']
+HOUR, SENSOR_CM, PREV_READING, DAY_OF_WEEK, AVG_3H, ROC_1H = range(len(FEATURES))
+
+# A model and its registry identity, swapped in as one reference
+LoadedModel = namedtuple('LoadedModel', 'version estimator metadata')
+
+class ForecastCache:
+    """
+    Bounded LRU of forecasts keyed on the quantized feature vector.
+    Every entry expires at the next hour boundary, when the hour feature
+    (and so every key computed before it) rolls over.
+    """
+
+    def __init__(self, max_entries=1024, quantum=0.01):
+        self.max_entries = max_entries
+        self.quantum = quantum
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, features):
+        """Integer hour/weekday plus every reading feature snapped to `quantum` cm."""
+        return tuple(
+            int(features[name]) if name in ('hour', 'day_of_week')
+            else round(round(features[name] / self.quantum) * self.quantum, 6)
+            for name in FEATURES
+        )
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        expires_at = (time.time() // 3600 + 1) * 3600
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'size': len(self._entries),
+                'max_entries': self.max_entries
+            }
+
 class TankPredictor:
-    def __init__(self):
+    def __init__(self, cache_size=1024, cache_quantum=0.01, feature_store=None,
+                 model_path="tank_model.pkl", mmap_mode=None, model_version="1.1", loaded=None):
         self.empty = 22.0
         self.max_range = 5.0  # 27cm - 22cm
         self.critical = 80
-        self.model = joblib.load("tank_model.pkl")
-        self.history = []
-        self.max_history = 6
+        # mmap_mode='r' maps the tree arrays straight from the (uncompressed)
+        # joblib file, so every worker shares them through the page cache
+        self.active = loaded or LoadedModel(model_version, joblib.load(model_path, mmap_mode=mmap_mode), {})
+        # Shared rolling window of recent readings (see feature_store.py)
+        self.feature_store = feature_store
+        self.cache = ForecastCache(cache_size, cache_quantum)
+        # Optional hook(features, forecast, seconds, tank_id) for shadow scoring of fresh forecasts
+        self.observer = None
+
+    @property
+    def model(self):
+        return self.active.estimator
+
+    @property
+    def model_version(self):
+        return self.active.version
+
+    def swap_model(self, loaded):
+        """Serve `loaded` from now on; in-flight forecasts finish on the model they started with."""
+        self.active = loaded
+        self.cache.clear()
 
     def calculate_level(self, reading):
         fill_ratio = (self.empty - reading) / -self.max_range
         return round(max(0, min(100, fill_ratio * 100)), 1)
 
-    def update_history(self, reading):
-        self.history = ([reading] + self.history)[:self.max_history]
+    def calculate_reading(self, level):
+        """Inverse of calculate_level: the sensor_cm a fill percentage corresponds to."""
+        return self.empty + level / 100 * self.max_range
 
-    def predict_critical(self, current_reading):
-        self.update_history(current_reading)
-        
+    def current_features(self, current_reading=None, tank_id=None):
+        """
+        Model features for now. Lag features come from the tank's window in
+        the feature store, as in training: prev_reading is the reading before
+        the current one, 3h_avg the mean of the three before it and roc_1h the
+        difference. Without `current_reading` the tank's newest stored
+        reading is the current one.
+        """
+        history = self.feature_store.readings(tank_id) if self.feature_store else []
+        if current_reading is None:
+            if not history:
+                raise ValueError("No sensor readings recorded yet; pass sensor_cm")
+            current_reading, history = history[-1], history[:-1]
+
+        recent = history[-3:]
+        prev_reading = history[-1] if history else current_reading
         now = datetime.now()
-        features = {
+        return {
             'hour': now.hour,
             'sensor_cm': current_reading,
-            'prev_reading': self.history[1] if len(self.history) > 1 else current_reading,
+            'prev_reading': prev_reading,
             'day_of_week': now.weekday(),
-            '3h_avg': sum(self.history)/len(self.history) if self.history else current_reading,
-            'roc_1h': self.history[0] - self.history[1] if len(self.history) > 1 else 0
+            '3h_avg': sum(recent) / len(recent) if recent else current_reading,
+            'roc_1h': current_reading - prev_reading
         }
 
-        forecast = []
-        temp_features = features.copy()
-        
-        for _ in range(6):  # 6-hour forecast
-            df = pd.DataFrame([temp_features], dtype=float)
-            pred = self.model.predict(df)[0]
-            forecast.append(pred)
-            
+    def predict_critical(self, current_reading=None, tank_id=None):
+        result, _ = self.predict_critical_cached(current_reading, tank_id)
+        return result
+
+    def predict_critical_cached(self, current_reading=None, tank_id=None):
+        """predict_critical plus whether the forecast was served from the cache."""
+        return self.predict_features_cached(self.current_features(current_reading, tank_id), tank_id)
+
+    def predict_features_cached(self, features, tank_id=None):
+        """
+        Forecast for a full feature dict, served from the cache when possible.
+        The cache is shared by all tanks: equal features give equal forecasts.
+        """
+        key = self.cache.key(features)
+        result = self.cache.get(key)
+        if result is not None:
+            return result, True
+
+        # Forecast from the quantized features so a cached entry is exactly
+        # what any input in the same bucket would have computed
+        quantized = dict(zip(FEATURES, key))
+        active = self.active
+        started = time.perf_counter()
+        forecast = self.forecast_features(quantized, active.estimator)
+        elapsed = time.perf_counter() - started
+        result = self.summarize(forecast)
+        if self.active is active:
+            # Don't cache a forecast from a model swapped out meanwhile
+            self.cache.put(key, result)
+        if self.observer is not None:
+            self.observer(quantized, forecast, elapsed, tank_id)
+        return result, False
+
+    def forecast_features(self, features, model=None):
+        """One forecast (a 1-D array of `steps` levels) from a feature dict."""
+        return self.predict_many(
+            np.array([features['sensor_cm']]),
+            prev_reading=np.array([features['prev_reading']]),
+            avg_3h=np.array([features['3h_avg']]),
+            roc_1h=np.array([features['roc_1h']]),
+            hour=features['hour'],
+            day_of_week=features['day_of_week'],
+            model=model
+        )[0]
+
+    def predict_many(self, sensor_cm, prev_reading=None, avg_3h=None, roc_1h=None,
+                     hour=None, day_of_week=None, steps=6, model=None):
+        """
+        Recursive multi-step forecast for N readings at once.
+        Takes 1-D arrays (or scalars for hour/day_of_week) and returns an
+        (N, steps) array, calling the model once per horizon step.
+        """
+        # One model for every step, even if a hot reload swaps it mid-forecast
+        model = model or self.model
+        sensor_cm = np.asarray(sensor_cm, dtype=float)
+        n = sensor_cm.shape[0]
+        now = datetime.now()
+
+        X = np.empty((n, len(FEATURES)), dtype=float)
+        X[:, HOUR] = now.hour if hour is None else hour
+        X[:, SENSOR_CM] = sensor_cm
+        X[:, PREV_READING] = sensor_cm if prev_reading is None else prev_reading
+        X[:, DAY_OF_WEEK] = now.weekday() if day_of_week is None else day_of_week
+        X[:, AVG_3H] = sensor_cm if avg_3h is None else avg_3h
+        X[:, ROC_1H] = 0.0 if roc_1h is None else roc_1h
+
+        forecast = np.empty((n, steps), dtype=float)
+        for step in range(steps):
+            # The model was fitted on a named frame; wrap the whole batch once per step
+            started = time.perf_counter()
+            pred = model.predict(pd.DataFrame(X, columns=FEATURES, copy=False))
+            MODEL_INFERENCE_SECONDS.observe(time.perf_counter() - started, kind='batch' if n > 1 else 'single')
+            forecast[:, step] = pred
+
             # Update features for next prediction
-            temp_features['prev_reading'] = pred
-            temp_features['hour'] = (temp_features['hour'] + 1) % 24
-            temp_features['3h_avg'] = (temp_features['3h_avg']*2 + pred)/3
-            temp_features['roc_1h'] = pred - temp_features['prev_reading']
+            X[:, PREV_READING] = pred
+            X[:, HOUR] = (X[:, HOUR] + 1) % 24
+            X[:, AVG_3H] = (X[:, AVG_3H]*2 + pred)/3
+            X[:, ROC_1H] = pred - X[:, PREV_READING]
+
+        return forecast
 
+    def summarize(self, forecast):
         return {
-            'critical': bool(max(forecast) >= self.critical),
-            'forecast': [round(p,1) for p in forecast],
-            'max_level': round(max(forecast),1),
-            'next_3h': round(sum(forecast[:3])/3,1)
-        }
\ No newline at end of file
+            'critical': bool(forecast.max() >= self.critical),
+            'forecast': [round(float(p), 1) for p in forecast],
+            'max_level': round(float(forecast.max()), 1),
+            'next_3h': round(float(forecast[:3].mean()), 1)
+        }
@@ -0,0 +1,156 @@
+"""
+JWT revocation (logout) store shared by every gunicorn worker.
+
+Revoked jtis live in a store (the `revoked_tokens` table, or an in-memory
+stand-in for single-process runs) until the token's own `exp` passes.
+Each worker keeps a Bloom filter of the live revocations, rebuilt every
+few seconds, so the common "not revoked" answer needs no round trip.
+Rebuilding only reads; run `python revocation.py` periodically (e.g. daily
+cron) to delete rows whose tokens have expired.
+"""
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import delete, select
+
+from database import db, upsert
+from models import RevokedToken
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate=0.01):
+        capacity = max(capacity, 1)
+        self.size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        # Double hashing: h1 + i*h2 from one 128-bit digest
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:], 'big') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(key))
+
+
+class DatabaseRevocationStore:
+    """Revocations in the revoked_tokens table, visible to every worker."""
+
+    def revoke(self, jti, expires_at):
+        # Concurrent logouts of the same token both succeed; the first row wins
+        db.session.execute(
+            upsert(RevokedToken, {"jti": jti, "expires_at": expires_at}, index_elements=['jti'])
+        )
+        db.session.commit()
+
+    def is_revoked(self, jti):
+        return db.session.scalar(
+            select(RevokedToken.jti).where(
+                RevokedToken.jti == jti,
+                RevokedToken.expires_at > datetime.utcnow()
+            )
+        ) is not None
+
+    def active_jtis(self):
+        return db.session.scalars(
+            select(RevokedToken.jti).where(RevokedToken.expires_at > datetime.utcnow())
+        ).all()
+
+    def purge_expired(self):
+        purged = db.session.execute(
+            delete(RevokedToken).where(RevokedToken.expires_at <= datetime.utcnow())
+        ).rowcount
+        db.session.commit()
+        return purged
+
+
+class MemoryRevocationStore:
+    """Process-local key-value stand-in; only correct with a single worker."""
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def revoke(self, jti, expires_at):
+        with self._lock:
+            self._entries[jti] = expires_at
+
+    def is_revoked(self, jti):
+        expires_at = self._entries.get(jti)
+        return expires_at is not None and expires_at > datetime.utcnow()
+
+    def active_jtis(self):
+        # Nothing else would ever drop expired entries, so prune them here
+        self.purge_expired()
+        with self._lock:
+            return list(self._entries)
+
+    def purge_expired(self):
+        now = datetime.utcnow()
+        with self._lock:
+            expired = [j for j, expires_at in self._entries.items() if expires_at <= now]
+            for jti in expired:
+                del self._entries[jti]
+        return len(expired)
+
+
+class RevocationList:
+    """
+    Store plus a per-worker Bloom filter negative cache. A revocation made
+    on another worker is seen once this worker's filter is next rebuilt,
+    i.e. within `refresh_seconds`.
+    """
+
+    def __init__(self, store, refresh_seconds=10):
+        self.store = store
+        self.refresh_seconds = refresh_seconds
+        self._bloom = None
+        self._refreshed_at = 0.0
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        jtis = self.store.active_jtis()
+        bloom = BloomFilter(capacity=max(1024, 2 * len(jtis)))
+        for jti in jtis:
+            bloom.add(jti)
+        self._bloom = bloom
+        self._refreshed_at = time.monotonic()
+
+    def _current_bloom(self):
+        if self._bloom is None or time.monotonic() - self._refreshed_at > self.refresh_seconds:
+            with self._lock:
+                if self._bloom is None or time.monotonic() - self._refreshed_at > self.refresh_seconds:
+                    self.refresh()
+        return self._bloom
+
+    def is_revoked(self, jti):
+        if jti not in self._current_bloom():
+            return False
+        # Possible hit (or false positive): confirm against the store
+        return self.store.is_revoked(jti)
+
+    def revoke(self, jti, expires_at):
+        self.store.revoke(jti, expires_at)
+        self._current_bloom().add(jti)
+
+
+def create_revocation_list(config):
+    kind = config.get('JWT_REVOCATION_STORE', 'database')
+    store = MemoryRevocationStore() if kind == 'memory' else DatabaseRevocationStore()
+    return RevocationList(store, refresh_seconds=config.get('JWT_REVOCATION_REFRESH_SECONDS', 10))
+
+
+if __name__ == '__main__':
+    from app import app
+
+    with app.app_context():
+        print(f"Purged {DatabaseRevocationStore().purge_expired()} expired token revocations.")
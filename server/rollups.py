@@ -0,0 +1,150 @@
+"""
+Pre-computed 5m/1h/1d rollups of sensor readings, per tank.
+
+Every ingest path folds its new readings into `sensor_reading_rollups` in
+the same transaction, so long-range charts read a handful of rollup rows
+instead of scanning `sensor_readings`. Run `python rollups.py` to rebuild
+them from scratch (e.g. after a bulk load that bypassed the API).
+"""
+from collections.abc import Mapping
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, func, select
+
+from database import db, upsert
+from models import DEFAULT_TANK_ID, SensorReading, SensorReadingRollup
+
+BUCKETS = {
+    '5m': timedelta(minutes=5),
+    '1h': timedelta(hours=1),
+    '1d': timedelta(days=1),
+}
+METRICS = ('temp', 'ph', 'tank_level_per')
+EPOCH = datetime(1970, 1, 1)
+
+
+def bucket_start(timestamp, size):
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    seconds = int(size.total_seconds())
+    offset = int((timestamp - EPOCH).total_seconds()) // seconds * seconds
+    return EPOCH + timedelta(seconds=offset)
+
+
+def _field(reading, name, default=None):
+    return reading.get(name, default) if isinstance(reading, Mapping) else getattr(reading, name, default)
+
+
+def aggregate(readings):
+    """
+    Fold readings into one partial rollup row per (tank_id, bucket, bucket_start),
+    returned in key order so concurrent upserts lock rows in the same order
+    and cannot deadlock on PostgreSQL.
+    """
+    rows = {}
+    for reading in readings:
+        timestamp = _field(reading, 'timestamp')
+        tank_id = _field(reading, 'tank_id') or DEFAULT_TANK_ID
+        values = {metric: _field(reading, metric) for metric in METRICS}
+        for bucket, size in BUCKETS.items():
+            key = (tank_id, bucket, bucket_start(timestamp, size))
+            row = rows.get(key)
+            if row is None:
+                row = rows[key] = {'tank_id': tank_id, 'bucket': bucket, 'bucket_start': key[2], 'reading_count': 0}
+                for metric, value in values.items():
+                    row[f'{metric}_sum'] = 0.0
+                    row[f'{metric}_min'] = value
+                    row[f'{metric}_max'] = value
+            row['reading_count'] += 1
+            for metric, value in values.items():
+                row[f'{metric}_sum'] += value
+                row[f'{metric}_min'] = min(row[f'{metric}_min'], value)
+                row[f'{metric}_max'] = max(row[f'{metric}_max'], value)
+    return [rows[key] for key in sorted(rows)]
+
+
+def _merge(excluded):
+    # SQLite spells LEAST/GREATEST as the multi-argument min()/max()
+    sqlite = db.session.get_bind().dialect.name == 'sqlite'
+    least = func.min if sqlite else func.least
+    greatest = func.max if sqlite else func.greatest
+
+    merged = {
+        'reading_count': SensorReadingRollup.reading_count + excluded.reading_count
+    }
+    for metric in METRICS:
+        total, low, high = (f'{metric}_sum', f'{metric}_min', f'{metric}_max')
+        merged[total] = getattr(SensorReadingRollup, total) + getattr(excluded, total)
+        merged[low] = least(getattr(SensorReadingRollup, low), getattr(excluded, low))
+        merged[high] = greatest(getattr(SensorReadingRollup, high), getattr(excluded, high))
+    return merged
+
+
+def apply_readings(readings):
+    """Upsert new readings into the rollups in the caller's transaction (caller commits)."""
+    rows = aggregate(readings)
+    if rows:
+        db.session.execute(
+            upsert(SensorReadingRollup, rows, index_elements=['tank_id', 'bucket', 'bucket_start'], set_=_merge)
+        )
+    return len(rows)
+
+
+def rebuild_rollups(chunk_size=5000):
+    """Recompute every rollup from sensor_readings, streaming the table in chunks."""
+    db.session.execute(delete(SensorReadingRollup))
+    readings = db.session.execute(
+        select(
+            SensorReading.tank_id,
+            SensorReading.timestamp,
+            SensorReading.temp,
+            SensorReading.ph,
+            SensorReading.tank_level_per
+        ).execution_options(yield_per=chunk_size)
+    ).mappings()
+    total = 0
+    for chunk in readings.partitions():
+        apply_readings(chunk)
+        total += len(chunk)
+    db.session.commit()
+    return total
+
+
+def query_rollups(bucket, start, end, tank_id=None):
+    """
+    Rollup rows for one bucket size with bucket_start in [start, end], oldest
+    first. Without `tank_id` each bucket combines every tank's row for it.
+    """
+    conditions = (
+        SensorReadingRollup.bucket == bucket,
+        SensorReadingRollup.bucket_start >= bucket_start(start, BUCKETS[bucket]),
+        SensorReadingRollup.bucket_start <= end
+    )
+    if tank_id is not None:
+        return (
+            SensorReadingRollup.query
+            .filter(SensorReadingRollup.tank_id == tank_id, *conditions)
+            .order_by(SensorReadingRollup.bucket_start)
+            .all()
+        )
+
+    columns = [func.sum(SensorReadingRollup.reading_count).label('reading_count')]
+    for metric in METRICS:
+        columns += [
+            func.sum(getattr(SensorReadingRollup, f'{metric}_sum')).label(f'{metric}_sum'),
+            func.min(getattr(SensorReadingRollup, f'{metric}_min')).label(f'{metric}_min'),
+            func.max(getattr(SensorReadingRollup, f'{metric}_max')).label(f'{metric}_max'),
+        ]
+    return db.session.execute(
+        select(SensorReadingRollup.bucket_start, *columns)
+        .where(*conditions)
+        .group_by(SensorReadingRollup.bucket_start)
+        .order_by(SensorReadingRollup.bucket_start)
+    ).all()
+
+
+if __name__ == '__main__':
+    from app import app
+
+    with app.app_context():
+        print(f"Rebuilt rollups from {rebuild_rollups()} sensor readings.")
@@ -2,8 +2,10 @@ from datetime import datetime, timedelta, timezone
 import random
 
 from database import db
+from notification_state import reconcile_read_counts
+from rollups import apply_readings as apply_rollups
 from app import app
-from models import SensorReading, User, Notification, UserNotification
+from models import SensorReading, User, Notification, UserNotification, NotificationReadState
 
 def seed_all():
     with app.app_context():
@@ -36,6 +38,8 @@ def seed_all():
             )
             readings.append(reading)
         db.session.add_all(readings)
+        db.session.flush()
+        apply_rollups(readings)
         db.session.commit()
 
         print("Seeded sensor_readings table.")
@@ -59,20 +63,29 @@ def seed_all():
 
         print("Seeded notifications table.")
 
-        # Seed UserNotifications
+        # Seed read state: a watermark per user plus a few individual reads
+        read_states = []
         user_notifications = []
         for user in users:
-            for notif in random.sample(notifications, k=random.randint(1, len(notifications))):
-                user_notifications.append(UserNotification(
-                    user_id=user.id,
-                    notification_id=notif.id,
-                    is_read=random.choice([False]),
-                    read_at=now - timedelta(minutes=random.randint(5, 120)) if random.choice([True, False]) else None
-                ))
-        db.session.add_all(user_notifications)
+            read_through = random.choice([0] + [n.id for n in notifications])
+            read_states.append(NotificationReadState(
+                user_id=user.id,
+                read_through_id=read_through,
+                read_at=now - timedelta(minutes=random.randint(5, 120)) if read_through else None
+            ))
+            for notif in notifications:
+                if notif.id > read_through and random.choice([True, False]):
+                    user_notifications.append(UserNotification(
+                        user_id=user.id,
+                        notification_id=notif.id,
+                        is_read=True,
+                        read_at=now - timedelta(minutes=random.randint(5, 120))
+                    ))
+        db.session.add_all(read_states + user_notifications)
         db.session.commit()
+        reconcile_read_counts()
 
-        print("Seeded user_notifications table.")
+        print("Seeded notification read state.")
 
 if __name__ == "__main__":
     seed_all()
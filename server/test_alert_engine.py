@@ -0,0 +1,145 @@
+from datetime import datetime, timedelta
+
+from flask_jwt_extended import create_access_token
+
+from database import db
+from models import AlertRule, AlertState, EmailOutbox, Notification, User
+
+START = datetime(2026, 1, 1, 8, 0)
+
+
+def ingest(client, *levels, minutes=0, step=5, ph=None):
+    """Post levels as one batch, `step` minutes apart starting `minutes` after START."""
+    rows = [
+        {"temp": 22.0, "ph": ph[i] if ph else 7.0, "tank_level_per": level,
+         "timestamp": (START + timedelta(minutes=minutes + i * step)).isoformat()}
+        for i, level in enumerate(levels)
+    ]
+    assert client.post("/sensor-readings/batch", json=rows).status_code == 201
+
+
+def notifications():
+    return [(n.severity, n.message) for n in Notification.query.order_by(Notification.id)]
+
+
+def subscribe():
+    user = User(full_name="Alert User", email="alerts@example.com", receive_email_alerts=True)
+    user.set_password("test123")
+    db.session.add(user)
+    db.session.commit()
+
+
+def test_batch_above_threshold_raises_one_alert(app, client):
+    subscribe()
+    ingest(client, 95, 92, 91, 85, 97)
+
+    assert notifications() == [("critical", "Main tank: tank level is at 95%, approaching capacity")]
+    assert EmailOutbox.query.count() == 1
+
+    state = db.session.get(AlertState, (1, "tank_level_high"))
+    assert (state.status, state.severity, state.peak_value, state.reading_count) == ("ongoing", "critical", 97.0, 5)
+
+
+def test_hovering_near_threshold_does_not_flap(app, client):
+    ingest(client, 95)
+    ingest(client, 89, 91, 88, 92, 80, minutes=5)
+
+    assert len(notifications()) == 1
+
+
+def test_clear_then_reraise_inside_cooldown_is_quiet(app, client):
+    ingest(client, 95)
+    ingest(client, 70, minutes=5)
+    ingest(client, 95, minutes=10)
+    ingest(client, 70, minutes=15)  # never announced, so neither is its end
+
+    assert [severity for severity, _ in notifications()] == ["critical", "info"]
+    assert db.session.get(AlertState, (1, "tank_level_high")).status == "cleared"
+
+    ingest(client, 95, minutes=120)
+    assert [severity for severity, _ in notifications()] == ["critical", "info", "critical"]
+
+
+def test_escalation_emails_only_at_critical(app, client):
+    subscribe()
+    ingest(client, 85)
+    assert notifications() == [("warning", "Main tank: tank level is at 85%, approaching capacity")]
+    assert EmailOutbox.query.count() == 0
+
+    ingest(client, 93, minutes=5)
+    assert [severity for severity, _ in notifications()] == ["warning", "critical"]
+    assert EmailOutbox.query.count() == 1
+
+
+def test_long_running_alert_sends_reminder_without_email(app, client):
+    subscribe()
+    ingest(client, 95)
+    ingest(client, 96, minutes=7 * 60)
+
+    assert [severity for severity, _ in notifications()] == ["critical", "critical"]
+    assert notifications()[1][1].startswith("Main tank: tank level is still at 96% (peak 96%)")
+    assert EmailOutbox.query.count() == 1
+
+
+def test_late_readings_do_not_reopen_alert(app, client):
+    ingest(client, 95, minutes=60)
+    ingest(client, 70, minutes=65)
+    ingest(client, 95, minutes=0)
+
+    assert db.session.get(AlertState, (1, "tank_level_high")).status == "cleared"
+    assert len(notifications()) == 2
+
+
+def admin_headers():
+    admin = User(full_name="Rule Admin", email="rules@example.com", role="Admin")
+    admin.set_password("test123")
+    db.session.add(admin)
+    db.session.commit()
+    token = create_access_token(identity=str(admin.id), additional_claims={"email": admin.email, "role": admin.role})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_ph_zscore_rule_flags_an_outlier_against_recent_history(app, client):
+    # A steady pH wobbling around 7, then one reading far outside it
+    baseline = [7.0 + 0.05 * (-1) ** i for i in range(24)]
+    ingest(client, *[50] * 24, ph=baseline)
+    assert notifications() == []
+
+    ingest(client, 50, 50, minutes=24 * 5, ph=[7.02, 9.5])
+    (severity, message), = notifications()
+    assert severity == "critical"
+    assert message.startswith("Main tank: unusual pH reading, ")
+    assert db.session.get(AlertState, (1, "ph_anomaly")).status == "raised"
+
+
+def test_rules_are_edited_through_the_api_and_recompiled(app, client):
+    headers = admin_headers()
+    rule = AlertRule.query.filter_by(condition="tank_level_high").one()
+
+    resp = client.patch(f"/alert-rules/{rule.id}", json={"warning": 60, "critical": 70, "clear_at": 50}, headers=headers)
+    assert resp.status_code == 200
+    ingest(client, 65)
+    assert notifications() == [("warning", "Main tank: tank level is at 65%, approaching capacity")]
+
+    resp = client.post("/alert-rules", json={
+        "condition": "temp_low", "metric": "temp", "kind": "threshold", "direction": "below",
+        "warning": 10, "critical": 5, "clear_at": 12
+    }, headers=headers)
+    assert resp.status_code == 201
+    client.post("/sensor-readings", json={"temp": 4, "ph": 7, "tank_level_per": 65})
+    assert notifications()[-1] == ("critical", "Main tank: temperature is at 4°C, below the critical limit of 5°C")
+
+
+def test_invalid_rules_are_rejected(app, client):
+    headers = admin_headers()
+    rule = AlertRule.query.filter_by(condition="tank_level_high").one()
+
+    resp = client.patch(f"/alert-rules/{rule.id}", json={"clear_at": 95}, headers=headers)
+    assert resp.status_code == 400
+    assert "clear_at" in resp.get_json()["error"]
+    assert db.session.get(AlertRule, rule.id).clear_at == 75
+
+    resp = client.post("/alert-rules", json={
+        "condition": "ph_band", "metric": "ph", "kind": "threshold", "direction": "both", "warning": 1, "clear_at": 0
+    }, headers=headers)
+    assert resp.status_code == 400
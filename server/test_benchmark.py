@@ -0,0 +1,33 @@
+import pytest
+
+import app as app_module
+from benchmark import SCENARIOS, compare, run_scenario, seed, uncovered_routes
+
+
+@pytest.fixture
+def bench_registry(tmp_path, monkeypatch):
+    registry = app_module.model_registry
+    monkeypatch.setattr(registry, 'root', str(tmp_path))
+    monkeypatch.setattr(registry, 'versions_dir', str(tmp_path / 'versions'))
+    monkeypatch.setattr(registry, 'state_path', str(tmp_path / 'ACTIVE.json'))
+    original = app_module.predictor.active
+    yield registry
+    app_module.predictor.swap_model(original)
+
+
+def test_every_route_has_a_passing_scenario(app, bench_registry):
+    assert uncovered_routes(app) == []
+
+    fixture = seed(app, readings=300, users=3, notifications=10, batch_size=5, victims=2)
+    fixture.model_version = bench_registry.register(app_module.predictor.model, version='bench')
+    for name, scenario in SCENARIOS.items():
+        stats = run_scenario(app, fixture, scenario, requests=2, concurrency=1, warmup=0)
+        assert stats['errors'] == 0, (name, stats['status_codes'])
+
+
+def test_compare_flags_slower_endpoints():
+    baseline = {'endpoints': {'predict': {'p95_ms': 10.0, 'throughput_rps': 100.0, 'errors': 0}}}
+    slower = {'endpoints': {'predict': {'p95_ms': 15.0, 'throughput_rps': 95.0, 'errors': 0}}}
+    same = {'endpoints': {'predict': {'p95_ms': 10.5, 'throughput_rps': 98.0, 'errors': 0}}}
+    assert [name for name, _ in compare(slower, baseline)] == ['predict']
+    assert compare(same, baseline) == []
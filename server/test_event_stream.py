@@ -0,0 +1,93 @@
+import json
+
+from flask_jwt_extended import create_access_token
+
+from database import db
+from models import User
+
+
+def stream_token(app):
+    user = User(full_name="Streamer", email="stream@example.com")
+    user.set_password("secret")
+    db.session.add(user)
+    db.session.commit()
+    return create_access_token(identity=str(user.id), additional_claims={"email": user.email, "role": user.role})
+
+
+def read_event(chunks):
+    """Next non-keepalive event from a streaming response as (type, data)."""
+    for chunk in chunks:
+        chunk = chunk.decode()
+        if chunk.startswith("event:"):
+            kind, data = chunk.strip().split("\n")
+            return kind.split(": ", 1)[1], json.loads(data.split(": ", 1)[1])
+
+
+def test_stream_pushes_readings_and_notifications(app, client):
+    resp = client.get(f"/stream?jwt={stream_token(app)}", buffered=False)
+    assert resp.status_code == 200
+    assert resp.mimetype == "text/event-stream"
+    chunks = iter(resp.response)
+    assert next(chunks).startswith(b"retry:")
+
+    created = client.post("/sensor-readings", json={"temp": 25, "ph": 7, "tank_level_per": 95}).get_json()
+
+    kind, data = read_event(chunks)
+    assert kind == "reading"
+    assert data == created["reading"]
+
+    kind, data = read_event(chunks)
+    assert kind == "notification"
+    assert data["notification_type"] == "tank_level_high"
+    resp.close()
+
+    assert app.extensions["events"].subscriber_count() == 0
+
+
+def test_stream_filters_event_types(app, client):
+    token = stream_token(app)
+    assert client.get(f"/stream?jwt={token}&types=bogus").status_code == 400
+
+    resp = client.get(f"/stream?jwt={token}&types=notification", buffered=False)
+    chunks = iter(resp.response)
+    next(chunks)
+
+    client.post("/sensor-readings", json={"temp": 25, "ph": 7, "tank_level_per": 95})
+
+    kind, _ = read_event(chunks)
+    assert kind == "notification"
+    resp.close()
+
+
+def test_stream_cap_leaves_threads_for_ordinary_requests(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, "SSE_MAX_STREAMS", 2)
+    token = stream_token(app)
+    streams = [client.get(f"/stream?jwt={token}", buffered=False) for _ in range(2)]
+    assert [resp.status_code for resp in streams] == [200, 200]
+
+    refused = client.get(f"/stream?jwt={token}")
+    assert refused.status_code == 503
+    assert refused.headers["Retry-After"] == "30"
+    # Past the cap, API requests are still served
+    assert client.get("/sensorreadings").status_code == 200
+
+    streams[0].close()
+    assert app.extensions["sse_streams"].open == 1
+    reopened = client.get(f"/stream?jwt={token}", buffered=False)
+    assert reopened.status_code == 200
+    for resp in (streams[1], reopened):
+        resp.close()
+    assert app.extensions["sse_streams"].open == 0
+
+
+def test_stream_ends_after_its_lifetime(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, "SSE_MAX_STREAM_SECONDS", 0)
+    resp = client.get(f"/stream?jwt={stream_token(app)}", buffered=False)
+    chunks = iter(resp.response)
+    next(chunks)
+
+    assert read_event(chunks) == ("reconnect", {})
+    assert next(chunks, None) is None
+    resp.close()
+    assert app.extensions["sse_streams"].open == 0
+    assert app.extensions["events"].subscriber_count() == 0
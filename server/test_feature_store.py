@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from app import predictor
+from database import db
+from models import SensorReading
+
+START = datetime(2024, 1, 1)
+
+
+def seed_levels(levels):
+    db.session.execute(insert(SensorReading), [
+        {"timestamp": START + timedelta(hours=i), "temp": 25.0, "ph": 7.0, "tank_level_per": level}
+        for i, level in enumerate(levels)
+    ])
+    db.session.commit()
+
+
+def test_features_come_from_stored_readings(app):
+    seed_levels([10, 20, 40, 60, 80])
+    predictor.feature_store.warm_start()
+
+    features = predictor.current_features()
+    cm = predictor.calculate_reading
+    assert features["sensor_cm"] == cm(80)
+    assert features["prev_reading"] == cm(60)
+    assert features["3h_avg"] == (cm(20) + cm(40) + cm(60)) / 3
+    assert features["roc_1h"] == cm(80) - cm(60)
+
+
+def test_ingest_advances_the_window(app, client):
+    seed_levels([10, 20])
+    predictor.feature_store.warm_start()
+
+    client.post("/sensor-readings", json={"temp": 25, "ph": 7, "tank_level_per": 50})
+    assert predictor.feature_store.readings()[-2:] == [predictor.calculate_reading(20), predictor.calculate_reading(50)]
+
+    resp = client.get("/predict")
+    assert resp.status_code == 200
+    assert resp.get_json()["data"]["current_level"] == 50.0
+
+    # A batch only publishes its newest row, so the window reloads from the table
+    client.post("/sensor-readings/batch", json=[
+        {"temp": 25, "ph": 7, "tank_level_per": level} for level in (55, 60, 65)
+    ])
+    assert predictor.feature_store.readings()[-3:] == [predictor.calculate_reading(l) for l in (55, 60, 65)]
+
+
+def test_replayed_readings_are_not_counted_twice(app):
+    seed_levels([10, 20, 30, 40])
+    store = predictor.feature_store
+    store.warm_start()
+    before = store.readings()
+
+    for row in SensorReading.query.filter(SensorReading.tank_level_per.in_([40, 20])):
+        store.record({"id": row.id, "tank_id": row.tank_id, "timestamp": row.timestamp.isoformat(),
+                      "tank_level_per": row.tank_level_per})
+
+    assert store.readings() == before
+    features = predictor.current_features()
+    assert features["prev_reading"] == predictor.calculate_reading(30)
@@ -0,0 +1,170 @@
+import socketserver
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from database import db
+from mail_queue import MAX_ATTEMPTS, MailWorker, claim_batch, deliver_pending
+from models import EmailOutbox, User
+
+
+class FakeSMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib: EHLO, AUTH PLAIN, MAIL/RCPT/DATA, QUIT."""
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        server = self.server
+        server.sessions += 1
+        self.reply("220 fake-smtp ready")
+        while True:
+            line = self.rfile.readline().decode().strip()
+            if not line:
+                return
+            verb = line.split(" ", 1)[0].upper()
+            if verb in ("EHLO", "HELO"):
+                self.reply("250-fake-smtp")
+                self.reply("250 AUTH PLAIN LOGIN")
+            elif verb == "AUTH":
+                server.logins += 1
+                self.reply("235 Authentication successful")
+            elif verb == "MAIL":
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                recipient = line.split(":", 1)[1].strip("<> ")
+                if recipient in server.reject:
+                    self.reply("550 No such user")
+                else:
+                    server.recipients.append(recipient)
+                    self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    pass
+                self.reply("250 OK queued")
+            elif verb == "RSET" or verb == "NOOP":
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+@pytest.fixture
+def smtp_server(app):
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), FakeSMTPHandler)
+    server.daemon_threads = True
+    server.sessions = server.logins = 0
+    server.recipients, server.reject = [], set()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    app.config.update(
+        MAIL_SERVER="127.0.0.1",
+        MAIL_PORT=server.server_address[1],
+        MAIL_USE_SSL=False,
+        MAIL_USERNAME="alerts@example.com",
+        MAIL_PASSWORD="secret",
+    )
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def add_users(count, receive_email_alerts=True):
+    for i in range(count):
+        user = User(full_name=f"User {i}", email=f"user{i}@example.com",
+                    receive_email_alerts=receive_email_alerts)
+        user.set_password("test123")
+        db.session.add(user)
+    db.session.commit()
+
+
+def test_ingest_queues_emails_instead_of_sending(client, smtp_server):
+    add_users(3)
+
+    resp = client.post("/sensor-readings", json={"temp": 22.0, "ph": 7.0, "tank_level_per": 95})
+
+    assert resp.status_code == 201
+    assert smtp_server.sessions == 0
+    assert EmailOutbox.query.filter_by(status="pending").count() == 3
+
+
+def test_batch_is_sent_over_one_session(app, client, smtp_server):
+    add_users(5)
+    client.post("/sensor-readings", json={"temp": 22.0, "ph": 7.0, "tank_level_per": 95})
+
+    assert deliver_pending(app) == 5
+
+    assert smtp_server.sessions == 1
+    assert smtp_server.logins == 1
+    assert sorted(smtp_server.recipients) == [f"user{i}@example.com" for i in range(5)]
+    assert EmailOutbox.query.filter_by(status="sent").count() == 5
+    assert deliver_pending(app) == 0
+
+
+def test_rejected_recipient_is_retried_with_backoff(app, client, smtp_server):
+    add_users(2)
+    smtp_server.reject.add("user1@example.com")
+    client.post("/sensor-readings", json={"temp": 22.0, "ph": 7.0, "tank_level_per": 95})
+
+    deliver_pending(app)
+
+    failed = EmailOutbox.query.filter_by(recipient="user1@example.com").one()
+    assert failed.status == "pending"
+    assert failed.attempts == 1
+    assert failed.next_attempt_at > datetime.utcnow()
+    assert EmailOutbox.query.filter_by(recipient="user0@example.com").one().status == "sent"
+
+    # Not due yet, so nothing is claimed on the next pass
+    assert deliver_pending(app) == 0
+
+
+def test_unreachable_server_reschedules_until_failed(app, client, smtp_server):
+    add_users(1)
+    client.post("/sensor-readings", json={"temp": 22.0, "ph": 7.0, "tank_level_per": 95})
+    app.config["MAIL_PORT"] = 1  # nothing listens here
+
+    for _ in range(MAX_ATTEMPTS):
+        EmailOutbox.query.update({"next_attempt_at": datetime.utcnow() - timedelta(seconds=1)})
+        db.session.commit()
+        deliver_pending(app)
+
+    message = EmailOutbox.query.one()
+    assert message.status == "failed"
+    assert message.attempts == MAX_ATTEMPTS
+    assert smtp_server.sessions == 0
+
+
+def test_oldest_due_messages_are_claimed_first(app):
+    now = datetime.utcnow()
+    for minutes, recipient in ((5, "newer"), (30, "oldest"), (10, "older"), (-5, "not-due")):
+        db.session.add(EmailOutbox(recipient=f"{recipient}@example.com", subject="Alert", body="x",
+                                   next_attempt_at=now - timedelta(minutes=minutes)))
+    db.session.add(EmailOutbox(recipient="sent@example.com", subject="Alert", body="x", status="sent",
+                               next_attempt_at=now - timedelta(hours=1)))
+    db.session.commit()
+
+    assert {m.recipient for m in claim_batch(2)} == {"oldest@example.com", "older@example.com"}
+    assert {m.recipient for m in claim_batch(2)} == {"newer@example.com"}
+
+
+def test_started_worker_drains_mail_queued_before_it(app, smtp_server):
+    # Left over from before a restart: due, and no new alert will wake anyone
+    db.session.add(EmailOutbox(recipient="left@example.com", subject="Alert", body="x",
+                               next_attempt_at=datetime.utcnow() - timedelta(minutes=5)))
+    db.session.commit()
+
+    worker = MailWorker(app, threads=1, poll_seconds=60)
+    worker.start()
+    deadline = time.monotonic() + 5
+    while not smtp_server.recipients and time.monotonic() < deadline:
+        time.sleep(0.05)
+    worker.stop()
+    worker._workers[0].join(5)
+
+    assert smtp_server.recipients == ["left@example.com"]
+    assert EmailOutbox.query.one().status == "sent"
@@ -0,0 +1,39 @@
+from metrics import Registry, registry
+
+
+def sample(body, prefix):
+    for line in body.splitlines():
+        if line.startswith(prefix):
+            return float(line.rsplit(' ', 1)[1])
+    return None
+
+
+def test_requests_record_latency_and_sql(app, client):
+    client.post("/sensor-readings", json={"temp": 25, "ph": 7, "tank_level_per": 50})
+    body = client.get("/metrics").get_data(as_text=True)
+
+    labels = '{endpoint="/sensor-readings",method="POST",status="201"}'
+    assert sample(body, f"http_request_duration_seconds_count{labels}") >= 1
+    assert sample(body, 'http_request_db_statements_sum{endpoint="/sensor-readings"}') >= 2
+    assert "# TYPE model_inference_seconds histogram" in body
+
+
+def test_worker_snapshots_merge():
+    local = Registry()
+    latency = local.histogram("latency_seconds", "Latency", ("endpoint",), buckets=(0.1, 1.0))
+    latency.observe(0.05, endpoint="/a")
+    latency.observe(2.0, endpoint="/a")
+
+    body = local.render([local.snapshot(), local.snapshot()])
+    assert sample(body, 'latency_seconds_bucket{endpoint="/a",le="0.1"}') == 2
+    assert sample(body, 'latency_seconds_bucket{endpoint="/a",le="+Inf"}') == 4
+    assert sample(body, 'latency_seconds_sum{endpoint="/a"}') == 4.1
+    assert "latency_seconds" not in registry.metrics
+
+
+def test_metrics_token_is_required_when_set(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, "METRICS_TOKEN", "s3cret")
+
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer s3cret"}).status_code == 200
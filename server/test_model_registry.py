@@ -0,0 +1,67 @@
+import threading
+
+import pytest
+
+from app import predictor
+from model_registry import ModelRegistry, ModelWatcher, RegistryError
+
+
+@pytest.fixture
+def registry(tmp_path):
+    original = predictor.active
+    yield ModelRegistry(str(tmp_path), mmap_mode=None)
+    predictor.swap_model(original)
+
+
+def test_watcher_swaps_in_new_versions(app, client, registry):
+    watcher = ModelWatcher(registry, predictor)
+    registry.register(predictor.model, version="a", mae=2.5)
+    assert watcher.check()
+    assert predictor.model_version == "a"
+
+    registry.register(predictor.model, version="b", mae=2.1)
+    watcher.check()
+    resp = client.get("/predict?sensor_cm=24.5")
+    assert resp.get_json()["data"]["model_version"] == "b"
+    assert not watcher.check()  # unchanged state is a no-op
+
+
+def test_rollback_pins_the_previous_version(app, registry):
+    watcher = ModelWatcher(registry, predictor)
+    registry.register(predictor.model, version="a")
+    registry.register(predictor.model, version="b")
+
+    state = registry.rollback()
+    assert state["version"] == "a" and state["pinned"]
+    registry.register(predictor.model, version="c")
+    watcher.check()
+    assert predictor.model_version == "a"
+
+    with pytest.raises(RegistryError):
+        registry.activate("missing")
+
+
+@pytest.mark.parametrize("version", ["../a", "/etc", "a/../b", ".tmp-x", "", "x" * 65])
+def test_versions_outside_the_registry_are_rejected(registry, version):
+    registry.register(predictor.model, version="a")
+
+    with pytest.raises(RegistryError):
+        registry.activate(version)
+    with pytest.raises(RegistryError):
+        registry.set_shadow(version)
+    assert registry.state()["version"] == "a"
+
+
+def test_concurrent_activations_keep_every_update(registry):
+    versions = [f"v{i}" for i in range(8)]
+    for version in versions:
+        registry.register(predictor.model, version=version, activate=False)
+
+    threads = [threading.Thread(target=registry.activate, args=(version,)) for version in versions]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    state = registry.state()
+    assert sorted(state["previous"] + [state["version"]]) == versions
@@ -0,0 +1,135 @@
+from flask_jwt_extended import create_access_token
+
+from database import db
+from models import Notification, NotificationReadState, User
+from notification_state import (
+    mark_all_read,
+    mark_read,
+    reconcile_read_counts,
+    record_notifications,
+    start_read_state,
+    unread_count,
+    user_notifications_query,
+)
+
+
+def make_user(email, role="Normal"):
+    user = User(full_name=email.split("@")[0], email=email, role=role)
+    user.set_password("secret")
+    db.session.add(user)
+    db.session.flush()
+    start_read_state(user.id)
+    db.session.commit()
+    return user
+
+
+def auth(user):
+    token = create_access_token(identity=str(user.id), additional_claims={"email": user.email, "role": user.role})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def broadcast(count):
+    notifications = [Notification(message=f"Alert {i}", severity="warning", notification_type="test") for i in range(count)]
+    db.session.add_all(notifications)
+    db.session.flush()
+    record_notifications(count, notifications[-1].id)
+    db.session.commit()
+    return [n.id for n in notifications]
+
+
+def raise_alerts(client, levels):
+    for level in levels:
+        client.post("/sensor-readings", json={"temp": 20, "ph": 7, "tank_level_per": level})
+        client.post("/sensor-readings", json={"temp": 20, "ph": 7, "tank_level_per": 10})
+
+
+def test_admin_summary_comes_from_counters_and_matches_exact_counts(app, client):
+    admin, reader = make_user("admin@example.com", role="Admin"), make_user("reader@example.com")
+    raise_alerts(client, (85, 95))  # warning, cleared, critical, cleared
+    mark_all_read(admin.id)
+    mark_read(reader.id, 2)
+    db.session.commit()
+
+    body = client.get("/notifications/all?limit=2", headers=auth(admin)).get_json()
+    assert body["summary"] == {"total": 8, "read": 5, "unread": 3}
+    exact = client.get("/notifications/all?summary=1", headers=auth(admin)).get_json()["summary"]
+    assert {key: exact[key] for key in ("total", "read", "unread")} == body["summary"]
+    assert exact["by_severity"] == {
+        "warning": {"total": 2, "read": 1, "unread": 1},
+        "info": {"total": 4, "read": 3, "unread": 1},
+        "critical": {"total": 2, "read": 1, "unread": 1}
+    }
+
+    # Filtered and later pages only carry a summary when asked for one
+    assert "summary" not in client.get("/notifications/all?severity=warning", headers=auth(admin)).get_json()
+    next_page = client.get(body["pagination"]["next"], headers=auth(admin)).get_json()
+    assert "summary" not in next_page
+    filtered = client.get("/notifications/all?severity=warning&summary=1", headers=auth(admin)).get_json()
+    assert filtered["summary"]["total"] == 2
+
+
+def test_read_state_is_a_watermark_plus_overrides(app):
+    user = make_user("reader@example.com")
+    first, second, third = broadcast(3)
+
+    assert mark_read(user.id, second)[0] is True
+    assert mark_read(user.id, 999) is None
+    db.session.commit()
+    read = {row.id: row.is_read for row in user_notifications_query(user.id)}
+    assert read == {first: False, second: True, third: False}
+
+    assert mark_all_read(user.id) == third
+    db.session.commit()
+    assert all(row.is_read for row in user_notifications_query(user.id))
+    # Already below the watermark: nothing new is stored
+    assert mark_read(user.id, first)[0] is True
+
+    fourth, = broadcast(1)
+    read = {row.id: row.is_read for row in user_notifications_query(user.id)}
+    assert read == {first: True, second: True, third: True, fourth: False}
+
+
+def test_unread_count_follows_reads_and_repairs_drift(app, client):
+    old = make_user("old@example.com")
+    second = broadcast(3)[1]
+    new = make_user("new@example.com")  # starts caught up
+    assert (unread_count(old.id), unread_count(new.id)) == (3, 0)
+
+    mark_read(old.id, second)
+    db.session.commit()
+    mark_read(old.id, second)  # reading twice counts once
+    db.session.commit()
+    assert unread_count(old.id) == 2
+    broadcast(2)
+    assert (unread_count(old.id), unread_count(new.id)) == (4, 2)
+    assert client.get("/notifications/unread-count", headers=auth(old)).get_json()["unread_count"] == 4
+
+    mark_all_read(old.id)
+    db.session.commit()
+    assert unread_count(old.id) == 0
+
+    # A drifted counter is put right by reconciliation, and only it is touched
+    db.session.get(NotificationReadState, new.id).read_count = 50
+    db.session.commit()
+    assert unread_count(new.id) == 0
+    assert reconcile_read_counts() == 1
+    assert (unread_count(old.id), unread_count(new.id)) == (0, 2)
+    assert reconcile_read_counts() == 0
+
+
+def test_listing_is_paged_and_starts_at_registration(app, client):
+    broadcast(3)  # before the user registered
+    user = make_user("late@example.com")
+    ids = broadcast(5)
+    headers = auth(user)
+
+    seen, url = [], "/notifications?limit=2"
+    while url:
+        body = client.get(url, headers=headers).get_json()
+        assert len(body["notifications"]) <= 2
+        seen += [n["notification_id"] for n in body["notifications"]]
+        url = body["pagination"]["next"]
+    assert seen == ids[::-1]
+
+    assert len(client.get("/notifications?limit=0", headers=headers).get_json()["notifications"]) == 1
+    assert client.get("/notifications?cursor=bogus", headers=headers).status_code == 400
@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import predictor as predictor_module
+from app import predictor
+from predictor import ForecastCache, LoadedModel
+
+
+def one_at_a_time(features, steps=6):
+    """The original per-reading loop: one single-row model call per horizon step."""
+    features, forecast = dict(features), []
+    for _ in range(steps):
+        pred = predictor.model.predict(pd.DataFrame([features], dtype=float))[0]
+        forecast.append(pred)
+        features['prev_reading'] = pred
+        features['hour'] = (features['hour'] + 1) % 24
+        features['3h_avg'] = (features['3h_avg'] * 2 + pred) / 3
+        features['roc_1h'] = pred - features['prev_reading']
+    return np.array(forecast)
+
+
+def test_predict_many_matches_single_forecasts():
+    rng = np.random.default_rng(7)
+    sensor_cm = rng.uniform(22, 27, 20)
+    prev_reading = sensor_cm - rng.uniform(-0.5, 0.5, 20)
+    avg_3h = sensor_cm - rng.uniform(-0.5, 0.5, 20)
+    roc_1h = sensor_cm - prev_reading
+
+    forecasts = predictor.predict_many(sensor_cm, prev_reading, avg_3h, roc_1h, hour=22, day_of_week=6)
+
+    assert forecasts.shape == (20, 6)
+    for i in range(20):
+        expected = one_at_a_time({
+            'hour': 22, 'sensor_cm': sensor_cm[i], 'prev_reading': prev_reading[i],
+            'day_of_week': 6, '3h_avg': avg_3h[i], 'roc_1h': roc_1h[i]
+        })
+        np.testing.assert_allclose(forecasts[i], expected)
+
+
+def test_batch_endpoint_matches_predict_many(app, client):
+    readings = [{"sensor_cm": 23.0}, {"sensor_cm": 26.5, "prev_reading": 26.0, "3h_avg": 25.8, "roc_1h": 0.5}]
+    predictions = client.post("/predict/batch", json={"readings": readings}).get_json()["data"]["predictions"]
+
+    forecasts = predictor.predict_many(
+        np.array([23.0, 26.5]), prev_reading=np.array([23.0, 26.0]),
+        avg_3h=np.array([23.0, 25.8]), roc_1h=np.array([0.0, 0.5])
+    )
+    assert [p["prediction"] for p in predictions] == [predictor.summarize(f) for f in forecasts]
+    assert client.post("/predict/batch", json={"readings": [{"sensor_cm": 30}]}).status_code == 400
+
+
+@pytest.fixture
+def fresh_cache(app):
+    predictor.cache.clear()
+    predictor.feature_store.invalidate()
+    original = predictor.active
+    yield predictor.cache
+    predictor.swap_model(original)
+
+
+def test_forecasts_are_cached_until_the_model_changes(client, fresh_cache):
+    def predict(sensor_cm):
+        return client.get(f"/predict?sensor_cm={sensor_cm}").get_json()["data"]
+
+    first = predict(24.5)
+    assert first["cached"] is False
+    again = predict(24.501)  # same 0.01 cm bucket
+    assert again["cached"] is True and again["prediction"] == first["prediction"]
+    assert predict(24.6)["cached"] is False
+    assert client.get("/predict/cache").get_json()["cache"]["hits"] >= 1
+
+    # A swapped-in model never serves the previous model's forecasts
+    predictor.swap_model(LoadedModel("swapped", predictor.model, {}))
+    assert fresh_cache.stats()["size"] == 0
+    swapped = predict(24.5)
+    assert swapped["cached"] is False and swapped["model_version"] == "swapped"
+
+
+def test_cache_evicts_least_recently_used_and_expires_hourly(monkeypatch):
+    cache = ForecastCache(max_entries=2)
+    now = [7200.0 + 3500]
+    monkeypatch.setattr(predictor_module.time, "time", lambda: now[0])
+
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)  # "b" was used least recently
+    assert (cache.get("b"), cache.get("a"), cache.get("c")) == (None, 1, 3)
+    assert cache.stats()["evictions"] == 1
+
+    now[0] += 100  # past the hour boundary
+    assert cache.get("a") is None
+    assert cache.stats()["size"] == 1
@@ -0,0 +1,171 @@
+"""
+Query-plan regression tests: seed a large dataset, drive each hot endpoint,
+and EXPLAIN every statement it sent to make sure the hot tables are read
+through an index rather than a full scan.
+
+Runs on SQLite by default; set TEST_DATABASE_URL to a throwaway PostgreSQL
+database to check the PostgreSQL plans (sequential scans disabled, so any
+remaining Seq Scan means no usable index exists).
+"""
+import random
+import re
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event, insert, text
+
+from database import db
+from mail_queue import claim_batch
+from models import EmailOutbox, Notification, NotificationReadState, SensorReading, User, UserNotification
+from notification_state import reconcile_read_counts
+from rollups import rebuild_rollups
+
+READINGS = 20000
+NOTIFICATIONS = 500
+USERS = 50
+START = datetime(2024, 1, 1)
+
+
+@pytest.fixture(scope="module")
+def seeded():
+    from app import app
+
+    rng = random.Random(42)
+    with app.app_context():
+        db.create_all()
+        db.session.execute(insert(User), [
+            {"full_name": f"User {i}", "email": f"user{i}@example.com", "password_hash": "x"}
+            for i in range(USERS)
+        ])
+        db.session.execute(insert(SensorReading), [
+            {"timestamp": START + timedelta(minutes=5 * i), "temp": rng.uniform(20, 30),
+             "ph": rng.uniform(6.5, 8), "tank_level_per": rng.uniform(0, 100)}
+            for i in range(READINGS)
+        ])
+        db.session.execute(insert(Notification), [
+            {"message": "Tank level high", "severity": "critical", "notification_type": "tank_level_high",
+             "created_at": START + timedelta(hours=i)}
+            for i in range(NOTIFICATIONS)
+        ])
+        db.session.execute(insert(NotificationReadState), [
+            {"user_id": user_id, "read_through_id": rng.randint(0, NOTIFICATIONS)}
+            for user_id in range(1, USERS + 1)
+        ])
+        db.session.execute(insert(UserNotification), [
+            {"user_id": user_id, "notification_id": notification_id, "is_read": True}
+            for user_id in range(1, USERS + 1)
+            for notification_id in rng.sample(range(1, NOTIFICATIONS + 1), 20)
+        ])
+        db.session.execute(insert(EmailOutbox), [
+            {"recipient": f"user{i % USERS}@example.com", "subject": "Alert", "body": "Tank level high",
+             "status": "sent" if i % 50 else "pending", "attempts": 0, "next_attempt_at": START}
+            for i in range(5000)
+        ])
+        rebuild_rollups()
+        reconcile_read_counts()
+        db.session.execute(text("ANALYZE"))
+        db.session.commit()
+
+        token = create_access_token(identity="1", additional_claims={"email": "user0@example.com", "role": "Normal"})
+        yield app, {"Authorization": f"Bearer {token}"}
+
+        db.session.remove()
+        db.drop_all()
+
+
+@contextmanager
+def captured_statements():
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and re.match(r"\s*(SELECT|UPDATE|DELETE)", statement, re.I):
+            statements.append((statement, parameters))
+
+    engine = db.engine
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+def full_scans(statement, parameters, tables):
+    """Hot tables the plan reads without an index (plus SQLite temp sorts)."""
+    conn = db.session.connection()
+    if conn.dialect.name == "postgresql":
+        conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+        plan = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters).scalar()
+        problems, nodes = [], [plan[0]["Plan"]]
+        while nodes:
+            node = nodes.pop()
+            if node["Node Type"] == "Seq Scan" and node["Relation Name"] in tables:
+                problems.append(f"Seq Scan on {node['Relation Name']}")
+            nodes.extend(node.get("Plans", []))
+        return problems
+
+    rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()
+    problems = []
+    for row in rows:
+        detail = row[-1]
+        match = re.match(r"SCAN (\w+)(?: AS \w+)?$", detail)
+        if match and match.group(1) in tables:
+            problems.append(detail)
+        if "TEMP B-TREE" in detail:
+            problems.append(detail)
+    return problems
+
+
+def assert_indexed(statements, tables):
+    relevant = [(s, p) for s, p in statements if any(t in s for t in tables)]
+    assert relevant, "endpoint issued no queries against the hot tables"
+    for statement, parameters in relevant:
+        problems = full_scans(statement, parameters, tables)
+        assert not problems, f"{problems} for:\n{statement}"
+
+
+@pytest.mark.parametrize("url", [
+    "/sensorreadings?limit=50&start_date=2024-02-01&end_date=2024-02-03",
+    "/sensorreadings?paginate=cursor&limit=100",
+    "/sensorreadings/aggregate?bucket=1h&start=2024-01-10T00:00:00&end=2024-01-20T00:00:00",
+    "/sensorreadings?tank_id=1&limit=50&start_date=2024-02-01&end_date=2024-02-03",
+    "/sensorreadings?tank_id=1&paginate=cursor&limit=100",
+    "/sensorreadings/aggregate?tank_id=1&bucket=1h&start=2024-01-10T00:00:00&end=2024-01-20T00:00:00",
+])
+def test_sensor_reading_endpoints_use_indexes(seeded, url):
+    app, _ = seeded
+    client = app.test_client()
+
+    first = client.get(url).get_json()
+    next_url = first.get("pagination", {}).get("next")
+    with captured_statements() as statements:
+        resp = client.get(next_url or url)
+    assert resp.status_code == 200
+
+    assert_indexed(statements, {"sensor_readings", "sensor_reading_rollups"})
+
+
+@pytest.mark.parametrize("method, url", [
+    ("get", "/notifications/unread-count"),
+    ("get", "/notifications"),
+    ("patch", f"/notifications/{NOTIFICATIONS}/read"),
+    ("patch", "/notifications/read-all"),
+])
+def test_notification_endpoints_use_indexes(seeded, method, url):
+    app, headers = seeded
+    client = app.test_client()
+
+    with captured_statements() as statements:
+        resp = getattr(client, method)(url, headers=headers)
+    assert resp.status_code == 200
+
+    assert_indexed(statements, {"notifications", "user_notifications", "notification_read_states"})
+
+
+def test_outbox_claim_uses_indexes(seeded):
+    with captured_statements() as statements:
+        claimed = claim_batch(10)
+    assert len(claimed) == 10
+
+    assert_indexed(statements, {"email_outbox"})
@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta
+
+from flask_jwt_extended import create_access_token
+
+from database import db
+from models import RevokedToken, User
+from revocation import BloomFilter, DatabaseRevocationStore, MemoryRevocationStore, RevocationList
+
+
+def make_user(email="user@example.com"):
+    user = User(full_name="User", email=email)
+    user.set_password("secret")
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def later(hours=1):
+    return datetime.utcnow() + timedelta(hours=hours)
+
+
+def test_logged_out_token_is_rejected(app, client):
+    user = make_user()
+    token = create_access_token(identity=str(user.id), additional_claims={"email": user.email, "role": user.role})
+    headers = {"Authorization": f"Bearer {token}"}
+
+    assert client.get("/notifications/unread-count", headers=headers).status_code == 200
+    assert client.post("/auth/logout", headers=headers).status_code == 200
+    assert client.get("/notifications/unread-count", headers=headers).status_code == 401
+    assert RevokedToken.query.count() == 1
+
+
+def test_revoking_the_same_token_twice_keeps_one_row(app, monkeypatch):
+    store = DatabaseRevocationStore()
+    store.revoke("jti-1", later())
+    store.revoke("jti-1", later(2))
+    assert RevokedToken.query.count() == 1
+
+    # Two workers logging out the same token at once both see no row yet;
+    # the second insert must not fail on the first one's row
+    monkeypatch.setattr(db.session, "get", lambda *args, **kwargs: None)
+    store.revoke("jti-1", later())
+    assert RevokedToken.query.count() == 1
+
+
+def test_revocations_reach_other_workers_on_their_next_refresh(app):
+    worker_a = RevocationList(DatabaseRevocationStore(), refresh_seconds=0)
+    worker_b = RevocationList(DatabaseRevocationStore(), refresh_seconds=3600)
+    assert not worker_a.is_revoked("jti-1")
+    assert not worker_b.is_revoked("jti-1")
+
+    worker_a.revoke("jti-1", later())
+
+    # Worker b still trusts its filter until it is rebuilt
+    assert not worker_b.is_revoked("jti-1")
+    worker_b.refresh()
+    assert worker_b.is_revoked("jti-1")
+    assert RevocationList(DatabaseRevocationStore()).is_revoked("jti-1")
+
+
+def test_bloom_false_positives_are_confirmed_against_the_store(app):
+    revocations = RevocationList(MemoryRevocationStore())
+    revocations.revoke("revoked", later())
+    revocations._current_bloom().add("not-revoked")
+
+    assert "not-revoked" in revocations._current_bloom()
+    assert not revocations.is_revoked("not-revoked")
+    assert revocations.is_revoked("revoked")
+
+    bloom = BloomFilter(capacity=1000)
+    for i in range(1000):
+        bloom.add(f"jti-{i}")
+    assert all(f"jti-{i}" in bloom for i in range(1000))
+    false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+    assert false_positives < 300
+
+
+def test_refresh_only_reads_and_purge_removes_expired(app):
+    store = DatabaseRevocationStore()
+    store.revoke("expired", datetime.utcnow() - timedelta(seconds=1))
+    store.revoke("live", later())
+
+    revocations = RevocationList(store)
+    revocations.refresh()
+    assert RevokedToken.query.count() == 2
+    assert not revocations.is_revoked("expired")
+    assert revocations.is_revoked("live")
+
+    assert store.purge_expired() == 1
+    assert [row.jti for row in RevokedToken.query] == ["live"]
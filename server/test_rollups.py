@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from database import db
+from models import SensorReadingRollup, Tank
+from rollups import METRICS, aggregate, rebuild_rollups
+
+START = datetime(2024, 3, 31, 23, 50)  # 5m, 1h and 1d boundaries all fall inside the batches
+
+
+def snapshot():
+    rows = {}
+    for row in SensorReadingRollup.query:
+        values = {"reading_count": row.reading_count}
+        for metric in METRICS:
+            for part in ("sum", "min", "max"):
+                values[f"{metric}_{part}"] = pytest.approx(getattr(row, f"{metric}_{part}"))
+        rows[(row.tank_id, row.bucket, row.bucket_start)] = values
+    return rows
+
+
+def reading(minutes, level, tank_id=1):
+    return {
+        "timestamp": (START + timedelta(minutes=minutes)).isoformat(),
+        "temp": 20 + minutes / 10, "ph": 7 - minutes / 100, "tank_level_per": level, "tank_id": tank_id
+    }
+
+
+def test_incremental_rollups_match_a_rebuild(app, client):
+    db.session.add(Tank(name="North"))
+    db.session.commit()
+
+    client.post("/sensor-readings", json=reading(0, 40))  # stamped now by the server
+    # Out of order, across bucket boundaries, two tanks
+    batch = [reading(minutes, minutes % 97, tank_id=1 + minutes % 2) for minutes in range(35, -5, -3)]
+    assert client.post("/sensor-readings/batch", json=batch).status_code == 201
+    client.post("/sensor-readings/batch", json=[reading(9, 55), reading(12, 70, tank_id=2), reading(70, 10)])
+
+    incremental = snapshot()
+    assert {bucket for _, bucket, _ in incremental} == {"5m", "1h", "1d"}
+    assert len([key for key in incremental if key[1] == "1d" and key[2].year == 2024]) == 4
+
+    rebuild_rollups()
+    assert snapshot() == incremental
+
+
+def test_rows_are_upserted_in_key_order():
+    readings = [
+        {"timestamp": START + timedelta(minutes=minutes), "tank_id": tank_id, "temp": 20, "ph": 7, "tank_level_per": 50}
+        for minutes in (90, 5, 60, 0) for tank_id in (2, 1)
+    ]
+    keys = [(row["tank_id"], row["bucket"], row["bucket_start"]) for row in aggregate(readings)]
+    assert keys == sorted(keys)
+
+
+def test_aggregate_accepts_offset_timestamps(app, client):
+    client.post("/sensor-readings/batch", json=[reading(minutes, 50) for minutes in (0, 20, 40)])
+
+    # 01:00+02:00 is 23:00 UTC, the hour holding the 23:50 reading
+    resp = client.get("/sensorreadings/aggregate?bucket=1h&start=2024-04-01T01:00:00%2B02:00&end=2024-04-01T00:30:00Z")
+    assert resp.status_code == 200
+    body = resp.get_json()
+    assert (body["start"], body["end"]) == ("2024-03-31T23:00:00", "2024-04-01T00:30:00")
+    assert [(b["bucket_start"], b["count"]) for b in body["buckets"]] == [
+        ("2024-03-31T23:00:00", 1), ("2024-04-01T00:00:00", 2)
+    ]
+
+    # One aware bound against the naive default for the other
+    assert client.get("/sensorreadings/aggregate?bucket=1d&start=2024-03-01T00:00:00%2B00:00").status_code == 200
+    assert client.get("/sensorreadings/aggregate?bucket=1d&end=2024-04-02T00:00:00Z").status_code == 200
+    resp = client.get("/sensorreadings/aggregate?start=2024-04-02T00:00:00Z&end=2024-04-01T00:00:00")
+    assert resp.status_code == 400
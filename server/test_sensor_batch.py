@@ -0,0 +1,76 @@
+import json
+from datetime import datetime
+
+from app import predictor
+from models import SensorReading, SensorReadingRollup
+
+
+def reading(level, **extra):
+    return {"temp": 25.0, "ph": 7.0, "tank_level_per": level, **extra}
+
+
+def test_mixed_batch_reports_each_row(app, client):
+    resp = client.post("/sensor-readings/batch", json=[
+        reading(40),
+        {"temp": 25.0, "ph": 20, "tank_level_per": 40},
+        "not an object",
+        reading(50, timestamp="yesterday"),
+        reading(60),
+    ])
+
+    assert resp.status_code == 207
+    body = resp.get_json()
+    assert (body["accepted"], body["rejected"]) == (2, 3)
+    results = body["results"]
+    assert [r["index"] for r in results] == [0, 1, 2, 3, 4]
+    assert [r["status"] for r in results] == ["created", "rejected", "rejected", "rejected", "created"]
+    assert results[1]["errors"] == {"ph": "Must be between 0.0 and 14.0"}
+    assert results[2]["errors"] == {"row": "Expected a JSON object"}
+    assert results[3]["errors"] == {"timestamp": "Must be an ISO 8601 timestamp"}
+    stored = {r.id: r.tank_level_per for r in SensorReading.query}
+    assert stored == {results[0]["id"]: 40.0, results[4]["id"]: 60.0}
+
+
+def test_ndjson_bad_line_rejects_only_that_row(app, client):
+    body = "\n".join([json.dumps(reading(10)), "{oops", "", json.dumps(reading(20))])
+    resp = client.post("/sensor-readings/batch", data=body, content_type="application/x-ndjson")
+
+    assert resp.status_code == 207
+    results = resp.get_json()["results"]
+    assert [(r["index"], r["status"]) for r in results] == [(0, "created"), (1, "rejected"), (2, "created")]
+    assert results[1]["errors"] == {"row": "Invalid JSON line"}
+    assert SensorReading.query.count() == 2
+
+
+def test_oversized_and_all_invalid_batches_store_nothing(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, "SENSOR_BATCH_MAX_ROWS", 3)
+
+    resp = client.post("/sensor-readings/batch", json=[reading(10)] * 4)
+    assert resp.status_code == 413
+
+    resp = client.post("/sensor-readings/batch", json=[reading(101), {"temp": "hot"}])
+    assert resp.status_code == 400
+    body = resp.get_json()
+    assert (body["accepted"], body["rejected"]) == (0, 2)
+    assert [r["status"] for r in body["results"]] == ["rejected", "rejected"]
+
+    assert client.post("/sensor-readings/batch", json=[]).status_code == 400
+    assert client.post("/sensor-readings/batch", data="nope", content_type="application/json").status_code == 400
+    assert SensorReading.query.count() == 0
+
+
+def test_inserted_rows_reach_rollups_and_feature_store(app, client):
+    predictor.feature_store.invalidate()
+    assert predictor.feature_store.readings() == []
+
+    resp = client.post("/sensor-readings/batch", json=[
+        reading(level, timestamp=f"2024-05-01T10:{minute:02d}:00") for minute, level in ((0, 30), (20, 50), (40, 70))
+    ] + [reading(-1)])
+    assert resp.status_code == 207
+
+    hour = SensorReadingRollup.query.filter_by(bucket="1h", bucket_start=datetime(2024, 5, 1, 10)).one()
+    assert (hour.reading_count, hour.tank_level_per_min, hour.tank_level_per_max) == (3, 30.0, 70.0)
+    assert hour.tank_level_per_sum == 150.0
+
+    cm = predictor.calculate_reading
+    assert predictor.feature_store.readings() == [cm(30), cm(50), cm(70)]
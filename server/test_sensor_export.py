@@ -0,0 +1,48 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from database import db
+from models import SensorReading
+
+START = datetime(2024, 1, 1)
+
+
+def seed_readings(count):
+    db.session.execute(insert(SensorReading), [
+        {"timestamp": START + timedelta(hours=i), "temp": 25.0, "ph": 7.0, "tank_level_per": float(i % 100)}
+        for i in range(count)
+    ])
+    db.session.commit()
+
+
+def test_csv_export_streams_all_rows_in_order(app, client):
+    app.config["EXPORT_CHUNK_ROWS"] = 7
+    seed_readings(50)
+
+    resp = client.get("/sensorreadings/export?format=csv")
+    assert resp.status_code == 200
+    assert resp.is_streamed
+    assert resp.mimetype == "text/csv"
+
+    rows = list(csv.DictReader(io.StringIO(resp.get_data(as_text=True))))
+    assert len(rows) == 50
+    assert [int(r["id"]) for r in rows] == sorted(int(r["id"]) for r in rows)
+    assert rows[0]["timestamp"] == START.isoformat()
+
+
+def test_ndjson_export_honours_filters(app, client):
+    seed_readings(48)
+
+    resp = client.get(
+        "/sensorreadings/export?format=ndjson&start=2024-01-01T12:00:00&end=2024-01-02T00:00:00&tank_level_min=20"
+    )
+    assert resp.status_code == 200
+
+    rows = [json.loads(line) for line in resp.get_data(as_text=True).splitlines()]
+    assert [r["tank_level_per"] for r in rows] == [float(i) for i in range(20, 25)]
+
+    assert client.get("/sensorreadings/export?format=xml").status_code == 400
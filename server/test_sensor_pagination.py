@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from database import db
+from models import SensorReading
+
+START = datetime(2024, 1, 1)
+
+
+def seed(count, distinct_timestamps):
+    # Many readings share a timestamp, so pages split runs of equal keys
+    db.session.execute(insert(SensorReading), [
+        {"timestamp": START + timedelta(minutes=i % distinct_timestamps), "temp": 25.0, "ph": 7.0, "tank_level_per": i}
+        for i in range(count)
+    ])
+    db.session.commit()
+
+
+def page(client, url):
+    body = client.get(url).get_json()
+    return [r["id"] for r in body["readings"]], body["pagination"]
+
+
+def test_next_and_prev_cursors_walk_ties_without_gaps(app, client):
+    seed(11, distinct_timestamps=3)
+    expected = [r.id for r in SensorReading.query.order_by(SensorReading.timestamp.desc(), SensorReading.id.desc())]
+
+    forward, url = [], "/sensorreadings?paginate=cursor&limit=3"
+    while url:
+        ids, pagination = page(client, url)
+        forward.append(ids)
+        url = pagination["next"]
+    assert [i for ids in forward for i in ids] == expected
+    assert [len(ids) for ids in forward] == [3, 3, 3, 2]
+
+    # From the last page back to the first
+    backward, url = [forward[-1]], pagination["prev"]
+    while url:
+        ids, pagination = page(client, url)
+        backward.append(ids)
+        url = pagination["prev"]
+    assert backward[::-1] == forward
+
+    # A prev page links forward again to the page it came from
+    second = page(client, "/sensorreadings?paginate=cursor&limit=3")[1]["next"]
+    ids, pagination = page(client, page(client, second)[1]["prev"])
+    assert ids == forward[0]
+    assert page(client, pagination["next"])[0] == forward[1]
+
+
+def test_first_page_has_no_prev_and_bad_cursors_are_rejected(app, client):
+    seed(4, distinct_timestamps=1)
+
+    ids, pagination = page(client, "/sensorreadings?paginate=cursor&limit=10")
+    assert len(ids) == 4
+    assert (pagination["prev"], pagination["next"]) == (None, None)
+    assert client.get("/sensorreadings?cursor=not-a-cursor").status_code == 400
@@ -0,0 +1,141 @@
+from flask_jwt_extended import create_access_token
+
+from app import predictor
+from database import db
+from models import EmailOutbox, Notification, Tank, TankSubscription, User
+
+
+def make_user(email, role="Normal", receive_email_alerts=True):
+    user = User(full_name=email.split("@")[0], email=email, role=role, receive_email_alerts=receive_email_alerts)
+    user.set_password("secret")
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def auth(user):
+    token = create_access_token(identity=str(user.id), additional_claims={"email": user.email, "role": user.role})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def add_tank(name):
+    tank = Tank(name=name)
+    db.session.add(tank)
+    db.session.commit()
+    return tank.id
+
+
+def test_only_admins_create_tanks_and_owners_edit_them(app, client):
+    admin, owner, other = make_user("admin@example.com", role="Admin"), make_user("owner@example.com"), make_user("other@example.com")
+
+    assert client.post("/tanks", json={"name": "North"}, headers=auth(owner)).status_code == 403
+    resp = client.post("/tanks", json={"name": "North", "owner_id": owner.id}, headers=auth(admin))
+    assert resp.status_code == 201
+    tank_id = resp.get_json()["tank"]["id"]
+
+    assert client.patch(f"/tanks/{tank_id}", json={"name": "Renamed"}, headers=auth(other)).status_code == 403
+    assert client.patch(f"/tanks/{tank_id}", json={"owner_id": other.id}, headers=auth(owner)).status_code == 403
+    resp = client.patch(f"/tanks/{tank_id}", json={"location": "Barn"}, headers=auth(owner))
+    assert resp.status_code == 200
+    assert resp.get_json()["tank"]["location"] == "Barn"
+
+    names = [tank["name"] for tank in client.get("/tanks", headers=auth(other)).get_json()["tanks"]]
+    assert names == ["Main tank", "North"]
+
+
+def test_readings_are_stored_and_filtered_per_tank(app, client):
+    north = add_tank("North")
+
+    assert client.post("/sensor-readings", json={"temp": 20, "ph": 7, "tank_level_per": 40}).status_code == 201
+    assert client.post("/sensor-readings", json={"temp": 20, "ph": 7, "tank_level_per": 60, "tank_id": north}).status_code == 201
+    assert client.post("/sensor-readings", json={"temp": 20, "ph": 7, "tank_level_per": 60, "tank_id": 99}).status_code == 400
+    resp = client.post("/sensor-readings/batch", json=[
+        {"temp": 20, "ph": 7, "tank_level_per": 50, "tank_id": north},
+        {"temp": 20, "ph": 7, "tank_level_per": 50, "tank_id": 99}
+    ])
+    assert resp.status_code == 207
+    assert [r["status"] for r in resp.get_json()["results"]] == ["created", "rejected"]
+
+    readings = client.get(f"/sensorreadings?tank_id={north}").get_json()["readings"]
+    assert sorted((r["tank_id"], r["tank_level_per"]) for r in readings) == [(north, 50.0), (north, 60.0)]
+
+
+def test_alerts_are_tracked_and_emailed_per_tank(app, client):
+    north = add_tank("North")
+    follows_north = make_user("north@example.com")
+    make_user("everything@example.com")
+    db.session.add(TankSubscription(user_id=follows_north.id, tank_id=north))
+    db.session.commit()
+
+    client.post("/sensor-readings/batch", json=[
+        {"temp": 20, "ph": 7, "tank_level_per": 95},
+        {"temp": 20, "ph": 7, "tank_level_per": 96, "tank_id": north}
+    ])
+
+    alerts = Notification.query.order_by(Notification.tank_id).all()
+    assert [(n.tank_id, n.message.split(":")[0]) for n in alerts] == [(1, "Main tank"), (north, "North")]
+    recipients = sorted((email.recipient, email.subject) for email in EmailOutbox.query)
+    assert [recipient for recipient, _ in recipients] == [
+        "everything@example.com", "everything@example.com", "north@example.com"
+    ]
+
+    # The same level again is the same ongoing episode for each tank
+    client.post("/sensor-readings", json={"temp": 20, "ph": 7, "tank_level_per": 95, "tank_id": north})
+    assert Notification.query.count() == 2
+
+
+def test_subscription_round_trip(app, client):
+    user = make_user("sub@example.com")
+    north = add_tank("North")
+
+    assert client.get("/tanks", headers=auth(user)).get_json()["follows_all"] is True
+    assert client.put(f"/tanks/{north}/subscription", headers=auth(user)).status_code == 200
+    assert client.put(f"/tanks/{north}/subscription", headers=auth(user)).status_code == 200
+    body = client.get("/tanks", headers=auth(user)).get_json()
+    assert body["follows_all"] is False
+    assert [tank["subscribed"] for tank in body["tanks"]] == [False, True]
+
+    assert client.delete(f"/tanks/{north}/subscription", headers=auth(user)).status_code == 200
+    assert client.delete(f"/tanks/{north}/subscription", headers=auth(user)).status_code == 404
+
+
+def test_forecast_features_come_from_the_tanks_own_window(app, client):
+    north = add_tank("North")
+    predictor.feature_store.invalidate()
+    for level in (10, 20, 30):
+        client.post("/sensor-readings", json={"temp": 20, "ph": 7, "tank_level_per": level})
+    for level in (70, 80):
+        client.post("/sensor-readings", json={"temp": 20, "ph": 7, "tank_level_per": level, "tank_id": north})
+
+    cm = predictor.calculate_reading
+    assert predictor.feature_store.readings(north) == [cm(70), cm(80)]
+    main = client.get("/predict").get_json()["data"]
+    other = client.get(f"/predict?tank_id={north}").get_json()["data"]
+    assert (main["tank_id"], main["current_level"]) == (1, 30.0)
+    assert (other["tank_id"], other["current_level"]) == (north, 80.0)
+
+
+def test_batch_forecasts_use_each_tanks_window(app, client):
+    north = add_tank("North")
+    predictor.feature_store.invalidate()
+    for level in (10, 20, 30):
+        client.post("/sensor-readings", json={"temp": 20, "ph": 7, "tank_level_per": level})
+    for level in (70, 80):
+        client.post("/sensor-readings", json={"temp": 20, "ph": 7, "tank_level_per": level, "tank_id": north})
+
+    resp = client.post("/predict/batch", json={"readings": [{"tank_id": north}, {}, {"tank_id": north, "sensor_cm": 26.0}]})
+    assert resp.status_code == 200
+    batch = resp.get_json()["data"]["predictions"]
+    singles = [
+        client.get(f"/predict?tank_id={north}").get_json()["data"],
+        client.get("/predict").get_json()["data"],
+        client.get(f"/predict?tank_id={north}&sensor_cm=26.0").get_json()["data"],
+    ]
+    assert [(p["tank_id"], p["current_level"], p["prediction"]) for p in batch] == [
+        (s["tank_id"], s["current_level"], s["prediction"]) for s in singles
+    ]
+
+    for row in ({"tank_id": 99}, {"tank_id": "north"}, {"sensor_cm": 24, "prev_reading": "x"}, {"roc_1h": 40}):
+        resp = client.post("/predict/batch", json={"readings": [row]})
+        assert resp.status_code == 400, row
+        assert list(resp.get_json()["invalid"]) == ["0"]
@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy import insert, text
+from sqlalchemy.exc import IntegrityError
+
+from database import db
+from models import User
+
+START = datetime(2024, 1, 1)
+
+
+@pytest.fixture
+def admin_headers(app):
+    admin = User(full_name="Zed Admin", email="admin@example.com", role="Admin", created_at=START)
+    admin.set_password("secret")
+    db.session.add(admin)
+    db.session.commit()
+    token = create_access_token(identity=str(admin.id), additional_claims={"email": admin.email, "role": "Admin"})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def add_users(names, created_at=START):
+    db.session.execute(insert(User), [
+        {"full_name": name, "email": f"{name.lower().replace(' ', '.')}@example.com",
+         "password_hash": "x", "created_at": created_at}
+        for name in names
+    ])
+    db.session.commit()
+
+
+def walk(client, url, headers):
+    """Follow next links to the end; returns the ids in the order served."""
+    ids = []
+    while url:
+        body = client.get(url, headers=headers).get_json()
+        ids += [user["id"] for user in body["users"]]
+        url = body["pagination"]["next"]
+    return ids
+
+
+@pytest.mark.parametrize("order", ["asc", "desc"])
+@pytest.mark.parametrize("sort", ["full_name", "email", "created_at", "id"])
+def test_pages_cover_every_user_once_in_order(client, admin_headers, sort, order):
+    # Created in three timestamps so pages split runs of equal sort keys
+    for i in range(3):
+        add_users([f"User {i}{j}" for j in range(5)], created_at=START + timedelta(days=i))
+
+    ids = walk(client, f"/users?sort={sort}&order={order}&limit=4", admin_headers)
+
+    expected = sorted(User.query.all(), key=lambda u: (getattr(u, sort), u.id), reverse=order == "desc")
+    assert ids == [user.id for user in expected]
+
+
+def test_created_at_is_required(app):
+    # Keyset cursors cannot encode a NULL sort key, so the column never holds one
+    db.session.add(User(full_name="No date", email="nodate@example.com", password_hash="x"))
+    db.session.commit()
+    assert User.query.filter_by(email="nodate@example.com").one().created_at is not None
+
+    with pytest.raises(IntegrityError):
+        db.session.execute(text(
+            "INSERT INTO users (full_name, email, password_hash, created_at) VALUES ('Null', 'null@example.com', 'x', NULL)"
+        ))
+    db.session.rollback()
+
+
+def test_search_treats_like_wildcards_literally(client, admin_headers):
+    add_users(["Ann 100% Smith", "Ann 1000 Smith", "Bob_Jones", "Bob Jones", "Back\\slash"])
+
+    def names(query):
+        body = client.get(f"/users?{query}", headers=admin_headers).get_json()
+        return sorted(user["full_name"] for user in body["users"])
+
+    assert names("q=100%25") == ["Ann 100% Smith"]
+    assert names("q=b_j") == ["Bob_Jones"]
+    assert names("q=k%5Cs") == ["Back\\slash"]
+    assert names("q=ann&match=prefix") == ["Ann 100% Smith", "Ann 1000 Smith"]
+    assert names("q=smith&match=prefix") == []
+    assert names("q=SMITH") == ["Ann 100% Smith", "Ann 1000 Smith"]
@@ -1,51 +1,209 @@
+"""
+Train the fill-level model and register it as a new version.
+
+    python train_model.py                      # stream sensor_readings from DATABASE_URL
+    python train_model.py --source csv         # septic_tank_data.csv (or --csv PATH)
+    python train_model.py --jobs 4 --chunk-rows 200000 --no-register
+
+Rows are read in chunks and reduced to compact numeric columns as they
+arrive, the lag features are built with array operations over the whole
+series, and the TimeSeriesSplit folds are fitted in parallel processes
+(joblib memory-maps the feature matrix into them instead of copying it).
+"""
+import argparse
+import os
+import time
+from contextlib import contextmanager
+
+import numpy as np
 import pandas as pd
-import numpy as np  # Added this import
+from joblib import Parallel, delayed
+from sklearn.base import clone
 from sklearn.ensemble import HistGradientBoostingRegressor
 from sklearn.metrics import mean_absolute_error
 import joblib
 from sklearn.model_selection import TimeSeriesSplit
 
-def train_model():
-    df = pd.read_csv("septic_tank_data.csv", parse_dates=["timestamp"])
-    
-    # Feature Engineering
-    df["hour"] = df["timestamp"].dt.hour
-    df["day_of_week"] = df["timestamp"].dt.dayofweek
-    df["prev_reading"] = df["sensor_cm"].shift(1).bfill()
-    df["3h_avg"] = df["sensor_cm"].rolling(3, min_periods=1).mean().shift(1).bfill()
-    df["roc_1h"] = df["sensor_cm"].diff().fillna(0)
-
-    X = df[["hour", "sensor_cm", "prev_reading", "day_of_week", "3h_avg", "roc_1h"]]
-    y = df["percent_full"]
-
-    # Time-series cross validation
-    tscv = TimeSeriesSplit(n_splits=5)
-    maes = []
-    
-    model = HistGradientBoostingRegressor(
+from model_registry import ModelRegistry
+from predictor import FEATURES, HOUR, SENSOR_CM, PREV_READING, DAY_OF_WEEK, AVG_3H, ROC_1H
+
+CSV_PATH = "septic_tank_data.csv"
+# Same mapping as TankPredictor.calculate_reading, so training and serving features agree
+EMPTY_READING = 22.0
+MAX_FILL_RANGE = 5.0
+
+
+class StageTimer:
+    def __init__(self):
+        self.timings = {}
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        yield
+        self.timings[name] = round(time.perf_counter() - started, 3)
+        print(f"[train] {name}: {self.timings[name]:.2f}s")
+
+
+def _columns_from_chunk(timestamps, sensor_cm, percent_full, tank_id):
+    stamps = pd.DatetimeIndex(timestamps)
+    return (
+        stamps.hour.to_numpy(dtype=np.int8),
+        stamps.dayofweek.to_numpy(dtype=np.int8),
+        np.asarray(sensor_cm, dtype=np.float32),
+        np.asarray(percent_full, dtype=np.float32),
+        np.asarray(tank_id, dtype=np.int32)
+    )
+
+
+def read_csv_chunks(path, chunk_rows):
+    """CSV rows are grouped by tank and in time order within each (see generate_data.py)."""
+    for chunk in pd.read_csv(path, parse_dates=["timestamp"], chunksize=chunk_rows):
+        # Single-tank files written before tanks existed have no tank_id column
+        tank_id = chunk["tank_id"] if "tank_id" in chunk else np.ones(len(chunk))
+        yield _columns_from_chunk(chunk["timestamp"], chunk["sensor_cm"], chunk["percent_full"], tank_id)
+
+
+def read_db_chunks(chunk_rows):
+    """Stream (timestamp, tank_level_per, tank_id) from sensor_readings, tank by tank in time order."""
+    from sqlalchemy import select
+
+    from app import app
+    from database import db
+    from models import SensorReading
+
+    with app.app_context():
+        result = db.session.execute(
+            select(SensorReading.timestamp, SensorReading.tank_level_per, SensorReading.tank_id)
+            .order_by(SensorReading.tank_id, SensorReading.timestamp, SensorReading.id)
+            .execution_options(yield_per=chunk_rows)
+        )
+        for rows in result.partitions():
+            timestamps, levels, tank_ids = zip(*rows)
+            levels = np.asarray(levels, dtype=np.float32)
+            yield _columns_from_chunk(timestamps, EMPTY_READING + levels / 100 * MAX_FILL_RANGE, levels, tank_ids)
+
+
+def build_features(hour, day_of_week, sensor_cm, tank_id=None):
+    """
+    Feature matrix in FEATURES order. Matches the pandas definitions the
+    model was first trained with: prev_reading = shift(1).bfill(),
+    3h_avg = rolling(3, min_periods=1).mean().shift(1).bfill(),
+    roc_1h = diff().fillna(0). With `tank_id` (rows grouped by tank) the
+    lags restart at each tank's first row, as they would in a groupby.
+    """
+    n = sensor_cm.shape[0]
+    X = np.empty((n, len(FEATURES)), dtype=np.float32)
+    X[:, HOUR] = hour
+    X[:, DAY_OF_WEEK] = day_of_week
+    X[:, SENSOR_CM] = sensor_cm
+    if n == 0:
+        return X
+
+    # First row of each tank's run; its lags come from itself, not the previous tank
+    first = np.zeros(n, dtype=bool)
+    first[0] = True
+    if tank_id is not None:
+        first[1:] = tank_id[1:] != tank_id[:-1]
+    segment_start = np.maximum.accumulate(np.where(first, np.arange(n), 0))
+
+    X[0, PREV_READING] = sensor_cm[0]
+    X[1:, PREV_READING] = sensor_cm[:-1]
+    X[first, PREV_READING] = sensor_cm[first]
+
+    # Trailing 3-reading mean from a cumulative sum (float64 to keep it exact)
+    csum = np.concatenate(([0.0], np.cumsum(sensor_cm, dtype=np.float64)))
+    ends = np.arange(1, n + 1)
+    starts = np.maximum(ends - 3, segment_start)
+    rolling = (csum[ends] - csum[starts]) / (ends - starts)
+    X[0, AVG_3H] = rolling[0]
+    X[1:, AVG_3H] = rolling[:-1]
+    X[first, AVG_3H] = rolling[first]
+
+    X[0, ROC_1H] = 0.0
+    X[1:, ROC_1H] = np.diff(sensor_cm)
+    X[first, ROC_1H] = 0.0
+    return X
+
+
+def make_model():
+    return HistGradientBoostingRegressor(
         max_iter=1000,
         learning_rate=0.015,
         max_depth=5,
         random_state=42,
-        categorical_features=[0, 3],
+        categorical_features=[HOUR, DAY_OF_WEEK],
         early_stopping=True,
         validation_fraction=0.2,
         n_iter_no_change=50
     )
 
-    for train_idx, test_idx in tscv.split(X):
-        X_train, X_test = X.iloc[train_idx], X.iloc[test_idx]
-        y_train, y_test = y.iloc[train_idx], y.iloc[test_idx]
-        
-        model.fit(X_train, y_train)
-        preds = model.predict(X_test)
-        maes.append(mean_absolute_error(y_test, preds))
-    
+
+def _frame(X):
+    # The served model predicts on named frames; fit on one so feature names are recorded
+    return pd.DataFrame(X, columns=FEATURES, copy=False)
+
+
+def _score_fold(model, X, y, train_idx, test_idx):
+    fold_model = clone(model)
+    fold_model.fit(_frame(X[train_idx]), y[train_idx])
+    return mean_absolute_error(y[test_idx], fold_model.predict(_frame(X[test_idx])))
+
+
+def train_model(source="db", csv_path=CSV_PATH, chunk_rows=100_000, n_jobs=-1, n_splits=5, register=True):
+    timer = StageTimer()
+
+    with timer.stage("load"):
+        chunks = read_db_chunks(chunk_rows) if source == "db" else read_csv_chunks(csv_path, chunk_rows)
+        hour, day_of_week, sensor_cm, y, tank_id = (np.concatenate(column) for column in zip(*chunks))
+    print(f"[train] {len(y):,} rows from {source}")
+    if len(y) <= n_splits:
+        raise SystemExit(f"Not enough rows to train on ({len(y)})")
+
+    with timer.stage("features"):
+        X = build_features(hour, day_of_week, sensor_cm, tank_id)
+
+    model = make_model()
+    with timer.stage("cross_validation"):
+        # Folds are independent fits; each gets a fresh clone in its own process
+        maes = Parallel(n_jobs=min(n_jobs, n_splits) if n_jobs > 0 else n_jobs)(
+            delayed(_score_fold)(model, X, y, train_idx, test_idx)
+            for train_idx, test_idx in TimeSeriesSplit(n_splits=n_splits).split(X)
+        )
     print(f"Cross-validated MAE: {np.mean(maes):.2f}% (±{np.std(maes):.2f})")
-    
-    # Final model on all data
-    model.fit(X, y)
-    joblib.dump(model, "tank_model.pkl")
+
+    with timer.stage("final_fit"):
+        model.fit(_frame(X), y)
+
+    with timer.stage("save"):
+        joblib.dump(model, "tank_model.pkl")
+
+        version = None
+        if register:
+            # Running workers pick the new version up unless an admin pinned another one
+            registry = ModelRegistry(os.getenv('MODEL_REGISTRY_DIR', 'model_registry'))
+            version = registry.register(
+                model,
+                mae=round(float(np.mean(maes)), 4),
+                mae_std=round(float(np.std(maes)), 4),
+                rows=int(len(y)),
+                source=source,
+                timings=timer.timings
+            )
+    if version:
+        print(f"Registered model version {version}")
+    return model, maes, timer.timings
+
 
 if __name__ == "__main__":
-    train_model()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Train and register the tank fill-level model")
+    parser.add_argument('--source', choices=['db', 'csv'], default='db')
+    parser.add_argument('--csv', default=CSV_PATH)
+    parser.add_argument('--chunk-rows', type=int, default=int(os.getenv('TRAIN_CHUNK_ROWS', 100_000)))
+    parser.add_argument('--jobs', type=int, default=int(os.getenv('TRAIN_JOBS', -1)),
+                        help="parallel CV processes (-1: one per core)")
+    parser.add_argument('--splits', type=int, default=5)
+    parser.add_argument('--no-register', action='store_true')
+    args = parser.parse_args()
+
+    train_model(args.source, args.csv, args.chunk_rows, args.jobs, args.splits, register=not args.no_register)
@@ -1,6 +1,5 @@
 import re
-import smtplib
-from email.mime.text import MIMEText
+from datetime import datetime, timezone
 from flask import current_app as app
 from flask_mail import Mail
 
@@ -8,82 +7,114 @@ def is_valid_email(email):
     email_regex = r'^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$'
     return re.match(email_regex, email) is not None
 
-def send_email_alert(message, recipient_email):
+SENSOR_READING_RANGES = {
+    'temp': (-50.0, 150.0),
+    'ph': (0.0, 14.0),
+    'tank_level_per': (0.0, 100.0),
+}
+
+def validate_sensor_reading(data):
     """
-    Send email alerts to users with critical notifications.
-    Reads SMTP settings (server, port, username, password) from app.config
-    and logs each step for debugging.
+    Validate one raw sensor reading payload.
+    Returns (values, errors); values is ready to insert only when errors is empty.
     """
-    server   = app.config.get('MAIL_SERVER', 'smtp.gmail.com')
-    port     = int(app.config.get('MAIL_PORT', 465))
-    username = app.config['MAIL_USERNAME']
-    password = app.config['MAIL_PASSWORD']
+    if not isinstance(data, dict):
+        return None, {"row": "Expected a JSON object"}
 
-    print("[DEBUG] MAIL_USERNAME:", username)
-    print("[DEBUG] MAIL_PASSWORD starts with:", password[:4])
+    values, errors = {}, {}
+    for field, (low, high) in SENSOR_READING_RANGES.items():
+        value = data.get(field)
+        if value is None:
+            errors[field] = "Field is required"
+        elif isinstance(value, bool) or not isinstance(value, (int, float)):
+            errors[field] = "Must be a number"
+        elif not low <= value <= high:
+            errors[field] = f"Must be between {low} and {high}"
+        else:
+            values[field] = float(value)
 
-    print(f"[send_email_alert] Connecting to {server}:{port}")
-    msg = MIMEText(message)
-    msg['Subject'] = app.config.get('MAIL_SUBJECT', 'Critical Tank Alert')
-    msg['From']    = username
-    msg['To']      = recipient_email
+    # Readings without a tank_id belong to the default tank
+    tank_id = data.get('tank_id')
+    if tank_id is not None:
+        if isinstance(tank_id, bool) or not isinstance(tank_id, int) or tank_id < 1:
+            errors['tank_id'] = "Must be a tank id"
+        else:
+            values['tank_id'] = tank_id
 
-    try:
-        # Use SMTP_SSL directly; no TLS needed for port 465
-        smtp = smtplib.SMTP_SSL(server, port, timeout=10)
+    # Gateways buffer readings, so they may send the time each one was taken
+    timestamp = data.get('timestamp')
+    if timestamp is not None:
+        try:
+            parsed = datetime.fromisoformat(timestamp)
+        except (TypeError, ValueError):
+            errors['timestamp'] = "Must be an ISO 8601 timestamp"
+        else:
+            if parsed.tzinfo is not None:
+                parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+            values['timestamp'] = parsed
 
-        print("[send_email_alert] Logging in…")
-        with smtp:
-            smtp.login(username, password)
-            print(f"[send_email_alert] Logged in as {username}, sending to {recipient_email}…")
-            smtp.send_message(msg)
+    return values, errors
 
-        print(f"[send_email_alert] Email sent successfully to {recipient_email}")
-        return True
+def unknown_tank_ids(tank_ids):
+    """The ids in `tank_ids` that name no tank, found with one query."""
+    from database import db
+    from models import Tank
 
-    except Exception as e:
-        print(f"[send_email_alert] Error sending email to {recipient_email}: {e!r}")
-        return False
+    wanted = set(tank_ids)
+    if not wanted:
+        return set()
+    return wanted - set(db.session.scalars(db.select(Tank.id).where(Tank.id.in_(wanted))))
 
 def check_tank_conditions(sensor_reading, app, db):
     """
-    Check sensor readings and create/send notifications if critical conditions are met.
-    (Only checks tank_level_per since predicted_full is no longer a column.)
+    Feed one stored reading to the alert rules (see alert_engine.py).
+    Notifications follow the alerts' state changes, not every reading.
     """
-    # 1) Determine if we have a critical condition
-    if sensor_reading.tank_level_per <= 90:
-        return  # nothing critical, exit early
+    check_batch_conditions([{
+        "id": sensor_reading.id,
+        "tank_id": sensor_reading.tank_id,
+        "timestamp": sensor_reading.timestamp,
+        "temp": sensor_reading.temp,
+        "ph": sensor_reading.ph,
+        "tank_level_per": sensor_reading.tank_level_per
+    }], app, db)
 
-    notification_message = f"Tank level is at {sensor_reading.tank_level_per}%, approaching capacity"
-    notification_type    = "tank_level_high"
+def check_batch_conditions(readings, app, db):
+    """
+    Run stored readings (dicts with id, tank_id, timestamp, temp, ph and
+    tank_level_per) through the compiled alert rules, each tank in time
+    order. A batch produces at most one notification per tank and rule,
+    however many of its rows trip it.
+    """
+    from alert_engine import evaluate_batch, notify_subscribers
 
-    # 2) Create the Notification record
     with app.app_context():
-        from models import Notification, User, UserNotification  # Import here to avoid circular imports
-        notification = Notification(
-            message=notification_message,
-            severity="critical",
-            notification_type=notification_type
-        )
-        db.session.add(notification)
-        db.session.flush()  # get its ID
-
-        # 3a) In-app notifications for everyone
-        all_users = User.query.all()
-        for user in all_users:
-            un = UserNotification(
-                user_id=user.id,
-                notification_id=notification.id
-            )
-            db.session.add(un)
-
-        # 3b) Email alerts for opted-in users
-        email_users = User.query.filter_by(receive_email_alerts=True).all()
-        for user in email_users:
-            send_email_alert(notification_message, user.email)
-
-        # 4) Commit all of it
+        rules = app.extensions['alert_rules'].rules()
+        notifications, queued = [], 0
+        for notification, email in evaluate_batch(rules, readings):
+            notifications.append(notification)
+
+            # Email alerts for opted-in users go to the outbox; the mail
+            # worker delivers them outside the request
+            if email:
+                queued += notify_subscribers(notification, app.config.get('MAIL_SUBJECT', 'Critical Tank Alert'))
+
         db.session.commit()
+
+        from events import publish
+        for notification in notifications:
+            publish(app, 'notification', {
+                "id": notification.id,
+                "message": notification.message,
+                "severity": notification.severity,
+                "notification_type": notification.notification_type,
+                "tank_id": notification.tank_id,
+                "created_at": notification.created_at.isoformat()
+            })
+
+    if queued and 'mail_worker' in app.extensions:
+        app.extensions['mail_worker'].wake()
+
 def init_mail(app):
     mail = Mail(app)
     return mail